@@ -0,0 +1,467 @@
+"""
+AI providers for GlobalEnergyDB: Gemini, an offline rules backend, and a router between them.
+
+Every AI feature asks a ProviderRouter to complete a prompt template with its values:
+    completion = router.complete(prompts.SQL_GENERATION, question=question)
+The router picks a provider by availability and recent latency, and applies one CallPolicy
+to all features:
+  - the preferred provider (Gemini) runs in a worker thread. If it has not answered after
+    hedge_after_s, the next provider (the local backend) is asked too, on the calling thread,
+    and whichever answer is ready first is used; Gemini's is preferred if both are,
+  - nothing waits longer than timeout_s,
+  - a provider that fails failure_limit times in a row, or whose average latency exceeds
+    slow_after_s, is skipped for cooldown_s and then tried again.
+The local backend needs no network, key or model download: it answers from keyword rules
+(category suggestions, record checks, SQL for common question shapes) and from the producer
+rows retrieved for the chatbot. Its answers are simpler, but instant and always available.
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import instrumentation
+from gemini_client import get_gemini_model, send_prompt
+
+DEFAULT_TIMEOUT_S = 20.0
+DEFAULT_HEDGE_AFTER_S = 4.0
+SLOW_AFTER_S = 10.0  # average latency above which a provider is skipped for a while
+FAILURE_LIMIT = 3
+COOLDOWN_S = 60.0
+LATENCY_SMOOTHING = 0.3  # weight of the newest sample in the latency average
+WORKERS = 16
+
+
+class CallPolicy:
+    """Timeout and hedging settings shared by every AI feature."""
+
+    def __init__(self, timeout_s=DEFAULT_TIMEOUT_S, hedge_after_s=DEFAULT_HEDGE_AFTER_S, slow_after_s=SLOW_AFTER_S,
+                 failure_limit=FAILURE_LIMIT, cooldown_s=COOLDOWN_S):
+        self.timeout_s = timeout_s
+        self.hedge_after_s = hedge_after_s
+        self.slow_after_s = slow_after_s
+        self.failure_limit = failure_limit
+        self.cooldown_s = cooldown_s
+
+DEFAULT_POLICY = CallPolicy()
+
+
+class ProviderError(Exception):
+    """No provider produced an answer in time."""
+
+
+class Completion:
+    """A provider's answer: text, which provider gave it, and how long the caller waited."""
+    __slots__ = ("text", "provider", "seconds", "hedged")
+
+    def __init__(self, text, provider, seconds, hedged=False):
+        self.text = text
+        self.provider = provider
+        self.seconds = seconds
+        self.hedged = hedged  # True if the fallback was asked because the preferred provider was slow
+
+
+# --- Providers ---
+
+class Provider:
+    """Base class. generate(template, values) returns the answer text for one request."""
+    name = "provider"
+    remote = False
+
+    def available(self):
+        return True
+
+    def supports(self, template):
+        return True
+
+    def generate(self, template, values):
+        raise NotImplementedError
+
+    def complete(self, template, **values):
+        """Answers directly, without a router (and without its timeout or fallback)."""
+        start = time.perf_counter()
+        text = self.generate(template, values)
+        return Completion(text, self.name, time.perf_counter() - start)
+
+
+class GeminiProvider(Provider):
+    """Google Gemini. model can be any object with the GenerativeModel chat interface (e.g. a fake for benchmarks)."""
+    name = "gemini"
+    remote = True
+
+    def __init__(self, model=None):
+        self._model = model
+        self._lock = threading.Lock()
+
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                self._model = get_gemini_model()
+            return self._model
+
+    def available(self):
+        return self.model() is not None
+
+    def generate(self, template, values):
+        return send_prompt(self.model(), template.render(**values), f"gemini.{template.feature}")
+
+
+# Keywords (matched at the start of a word) that point to a category, for suggestions and checks
+CATEGORY_KEYWORDS = {
+    "Solar": ("solar", "photovolt", "pv", "sun"),
+    "Wind": ("wind", "turbine", "offshore", "breeze"),
+    "Hydro": ("hydro", "water", "dam", "river", "tidal"),
+    "Biofuel": ("bio", "ethanol", "diesel", "biomass", "pellet"),
+    "Geothermal": ("geotherm", "heat pump", "geo"),
+    "Nuclear": ("nuclear", "atomic", "uranium", "reactor", "fission"),
+    "Fossil Fuel": ("oil", "gas", "petro", "coal", "lng", "lpg", "fuel"),
+}
+CATEGORY_PRODUCTS = {
+    "Solar": "Solar Panels, Inverters, Mounting Systems",
+    "Wind": "Wind Turbines, Rotor Blades, Nacelles",
+    "Hydro": "Hydro Turbines, Generators, Penstocks",
+    "Biofuel": "Biodiesel, Bioethanol, Wood Pellets",
+    "Geothermal": "Heat Pumps, Geothermal Drilling, Heat Exchangers",
+    "Nuclear": "Reactor Components, Fuel Assemblies, Control Rod Drives",
+    "Fossil Fuel": "Crude Oil, Natural Gas, LNG",
+}
+_CATEGORY_ALIASES = {"biofuels": "Biofuel", "fossil": "Fossil Fuel", "fossil fuels": "Fossil Fuel", "oil and gas": "Fossil Fuel",
+                     "hydroelectric": "Hydro", "hydropower": "Hydro", "pv": "Solar"}
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE_RE = re.compile(r"\+?\d[\d\s().-]{6,}\d")
+
+def guess_category(*texts):
+    """Returns the category whose keywords occur most often in the texts, or None."""
+    words = " " + " ".join(re.sub(r"[^a-z0-9 ]", " ", (t or "").lower()) for t in texts) + " "
+    scores = {}
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        score = sum(words.count(" " + keyword) for keyword in keywords)
+        if score:
+            scores[category] = score
+    return max(scores, key=scores.get) if scores else None
+
+def canonical_category(category):
+    """Returns the usual spelling of a category or one of its aliases, or None for anything else."""
+    key = " ".join((category or "").lower().split())
+    if key in _CATEGORY_ALIASES:
+        return _CATEGORY_ALIASES[key]
+    for name in CATEGORY_KEYWORDS:
+        if name.lower() == key:
+            return name
+    return None
+
+def _sql_text(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+class LocalProvider(Provider):
+    """Offline answers from keyword rules. Each feature has its own handler; others are not supported."""
+    name = "local"
+
+    def generate(self, template, values):
+        handler = getattr(self, f"_{template.feature}", None)
+        if handler is None:
+            raise ProviderError(f"The offline backend cannot answer '{template.feature}' requests.")
+        with instrumentation.timer(f"local.{template.feature}"):
+            return handler(values)
+
+    def supports(self, template):
+        return hasattr(self, f"_{template.feature}")
+
+    # --- Producer suggestions and checks ---
+
+    def _add_suggestion(self, values):
+        category = guess_category(values.get("name"), values.get("contact"), values.get("address"))
+        if category is None:
+            return "Category: Unknown, Products: None"
+        return f"Category: {category}, Products: {CATEGORY_PRODUCTS[category]}"
+
+    def _update_assessment(self, values):
+        issues = []
+        category = (values.get("category") or "").strip()
+        known = canonical_category(category)
+        if not category:
+            issues.append("The category is empty.")
+        elif known is None:
+            issues.append(f"'{category}' is not one of the usual categories ({', '.join(CATEGORY_KEYWORDS)}).")
+        implied = guess_category(values.get("name"), values.get("products"))
+        if known and implied and implied != known:
+            issues.append(f"The name and products suggest the category '{implied}' rather than '{category}'.")
+        contact = values.get("contact") or ""
+        if not contact:
+            issues.append("No contact details are given.")
+        elif not _EMAIL_RE.search(contact) and not _PHONE_RE.search(contact):
+            issues.append("The contact details contain neither an email address nor a phone number.")
+        address = values.get("address") or ""
+        if not address:
+            issues.append("The address is empty.")
+        elif "," not in address:
+            issues.append("The address has no city or country part.")
+        if not values.get("products"):
+            issues.append("No products are listed.")
+        if not issues:
+            return "No issues found."
+        return "Offline check:\n" + "\n".join(f"- {issue}" for issue in issues)
+
+    # --- Natural-language SQL ---
+
+    _COUNT_RE = re.compile(r"\b(how many|count|number of|total)\b")
+    _GROUP_RE = re.compile(r"\b(?:by|per|for each|each)\s+(category|categories|country|countries)\b|\b(categories|countries)\b")
+    _COUNT_PHRASE_RE = re.compile(r"\b(?:how many|(?:total )?number of|count of|count)\b")
+    _LIMIT_RE = re.compile(r"\b(?:top|first|limit|only)\s+(\d+)\b")
+    _PRODUCT_RE = re.compile(r"\b(?:sell(?:s|ing)?|make(?:s)?|making|produc(?:e|es|ing)|suppl(?:y|ies|ying)|offer(?:s|ing)?|"
+                             r"manufactur(?:e|es|ing)|of|with products?(?: like)?)\s+(?P<x>[a-z0-9][a-z0-9 -]*?)"
+                             r"(?=\s+(?:in|from|based|located)\b|$)")
+    _PLACE_RE = re.compile(r"\b(?:in|from|based in|located in)\s+(?P<x>[a-z][a-z .-]*?)(?=\s+(?:that|who|which|selling|making)\b|$)")
+    _NAME_RE = re.compile(r"\b(?:named|called|name contains|name like)\s+['\"]?(?P<x>[^'\"]+?)['\"]?$")
+    _MISSING_RE = re.compile(r"\b(?:without|missing|no|with no|lacking)\s+(?:an?\s+)?(contact|address|products|category)\b(?:\s+(?:details|info|information))?")
+    _SUBJECT_RE = re.compile(r"\b(producers?|companies|company|suppliers?|manufacturers?|firms?|vendors?|records?|rows?|entries)\b")
+    # The rules have no NOT: a negated question is declined rather than answered as its opposite
+    _NEGATION_RE = re.compile(r"\b(?:not|never|none|except|excluding|outside|other than|non|neither|nor)\b|n't\b|\bnon-")
+    # Words a question may contain besides the ones the rules matched; any other word means a filter was not understood
+    _FILLER_WORDS = frozenset("a an the all any every me us i show list give find get display tell what which who whose "
+                              "are is there do does have has that by energy please".split())
+
+    def _sql_generation(self, values):
+        q = " ".join((values.get("question") or "").lower().replace("?", " ").split()).rstrip(".! ")
+        if not self._SUBJECT_RE.search(q) and not q.startswith(("who ", "which ", "list ", "show ")):
+            return "INVALID_QUERY"
+        if self._NEGATION_RE.search(q):
+            return "INVALID_QUERY"
+        question = q
+        used = [m.group(0) for m in self._SUBJECT_RE.finditer(q)]  # text the rules turned into SQL
+        conditions = []
+        category = None
+        # Longest names first, so "fossil fuels" wins over "fossil"
+        for phrase in sorted(list(_CATEGORY_ALIASES) + [name.lower() for name in CATEGORY_KEYWORDS], key=len, reverse=True):
+            if re.search(rf"\b{re.escape(phrase)}\b", q):
+                category = canonical_category(phrase)
+                used.append(phrase)
+                break
+        if category:
+            conditions.append(f"category LIKE {_sql_text(category)}")
+
+        group = self._GROUP_RE.search(q)
+        counted = self._COUNT_RE.search(q)
+        used += [m.group(0) for m in self._GROUP_RE.finditer(q)] + [m.group(0) for m in self._COUNT_PHRASE_RE.finditer(q)]
+        # Filters are read from what is left once the grouping and counting words are gone
+        q = " ".join(self._COUNT_PHRASE_RE.sub(" ", self._GROUP_RE.sub(" ", q)).split())
+        missing = self._MISSING_RE.search(q)
+        if missing:
+            column = missing.group(1)
+            conditions.append(f"({column} IS NULL OR {column} = '')")
+        name = self._NAME_RE.search(q)
+        if name:
+            conditions.append(f"name LIKE {_sql_text('%' + name.group('x').strip() + '%')}")
+        place = self._PLACE_RE.search(q)
+        if place:
+            location = place.group("x").strip()
+            if " in " in f" {location} " or (category and category.lower() in location) \
+                    or any(phrase in location for phrase in _CATEGORY_ALIASES):
+                return "INVALID_QUERY"  # e.g. "in the oil and gas sector in texas" is not one place
+            conditions.append(f"address LIKE {_sql_text('%' + place.group('x').strip() + '%')}")
+        product = None if name or missing else self._PRODUCT_RE.search(q)
+        if product:
+            phrase = re.sub(r"\b(producers?|companies|suppliers?|the|all|any)\b", " ", product.group("x"))
+            # Singular words also match plurals ("heat pump" finds "Heat Pumps")
+            phrase = " ".join(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in phrase.split())
+            if phrase and phrase != (category or "").lower():
+                conditions.append(f"products LIKE {_sql_text('%' + phrase + '%')}")
+
+        limit = self._LIMIT_RE.search(q)
+        for match in (missing, name, place, product, limit):
+            if match:
+                used.append(match.group(0))
+        used_words = set(" ".join(used).split())
+        if any(word not in used_words and word not in self._FILLER_WORDS for word in question.split()):
+            return "INVALID_QUERY"
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        if group:
+            if (group.group(1) or group.group(2)).startswith("countr"):
+                # The country is the last part of the address
+                country = "TRIM(SUBSTR(address, INSTR(address, ', ') + 2))"
+                key = f"CASE WHEN INSTR({country}, ', ') > 0 THEN TRIM(SUBSTR({country}, INSTR({country}, ', ') + 2)) ELSE {country} END"
+                sql = f"SELECT {key} AS country, COUNT(*) AS producers FROM producers{where} GROUP BY country ORDER BY producers DESC"
+            else:
+                sql = f"SELECT category, COUNT(*) AS producers FROM producers{where} GROUP BY category ORDER BY producers DESC"
+        elif counted:
+            sql = f"SELECT COUNT(*) AS producers FROM producers{where}"
+        elif conditions or re.search(r"\b(all|every|list|show)\b", q):
+            sql = f"SELECT id, name, contact, address, products, category FROM producers{where} ORDER BY name"
+        else:
+            return "INVALID_QUERY"
+        if limit:
+            sql += f" LIMIT {int(limit.group(1))}"
+        return sql
+
+    # --- Chatbot ---
+
+    def _chat_session(self, values):
+        rows = values.get("rows") or []
+        if not rows:
+            question = values.get("question") or ""
+            return ("I don't have that specific information in my database. You might find it by searching online. "
+                    f"[WEB_SEARCH_SUGGESTION: {question} global energy]")
+        lines = [f"- {name} ({category or 'no category'}): {products or 'no products listed'}"
+                 for name, products, category in rows[:5]]
+        return "Here is what the database has on that:\n" + "\n".join(lines)
+
+
+# --- Router ---
+
+class _Health:
+    """Recent behaviour of one provider, as seen by the router."""
+    __slots__ = ("latency_s", "failures", "down_until", "calls", "answers", "errors", "timeouts", "hedges")
+
+    def __init__(self):
+        self.latency_s = None  # smoothed latency of successful calls
+        self.failures = 0  # consecutive
+        self.down_until = 0.0
+        self.calls = self.answers = self.errors = self.timeouts = self.hedges = 0
+
+
+class ProviderRouter:
+    """Sends each request to the best usable provider under one CallPolicy. Safe to use from many threads."""
+
+    def __init__(self, providers, policy=DEFAULT_POLICY):
+        self.providers = list(providers)  # in order of preference
+        self.policy = policy
+        self._health = {p.name: _Health() for p in self.providers}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="ai-provider")
+
+    # --- Health ---
+
+    def _usable(self, provider, template, now):
+        if not provider.supports(template):
+            return False
+        health = self._health[provider.name]
+        if now < health.down_until:
+            return False
+        if health.down_until:
+            # Cooldown over: forget the old samples and try the provider again
+            health.down_until, health.latency_s, health.failures = 0.0, None, 0
+        return provider.available()
+
+    def _record(self, provider, seconds=None, error=None, timeout=False):
+        with self._lock:
+            health = self._health[provider.name]
+            if error is not None or timeout:
+                health.failures += 1
+                health.timeouts += timeout
+                health.errors += error is not None
+            else:
+                health.failures = 0
+                health.latency_s = seconds if health.latency_s is None else \
+                    (1 - LATENCY_SMOOTHING) * health.latency_s + LATENCY_SMOOTHING * seconds
+            slow = health.latency_s is not None and health.latency_s > self.policy.slow_after_s
+            if health.failures >= self.policy.failure_limit or slow:
+                health.down_until = time.monotonic() + self.policy.cooldown_s
+        if error is not None:
+            instrumentation.count(f"ai.{provider.name}.errors")
+
+    def _call(self, provider, template, values):
+        start = time.perf_counter()
+        try:
+            text = provider.generate(template, values)
+        except Exception as e:
+            self._record(provider, error=e)
+            raise
+        self._record(provider, time.perf_counter() - start)
+        return text
+
+    # --- Requests ---
+
+    def complete(self, template, **values):
+        """Returns a Completion for the template and values. Raises ProviderError if no provider answers."""
+        start = time.perf_counter()
+        now = time.monotonic()
+        with self._lock:
+            candidates = [p for p in self.providers if self._usable(p, template, now)]
+        if not candidates:
+            raise ProviderError("No AI provider is available.")
+        primary, fallbacks = candidates[0], candidates[1:]
+        with self._lock:
+            self._health[primary.name].calls += 1
+
+        if not fallbacks:
+            future = self._executor.submit(self._call, primary, template, values)
+            done, _ = wait([future], timeout=self.policy.timeout_s)
+            if not done:
+                self._record(primary, timeout=True)
+                raise ProviderError(f"{primary.name} did not answer within {self.policy.timeout_s:.0f} s.")
+            return self._finish(future.result(), primary, start)
+
+        future = self._executor.submit(self._call, primary, template, values)
+        done, _ = wait([future], timeout=min(self.policy.hedge_after_s, self.policy.timeout_s))
+        if done and future.exception() is None:
+            return self._finish(future.result(), primary, start)
+        hedged = not done
+        if hedged:
+            # Slow: ask the fallback too. A late answer still updates the primary's latency.
+            with self._lock:
+                self._health[primary.name].hedges += 1
+            instrumentation.count(f"ai.{primary.name}.hedged")
+        last_error = None if hedged else future.exception()
+        for fallback in fallbacks:
+            with self._lock:
+                self._health[fallback.name].calls += 1
+            try:
+                text = self._call(fallback, template, values)
+            except Exception as e:
+                last_error = e
+                continue
+            if hedged and future.done() and future.exception() is None:
+                # The preferred provider caught up while the fallback was working
+                return self._finish(future.result(), primary, start, hedged=True)
+            return self._finish(text, fallback, start, hedged=hedged)
+
+        if hedged:
+            wait([future], timeout=max(0.0, self.policy.timeout_s - (time.perf_counter() - start)))
+            if not future.done():
+                self._record(primary, timeout=True)
+            elif future.exception() is None:
+                return self._finish(future.result(), primary, start, hedged=True)
+            else:
+                last_error = future.exception()
+        raise ProviderError(f"No AI provider answered: {last_error or 'timed out'}")
+
+    def _finish(self, text, provider, start, hedged=False):
+        with self._lock:
+            self._health[provider.name].answers += 1
+        seconds = time.perf_counter() - start
+        instrumentation.count(f"ai.{provider.name}.answers")
+        return Completion(text, provider.name, seconds, hedged)
+
+    def snapshot(self):
+        """Returns {provider name: {'state', 'latency_ms', 'calls', 'answers', 'errors', 'timeouts', 'hedges'}}."""
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for provider in self.providers:
+                health = self._health[provider.name]
+                state = "cooling down" if now < health.down_until else "ready"
+                result[provider.name] = {
+                    "state": state,
+                    "latency_ms": None if health.latency_s is None else health.latency_s * 1000,
+                    "calls": health.calls, "answers": health.answers, "errors": health.errors,
+                    "timeouts": health.timeouts, "hedges": health.hedges,
+                }
+            return result
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_default_router = None
+_default_lock = threading.Lock()
+
+def default_router():
+    """The shared Gemini-then-local router used when a caller does not pass its own."""
+    global _default_router
+    with _default_lock:
+        if _default_router is None:
+            _default_router = ProviderRouter([GeminiProvider(), LocalProvider()])
+        return _default_router
@@ -0,0 +1,213 @@
+"""
+Natural-language database queries: SQL generation through an AI provider (Gemini, or the
+offline rules backend in ai_providers.py) and batched execution.
+
+A batch runs many questions concurrently on an asyncio event loop. The blocking provider and
+SQLite calls run in worker threads, bounded by a semaphore; identical questions are asked
+once, and generated SQL runs on a small pool of read-only connections. Each result is
+passed to a callback as soon as it is ready, so callers can stream it to the UI or a CSV.
+"""
+import asyncio
+import csv
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import pathname2url
+
+import instrumentation
+import prompts
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_POOL_SIZE = 4
+MAX_RESULT_ROWS = 1000  # rows kept per question; the full count is still reported
+
+def generate_sql(provider, question):
+    """
+    Asks a provider (or a ProviderRouter) for a SELECT statement answering the question.
+    Returns (sql, provider name); sql is None if the answer is not a SELECT statement.
+    """
+    completion = provider.complete(prompts.SQL_GENERATION, question=question)
+    sql = completion.text.strip()
+    return (sql if sql.upper().startswith("SELECT") else None), completion.provider
+
+
+# --- Question lists ---
+
+_LIST_MARKER_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+def parse_questions(text):
+    """Splits pasted text into questions: one per line, ignoring blanks, '#' comments and list markers."""
+    questions = []
+    for line in text.splitlines():
+        line = _LIST_MARKER_RE.sub("", line).strip()
+        if line and not line.startswith("#"):
+            questions.append(line)
+    return questions
+
+def load_questions_file(path):
+    """Reads questions from a text file (one per line) or the first column of a CSV file."""
+    if path.lower().endswith(".csv"):
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            rows = [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+        if rows and rows[0].lower() in ("question", "questions", "query"):
+            rows = rows[1:]
+        return rows
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return parse_questions(f.read())
+
+def normalize_question(question):
+    """Key used to detect repeated questions: case, spacing and trailing punctuation are ignored."""
+    return " ".join(question.casefold().split()).rstrip("?.! ")
+
+def dedupe_questions(questions):
+    """Returns [(question, [positions])] with each distinct question once, in first-seen order."""
+    groups = {}
+    for position, question in enumerate(questions):
+        groups.setdefault(normalize_question(question), (question, []))[1].append(position)
+    return list(groups.values())
+
+
+# --- Read connection pool ---
+
+def connect_read_only(db_path):
+    """Opens a read-only connection that worker threads can use."""
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True,
+                           check_same_thread=False)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+class ReadConnectionPool:
+    """A fixed set of read-only connections handed out to one thread at a time."""
+
+    def __init__(self, connect, size=DEFAULT_POOL_SIZE):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        self.size = size
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+        return self._idle.get()
+
+    def release(self, conn):
+        self._idle.put(conn)
+
+    def execute(self, sql, max_rows=MAX_RESULT_ROWS):
+        """Runs a query on a pooled connection; returns (columns, rows[:max_rows], total row count)."""
+        conn = self.acquire()
+        try:
+            cursor = conn.execute(sql)
+            columns = [d[0] for d in cursor.description] if cursor.description else []
+            rows = cursor.fetchmany(max_rows)
+            total = len(rows)
+            if total == max_rows:
+                total += sum(1 for _ in cursor)
+            return columns, rows, total
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+
+# --- Batch execution ---
+
+def _answer_question(provider, pool, question, answer_locally):
+    """Answers one question (runs in a worker thread). Returns a result dict without positions."""
+    start = time.perf_counter()
+    result = {"question": question, "sql": None, "columns": [], "rows": [], "total_rows": 0,
+              "answer": None, "error": None, "source": "sql", "provider": None}
+    try:
+        answer = answer_locally(question) if answer_locally else None
+        if answer:
+            result["answer"] = answer
+            result["source"] = "analytics"
+        else:
+            sql, result["provider"] = generate_sql(provider, question)
+            if sql is None:
+                result["error"] = "AI could not generate a valid SQL SELECT query for this question."
+            else:
+                result["sql"] = sql
+                with instrumentation.timer("db.ai_query"):
+                    result["columns"], result["rows"], result["total_rows"] = pool.execute(sql)
+    except sqlite3.Error as e:
+        result["error"] = f"Database Error executing SQL: {e}"
+    except Exception as e:
+        result["error"] = f"AI/Execution Error: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+async def run_batch_async(questions, provider, pool, on_result, concurrency=DEFAULT_CONCURRENCY,
+                          answer_locally=None, stop_event=None):
+    """
+    Answers every distinct question with at most `concurrency` in flight. on_result(result) is
+    called (on the event loop thread) as each finishes; result['positions'] lists the indexes of
+    all input questions it answers. Questions not started before stop_event is set are skipped.
+    Returns the number of distinct questions answered.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    answered = 0
+
+    async def handle(question, positions):
+        nonlocal answered
+        async with semaphore:
+            if stop_event and stop_event.is_set():
+                return
+            result = await loop.run_in_executor(executor, _answer_question, provider, pool, question, answer_locally)
+        result["positions"] = positions
+        answered += 1
+        on_result(result)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ai-batch") as executor:
+        await asyncio.gather(*(handle(q, positions) for q, positions in dedupe_questions(questions)))
+    return answered
+
+@instrumentation.timed("ai.batch_query")
+def run_batch(questions, provider, pool, on_result, concurrency=DEFAULT_CONCURRENCY, answer_locally=None, stop_event=None):
+    """Blocking wrapper around run_batch_async(), for use from a background thread."""
+    return asyncio.run(run_batch_async(questions, provider, pool, on_result, concurrency, answer_locally, stop_event))
+
+
+class BatchCsvWriter:
+    """Appends each batch result to one combined CSV file as it arrives."""
+
+    HEADER = ["Question #", "Question", "Status", "Generated SQL", "Row", "Values..."]
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.HEADER)
+
+    def write(self, result):
+        number = ";".join(str(p + 1) for p in result["positions"])
+        prefix = [number, result["question"]]
+        if result["error"]:
+            self._writer.writerow(prefix + ["error", result["sql"] or "", "", result["error"]])
+        elif result["answer"]:
+            self._writer.writerow(prefix + ["analytics", "", "", result["answer"]])
+        else:
+            self._writer.writerow(prefix + ["ok", result["sql"], "columns"] + result["columns"])
+            for i, row in enumerate(result["rows"], start=1):
+                self._writer.writerow(prefix + ["ok", result["sql"], i] + ["" if v is None else v for v in row])
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,326 @@
+"""
+Precomputed producer aggregates: counts per category, product frequency and per-country counts.
+
+Counts live in compact array-backed tables (interned key list + array of counts) and are kept
+current incrementally: triggers on 'producers' append +1/-1 deltas to the producer_changes log,
+and refresh() applies only the log entries added since the last refresh. The store can be saved
+to a JSON file so the next start does not need a full scan.
+"""
+import csv
+import heapq
+import json
+import os
+import re
+import sys
+import threading
+from array import array
+
+from instrumentation import timed
+
+UNKNOWN_CATEGORY = "Uncategorized"
+UNKNOWN_COUNTRY = "Unknown"
+
+CHANGE_TRACKING_SQL = """
+    CREATE TABLE IF NOT EXISTS producer_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        sign INTEGER NOT NULL,
+        category TEXT,
+        products TEXT,
+        address TEXT
+    );
+    CREATE TRIGGER IF NOT EXISTS producers_track_insert AFTER INSERT ON producers BEGIN
+        INSERT INTO producer_changes (sign, category, products, address) VALUES (1, NEW.category, NEW.products, NEW.address);
+    END;
+    CREATE TRIGGER IF NOT EXISTS producers_track_delete AFTER DELETE ON producers BEGIN
+        INSERT INTO producer_changes (sign, category, products, address) VALUES (-1, OLD.category, OLD.products, OLD.address);
+    END;
+    -- Recreated so older databases get the WHEN clause: full-row writes that leave these columns alone log nothing
+    DROP TRIGGER IF EXISTS producers_track_update;
+    CREATE TRIGGER producers_track_update AFTER UPDATE OF category, products, address ON producers
+    WHEN OLD.category IS NOT NEW.category OR OLD.products IS NOT NEW.products OR OLD.address IS NOT NEW.address BEGIN
+        INSERT INTO producer_changes (sign, category, products, address) VALUES (-1, OLD.category, OLD.products, OLD.address);
+        INSERT INTO producer_changes (sign, category, products, address) VALUES (1, NEW.category, NEW.products, NEW.address);
+    END;
+"""
+
+
+def install_change_tracking(conn):
+    """Creates the change log table and triggers used for incremental refreshes."""
+    conn.executescript(CHANGE_TRACKING_SQL)
+    conn.commit()
+
+def parse_country(address):
+    """Takes the last comma-separated part of a free-text address as its country."""
+    if not address:
+        return UNKNOWN_COUNTRY
+    country = address.rsplit(",", 1)[-1].strip()
+    return country or UNKNOWN_COUNTRY
+
+def split_products(products):
+    if not products:
+        return []
+    return [p.strip() for p in products.split(",") if p.strip()]
+
+
+class CountTable:
+    """Counts per string key, stored as an interned key list and a parallel array of counts."""
+    __slots__ = ("keys", "index", "counts")
+
+    def __init__(self):
+        self.keys = []
+        self.index = {}
+        self.counts = array('q')
+
+    def add(self, key, delta=1):
+        i = self.index.get(key)
+        if i is None:
+            i = len(self.keys)
+            key = sys.intern(key)
+            self.index[key] = i
+            self.keys.append(key)
+            self.counts.append(0)
+        self.counts[i] += delta
+
+    def get(self, key):
+        i = self.index.get(key)
+        return self.counts[i] if i is not None else 0
+
+    def items(self):
+        """Returns (key, count) pairs with a positive count, largest first."""
+        return sorted(((k, c) for k, c in zip(self.keys, self.counts) if c > 0), key=lambda kc: (-kc[1], kc[0]))
+
+    def top(self, n):
+        return [(k, c) for c, k in heapq.nlargest(n, ((c, k) for k, c in zip(self.keys, self.counts) if c > 0))]
+
+    def find(self, text):
+        """Returns the key matching text case-insensitively, or None."""
+        folded = text.strip().casefold()
+        for key in self.keys:
+            if key.casefold() == folded:
+                return key
+        return None
+
+    def to_dict(self):
+        return {k: c for k, c in zip(self.keys, self.counts) if c}
+
+    @classmethod
+    def from_dict(cls, data):
+        table = cls()
+        for key, value in data.items():
+            table.add(key, value)
+        return table
+
+
+class AggregateStore:
+    """
+    Thread-safe, incrementally refreshed producer aggregates.
+    A read_only store (for immutable snapshots) is built with one scan and never touches the change log.
+    """
+
+    def __init__(self, read_only=False):
+        self.read_only = read_only
+        self.lock = threading.Lock()  # guards the counts
+        self.update_lock = threading.RLock()  # serializes refresh/rebuild
+        self._reset()
+        self.ready = False
+
+    def _reset(self):
+        self.producers = 0
+        self.categories = CountTable()
+        self.products = CountTable()
+        self.countries = CountTable()
+        self.last_seq = 0
+
+    def _apply(self, sign, category, products, address):
+        self.producers += sign
+        self.categories.add((category or "").strip() or UNKNOWN_CATEGORY, sign)
+        for product in split_products(products):
+            self.products.add(product, sign)
+        self.countries.add(parse_country(address), sign)
+
+    @timed("analytics.rebuild")
+    def rebuild(self, conn):
+        """Recomputes every aggregate with one scan, then prunes change log entries it covers."""
+        with self.update_lock:
+            self._rebuild(conn)
+
+    def _rebuild(self, conn):
+        if self.read_only:
+            with self.lock:
+                self._reset()
+                for category, products, address in conn.execute("SELECT category, products, address FROM producers"):
+                    self._apply(1, category, products, address)
+                self.ready = True
+            return
+        if conn.in_transaction:
+            conn.commit()
+        # One read transaction so the scan and the change log position are consistent
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT MAX(seq) FROM producer_changes").fetchone()
+            seq_row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'producer_changes'").fetchone()
+            last_seq = max(row[0] or 0, seq_row[0] if seq_row else 0)
+            with self.lock:
+                self._reset()
+                for category, products, address in conn.execute("SELECT category, products, address FROM producers"):
+                    self._apply(1, category, products, address)
+                self.last_seq = last_seq
+                self.ready = True
+        finally:
+            conn.commit()
+        conn.execute("DELETE FROM producer_changes WHERE seq <= ?", (last_seq,))
+        conn.commit()
+
+    @timed("analytics.refresh")
+    def refresh(self, conn):
+        """
+        Applies change log entries newer than the last refresh. Falls back to a full rebuild
+        if entries were pruned by another process. Returns the number of changes applied.
+        """
+        with self.update_lock:
+            return self._refresh(conn)
+
+    def _refresh(self, conn):
+        if not self.ready:
+            self.rebuild(conn)
+            return -1
+        if self.read_only:
+            return 0
+        rows = conn.execute("SELECT seq, sign, category, products, address FROM producer_changes WHERE seq > ? ORDER BY seq",
+                            (self.last_seq,)).fetchall()
+        if not rows:
+            seq_row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'producer_changes'").fetchone()
+            if seq_row and seq_row[0] > self.last_seq:
+                self.rebuild(conn)
+                return -1
+            return 0
+        if rows[0][0] != self.last_seq + 1:
+            self.rebuild(conn)
+            return -1
+        with self.lock:
+            for seq, sign, category, products, address in rows:
+                self._apply(sign, category, products, address)
+            self.last_seq = rows[-1][0]
+        return len(rows)
+
+    def prune(self, conn):
+        """Deletes change log entries already applied (other processes will rebuild once)."""
+        if self.read_only:
+            return
+        conn.execute("DELETE FROM producer_changes WHERE seq <= ?", (self.last_seq,))
+        conn.commit()
+
+    def save(self, path):
+        with self.lock:
+            data = {
+                "last_seq": self.last_seq,
+                "producers": self.producers,
+                "categories": self.categories.to_dict(),
+                "products": self.products.to_dict(),
+                "countries": self.countries.to_dict(),
+            }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def load(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self.lock:
+            self.last_seq = data["last_seq"]
+            self.producers = data["producers"]
+            self.categories = CountTable.from_dict(data["categories"])
+            self.products = CountTable.from_dict(data["products"])
+            self.countries = CountTable.from_dict(data["countries"])
+            self.ready = True
+
+    def load_or_build(self, conn, path):
+        """Loads a saved snapshot and catches it up from the change log, or rebuilds from scratch."""
+        if path and os.path.exists(path):
+            try:
+                self.load(path)
+            except (OSError, ValueError, KeyError):
+                self.ready = False
+        self.refresh(conn)
+
+    def snapshot(self, top_n=25):
+        """Returns a plain dict of the current aggregates for display or export."""
+        with self.lock:
+            return {
+                "producers": self.producers,
+                "categories": self.categories.items(),
+                "top_products": self.products.top(top_n),
+                "countries": self.countries.items(),
+            }
+
+    def export(self, path, top_n=100):
+        """Exports the aggregates to JSON (for .json paths) or CSV."""
+        snap = self.snapshot(top_n)
+        if path.lower().endswith(".json"):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"producers": snap["producers"],
+                           "categories": dict(snap["categories"]),
+                           "top_products": dict(snap["top_products"]),
+                           "countries": dict(snap["countries"])}, f, indent=2)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Aggregate", "Key", "Count"])
+            writer.writerow(["total", "producers", snap["producers"]])
+            for section, key in (("category", "categories"), ("product", "top_products"), ("country", "countries")):
+                for name, value in snap[key]:
+                    writer.writerow([section, name, value])
+
+
+# --- Answering common aggregate questions without the LLM ---
+
+_TOTAL_RE = re.compile(r"^how many (?:producers|companies|suppliers)(?: are there)?(?: in (?:the|this|my) (?:database|db))?\??$")
+_PER_CATEGORY_RE = re.compile(r"(?:how many|count of|number of) (?:producers|companies|suppliers) (?:per|by|in each|for each) category")
+_PER_COUNTRY_RE = re.compile(r"(?:how many|count of|number of) (?:producers|companies|suppliers) (?:per|by|in each|for each) country")
+_TOP_PRODUCTS_RE = re.compile(r"(?:top|most common|most popular)\s*(\d+)?\s*products")
+_COUNT_IN_RE = re.compile(r"how many (?:(.+?) )?(?:producers|companies|suppliers)(?: are there)?(?: (?:in|from|based in) (.+?))?\??$")
+
+
+def _format_counts(title, pairs):
+    lines = [title]
+    lines.extend(f"- {name}: {count}" for name, count in pairs)
+    return "\n".join(lines)
+
+def answer_aggregate_question(store, question):
+    """
+    Answers simple count questions ("how many producers per category", "top 10 products",
+    "how many solar producers", "how many producers in Germany") from the aggregate store.
+    Returns the answer text, or None if the question is not a recognised aggregate question.
+    """
+    if not store.ready:
+        return None
+    q = " ".join(question.lower().split())
+
+    if _TOTAL_RE.match(q):
+        return f"There are {store.producers} producers in the database."
+    if _PER_CATEGORY_RE.search(q):
+        return _format_counts("Producers per category:", store.snapshot()["categories"])
+    if _PER_COUNTRY_RE.search(q):
+        return _format_counts("Producers per country:", store.snapshot()["countries"])
+    match = _TOP_PRODUCTS_RE.search(q)
+    if match:
+        n = int(match.group(1) or 10)
+        return _format_counts(f"Top {n} products by number of producers:", store.snapshot(n)["top_products"])
+
+    match = _COUNT_IN_RE.match(q)
+    if match:
+        category_text, country_text = match.group(1), match.group(2)
+        with store.lock:
+            category = store.categories.find(category_text) if category_text else None
+            country = store.countries.find(country_text) if country_text else None
+            if category_text and not category:
+                return None
+            if country_text and not country:
+                return None
+            if category and country:
+                # Cross counts are not precomputed; leave these to SQL/LLM
+                return None
+            if category:
+                return f"There are {store.categories.get(category)} {category} producers."
+            if country:
+                return f"There are {store.countries.get(country)} producers in {country}."
+    return None
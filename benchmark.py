@@ -0,0 +1,886 @@
+"""
+Headless benchmark suite for GlobalEnergyDB hot paths.
+
+Runs against seeded synthetic data (see synthetic_data.py) without a Tk display and
+with a fake Gemini backend, writes JSON results and compares them with a stored baseline.
+
+    python benchmark.py --sizes 10k 100k --output bench_results.json
+    python benchmark.py --sizes 10k --save-baseline
+    python benchmark.py --sizes 10k --baseline benchmark_baseline.json --threshold 0.25
+
+Exits with status 1 when any benchmark is slower than baseline by more than the threshold.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import ai_providers
+import ai_query
+import analytics
+import chat_session
+import enrichment
+import fixture_server
+import geocoding
+import file_scan
+import import_pipeline
+import local_answers
+import producers_repository as repo
+import prompts
+import row_store
+import scan_service
+import snapshot
+import source_watch
+import storage
+import synthetic_data
+import write_journal
+from file_scan import PYPDF2_AVAILABLE, read_pdf_text, identify_product_keywords
+from gemini_client import gemini_chat_response
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# ReportLab lays out the whole table in memory; larger exports are measured at this size
+PDF_EXPORT_ROW_CAP = 5000
+
+# PostgreSQL database for the pg_* cases (its producers table is dropped and refilled); skipped if unset
+POSTGRES_URL_ENV = "GEDB_BENCH_POSTGRES_URL"
+
+# Fixture websites crawled by the enrichment cases, and the latency added to each response
+ENRICHMENT_SITE_COUNT = 100
+ENRICHMENT_LATENCY_S = 0.005
+
+# Single-row producer edits per run of the edit benchmarks
+EDIT_COUNT = 200
+BULK_COUNT = 10000
+
+# Distinct free-text categories for the row store case; past the 65,535 that fit 16-bit category codes
+ROW_STORE_CATEGORY_COUNT = 70000
+
+# File scans for the worker pool cases: text files, plus PDFs when PyPDF2 is installed
+SCAN_FILE_COUNT = 16
+SCAN_FILE_LINES = 20000
+SCAN_PDF_PAGES = 100
+
+# Simulated Gemini round-trip for the batch query benchmarks
+BATCH_LLM_LATENCY_S = 0.05
+BATCH_QUESTION_COUNT = 50
+
+# Fixed question set for the AI provider cases, with reference SQL (None: not answerable from the table)
+SQL_QUESTIONS = [
+    ("How many producers are there?", "SELECT COUNT(*) FROM producers"),
+    ("How many solar producers are there?", "SELECT COUNT(*) FROM producers WHERE category = 'Solar'"),
+    ("Count producers by category", "SELECT category, COUNT(*) FROM producers GROUP BY category"),
+    ("Number of producers per category", "SELECT category, COUNT(*) FROM producers GROUP BY category"),
+    ("List all wind producers", "SELECT id FROM producers WHERE category = 'Wind'"),
+    ("Show nuclear companies in France", "SELECT id FROM producers WHERE category = 'Nuclear' AND address LIKE '%France%'"),
+    ("Which producers are located in Spain?", "SELECT id FROM producers WHERE address LIKE '%Spain%'"),
+    ("How many producers are based in Germany?", "SELECT COUNT(*) FROM producers WHERE address LIKE '%Germany%'"),
+    ("Which companies sell heat pumps?", "SELECT id FROM producers WHERE products LIKE '%heat pump%'"),
+    ("Producers that supply biodiesel", "SELECT id FROM producers WHERE products LIKE '%biodiesel%'"),
+    ("How many fossil fuel producers sell LNG?", "SELECT COUNT(*) FROM producers WHERE category = 'Fossil Fuel' AND products LIKE '%LNG%'"),
+    ("Producers without contact details", "SELECT id FROM producers WHERE contact IS NULL OR contact = ''"),
+    ("Find producers named Atlas", "SELECT id FROM producers WHERE name LIKE '%Atlas%'"),
+    ("Top 5 categories by number of producers", "SELECT category, COUNT(*) FROM producers GROUP BY category ORDER BY 2 DESC LIMIT 5"),
+    ("Hydro producers in Norway", "SELECT id FROM producers WHERE category = 'Hydro' AND address LIKE '%Norway%'"),
+    ("Count of geothermal suppliers in Iceland", "SELECT COUNT(*) FROM producers WHERE category = 'Geothermal' AND address LIKE '%Iceland%'"),
+    ("Which region has the cheapest natural gas?", None),
+    ("What is the capital of France?", None),
+    # Held out: written after the offline rules and never used to tune them
+    ("How many producers are not in Germany?", "SELECT COUNT(*) FROM producers WHERE address NOT LIKE '%Germany%'"),
+    ("Which producers don't sell solar panels?", "SELECT id FROM producers WHERE products NOT LIKE '%solar panel%'"),
+    ("Show producers except those in China", "SELECT id FROM producers WHERE address NOT LIKE '%China%'"),
+    ("Number of biofuel producers outside Brazil",
+     "SELECT COUNT(*) FROM producers WHERE category = 'Biofuel' AND address NOT LIKE '%Brazil%'"),
+    ("Show me everything about Siemens Energy", "SELECT id FROM producers WHERE name LIKE '%Siemens Energy%'"),
+    ("List producers in the oil and gas sector in Texas",
+     "SELECT id FROM producers WHERE category = 'Fossil Fuel' AND address LIKE '%Texas%'"),
+    ("What wind companies are there in Denmark?", "SELECT id FROM producers WHERE category = 'Wind' AND address LIKE '%Denmark%'"),
+    ("Companies making electrolysers in Germany",
+     "SELECT id FROM producers WHERE products LIKE '%electrolyser%' AND address LIKE '%Germany%'"),
+    ("Producers with no address", "SELECT id FROM producers WHERE address IS NULL OR address = ''"),
+    ("How many energy producers are there?", "SELECT COUNT(*) FROM producers"),
+    ("List the 3 largest hydro producers", None),
+    ("Which solar producers were founded after 2010?", None),
+]
+HEDGE_POLICY = ai_providers.CallPolicy(timeout_s=2.0, hedge_after_s=0.02, cooldown_s=3600)
+SLOW_LLM_LATENCY_S = 0.2
+
+CHAT_QUESTIONS = [
+    "Who makes solar panels?",
+    "List wind turbine suppliers",
+    "Tell me about Nordic Hydro Power",
+    "Which producers sell biodiesel?",
+    "What about geothermal heat pumps in Iceland?",
+]
+
+# Mix of simple and open-ended chatbot questions for the local answer benchmark
+LOCAL_ANSWER_QUESTIONS = CHAT_QUESTIONS + [
+    "Who makes solar panels?",
+    "Who sells heat pumps?",
+    "List wind producers",
+    "Which companies are in the hydro category?",
+    "Suppliers of biodiesel",
+    "Where can I buy LNG?",
+    "Show all the nuclear companies",
+    "What are the main risks of offshore wind?",
+    "Compare biofuel and geothermal suppliers",
+    "Which region has the cheapest natural gas?",
+]
+
+
+class FakeGeminiModel:
+    """Stands in for genai.GenerativeModel so chat paths run offline and deterministically."""
+
+    class _Response:
+        def __init__(self, text):
+            self.text = text
+
+    class _Chat:
+        def __init__(self, latency, reply, fail):
+            self.latency = latency
+            self.reply = reply
+            self.fail = fail
+
+        def send_message(self, prompt):
+            if self.latency:
+                time.sleep(self.latency)
+            if self.fail:
+                raise ConnectionError("fake Gemini outage")
+            return FakeGeminiModel._Response(self.reply or f"Answer based on {len(prompt)} characters of prompt.")
+
+    def __init__(self, latency=0.0, reply=None, fail=False):
+        self.latency = latency
+        self.reply = reply
+        self.fail = fail
+
+    def start_chat(self, history=None):
+        return FakeGeminiModel._Chat(self.latency, self.reply, self.fail)
+
+
+def parse_size(text):
+    """Parses sizes such as '10k', '100k' or '1m'."""
+    text = text.strip().lower()
+    multiplier = 1
+    if text.endswith("k"):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith("m"):
+        multiplier, text = 1000000, text[:-1]
+    return int(float(text) * multiplier)
+
+def time_call(func, repeat):
+    """Runs func repeat times and returns timing statistics in seconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(runs), "min_s": min(runs), "max_s": max(runs), "runs": runs}
+
+
+# --- Benchmark cases ---
+# Each case takes a BenchContext and returns a zero-argument callable to time,
+# or None if the case cannot run in this environment.
+
+class BenchContext:
+    """Per-size fixtures shared by the benchmark cases."""
+
+    def __init__(self, workdir, size, seed):
+        self.workdir = workdir
+        self.size = size
+        self.seed = seed
+        self.db_path = os.path.join(workdir, f"producers_{size}.sqlite")
+        synthetic_data.populate_database(self.db_path, size, seed)
+        self.conn = sqlite3.connect(self.db_path)
+        self.cursor = self.conn.cursor()
+        self._extra_conns = []
+        self._services = []
+        self._counter = 0
+        self._geocoded = False
+
+    def ensure_app_schema(self):
+        """Adds the triggers and indexes the app keeps on producers, so writes pay their real cost (not timed)."""
+        analytics.install_change_tracking(self.conn)
+        local_answers.install_search_index(self.conn)
+        geocoding.install_geo_schema(self.conn)
+
+    def ensure_geocoded(self):
+        """Adds the geo schema to the shared database and geocodes it once (not timed)."""
+        if not self._geocoded:
+            self.gazetteer = geocoding.Gazetteer()
+            geocoding.install_geo_schema(self.conn)
+            start = time.perf_counter()
+            geocoding.geocode_pending(self.conn, self.gazetteer)
+            print(f"  (geocoded {self.size} producers in {time.perf_counter() - start:.2f} s)")
+            self._geocoded = True
+
+    def snapshot_cursor(self):
+        """Builds a read-only snapshot of the shared database once (not timed) and returns a cursor on it."""
+        if not hasattr(self, "_snapshot_cursor"):
+            info = snapshot.build_snapshot(self.db_path, os.path.join(self.workdir, f"snapshot_{self.size}.sqlite"))
+            conn = snapshot.connect_readonly(info["path"])
+            self._extra_conns.append(conn)
+            self._snapshot_cursor = conn.cursor()
+        return self._snapshot_cursor
+
+    def postgres_cursor(self):
+        """
+        Fills the PostgreSQL database named by GEDB_BENCH_POSTGRES_URL with this size's data once
+        (not timed) and returns a cursor on it, or None when no server is configured.
+        """
+        url = os.environ.get(POSTGRES_URL_ENV)
+        if not url or not storage.PSYCOPG_AVAILABLE:
+            return None
+        if not hasattr(self, "_pg_conn"):
+            self._pg_backend = storage.PostgresBackend(url)
+            self._pg_conn = self._pg_backend.connect()
+            self._pg_conn.execute("DROP TABLE IF EXISTS producers")
+            repo.create_producers_table(self._pg_conn)
+            repo.insert_producers(self._pg_conn.cursor(), synthetic_data.generate_producers(self.size, self.seed))
+            self._pg_conn.commit()
+        return self._pg_conn.cursor()
+
+    def fixture_sites(self):
+        """Starts a local server with fixture websites once and returns (server, crawl targets)."""
+        if not hasattr(self, "_fixture_server"):
+            rows = list(synthetic_data.generate_producers(min(self.size, ENRICHMENT_SITE_COUNT), self.seed))
+            self._fixture_server = fixture_server.FixtureServer(fixture_server.build_fixture_sites(rows),
+                                                                delay=ENRICHMENT_LATENCY_S).start()
+            self._fixture_targets = [(i, enrichment.producer_website(row[1])) for i, row in enumerate(rows)]
+        return self._fixture_server, self._fixture_targets
+
+    def scan_files(self):
+        """Writes the files for the scan cases once (not timed)."""
+        if not hasattr(self, "_scan_files"):
+            self._scan_files = []
+            for i in range(SCAN_FILE_COUNT):
+                if PYPDF2_AVAILABLE and i % 2:
+                    path = self.scratch_path(".pdf")
+                    synthetic_data.write_text_pdf(path, SCAN_PDF_PAGES, seed=self.seed + i)
+                else:
+                    path = self.scratch_path(".txt")
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(synthetic_data.generate_spec_text(SCAN_FILE_LINES, self.seed + i))
+                self._scan_files.append(path)
+        return self._scan_files
+
+    def scan_service(self, workers):
+        """A scan service with its workers already started (not timed), closed along with the context."""
+        service = scan_service.ScanService(max_workers=workers)
+        service.map(_noop_scan_job, range(workers))
+        self._services.append(service)
+        return service
+
+    def connect(self, db_path):
+        """Opens an extra connection that is closed along with the context."""
+        conn = sqlite3.connect(db_path)
+        self._extra_conns.append(conn)
+        return conn
+
+    def scratch_path(self, suffix):
+        self._counter += 1
+        return os.path.join(self.workdir, f"scratch_{self.size}_{self._counter}{suffix}")
+
+    def close(self):
+        for conn in self._extra_conns:
+            conn.close()
+        for service in self._services:
+            service.close()
+        self.conn.close()
+        if hasattr(self, "_fixture_server"):
+            self._fixture_server.stop()
+        if hasattr(self, "_pg_conn"):
+            self._pg_conn.close()
+            self._pg_backend.close()
+
+
+def bench_search_by_name(ctx):
+    return lambda: repo.search_producers(ctx.cursor, "Solar", "Name")
+
+def bench_search_by_category(ctx):
+    return lambda: repo.search_producers(ctx.cursor, "Wind", "Category")
+
+def bench_load_all(ctx):
+    return lambda: repo.search_producers(ctx.cursor)
+
+def _traced_bytes(build):
+    tracemalloc.start()
+    try:
+        value = build()
+        return value, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+def bench_row_store_load_all(ctx):
+    rows, tuple_bytes = _traced_bytes(lambda: repo.search_producers(ctx.cursor))
+    store, store_bytes = _traced_bytes(lambda: repo.load_producer_store(ctx.cursor))
+    count = max(1, len(rows))
+    print(f"  (memory per producer: list of tuples {tuple_bytes / count:.0f} B, "
+          f"RowStore {store_bytes / count:.0f} B, {tuple_bytes / max(1, store_bytes):.1f}x smaller)")
+    return lambda: repo.load_producer_store(ctx.cursor)
+
+def bench_row_store_page(ctx):
+    store = repo.load_producer_store(ctx.cursor)
+    middle = len(store) // 2
+    return lambda: store.rows(middle, middle + 500)
+
+def bench_row_store_many_categories(ctx):
+    rows = [(pid, name, contact, address, products, f"{category} {pid}") for pid, (name, contact, address, products, category)
+            in enumerate(synthetic_data.generate_producers(ROW_STORE_CATEGORY_COUNT, ctx.seed), start=1)]
+    store = row_store.RowStore(rows)
+    if list(store) != rows:
+        raise AssertionError("RowStore did not return the rows it was built from")
+    print(f"  ({len(store.categories)} distinct categories, stored as '{store.category_codes.typecode}' codes)")
+    return lambda: row_store.RowStore(rows)
+
+def bench_import_csv(ctx):
+    csv_path = ctx.scratch_path(".csv")
+    synthetic_data.write_import_csv(csv_path, ctx.size, ctx.seed + 1)
+
+    def run():
+        db_path = ctx.scratch_path(".sqlite")
+        conn = sqlite3.connect(db_path)
+        try:
+            repo.create_producers_table(conn)
+            import_pipeline.import_files(conn, [csv_path], profiles={})
+        finally:
+            conn.close()
+            os.remove(db_path)
+    return run
+
+def _edit_rows(ctx):
+    return ctx.conn.execute("SELECT id, name, contact, address, products, category FROM producers ORDER BY id LIMIT ?",
+                            (EDIT_COUNT,)).fetchall()
+
+def _watched_master(ctx):
+    """
+    A database watching a folder with one master CSV (synced once, not timed), plus two versions
+    of that CSV differing in 1% of the rows. Returns (conn, watched csv path, [version paths]).
+    """
+    folder = ctx.scratch_path("_watched")
+    os.makedirs(folder)
+    original = ctx.scratch_path(".csv")
+    synthetic_data.write_import_csv(original, ctx.size, ctx.seed + 1)
+    with open(original, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    for row in rows[1::100]:
+        row[4] = "Wind" if row[4] != "Wind" else "Solar"
+    edited = ctx.scratch_path(".csv")
+    with open(edited, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+    conn = ctx.connect(ctx.scratch_path(".sqlite"))
+    repo.create_producers_table(conn)
+    source_watch.install_watch_schema(conn)
+    watched = os.path.join(folder, "master.csv")
+    _replace_watched(watched, original)
+    source_watch.add_source(conn, folder)
+    source_watch.sync_sources(conn, profiles={})
+    return conn, watched, [edited, original]
+
+def _replace_watched(watched, version):
+    shutil.copyfile(version, watched)
+    # Stamped in the past so the copy counts as settled, and distinct so each copy is seen as a change
+    stamp = time.time() - 2 * source_watch.SETTLE_SECONDS - len(_stamps)
+    _stamps.append(stamp)
+    os.utime(watched, (stamp, stamp))
+_stamps = []
+
+def bench_reimport_unchanged_master(ctx):
+    # What a daily re-import did before watched sources: every row is parsed and skipped as a duplicate
+    conn, watched, _ = _watched_master(ctx)
+    return lambda: import_pipeline.import_files(conn, [watched], profiles={})
+
+def bench_watch_sync_unchanged(ctx):
+    conn, _, _ = _watched_master(ctx)
+    return lambda: source_watch.sync_sources(conn, profiles={})
+
+def bench_watch_sync_1pct_changed(ctx):
+    conn, watched, versions = _watched_master(ctx)
+    turns = itertools.cycle(versions)
+
+    def run():
+        _replace_watched(watched, next(turns))
+        return source_watch.sync_sources(conn, profiles={})
+    summary = run()
+    print(f"  ({summary['updated']} updated and {summary['unchanged']} unchanged rows per sync)")
+    return run
+
+def bench_edits_commit_each(ctx):
+    rows = _edit_rows(ctx)
+    runs = iter(range(1, 10**9))
+
+    def run():
+        suffix = f" #{next(runs)}"  # a new value each run, so no update is a no-op
+        for pid, name, contact, address, products, category in rows:
+            repo.update_producer(ctx.cursor, pid, (name, contact + suffix, address, products, category))
+            ctx.conn.commit()
+    return run
+
+def bench_edits_journal(ctx):
+    rows = _edit_rows(ctx)
+    journal = write_journal.WriteJournal(ctx.conn)
+    runs = iter(range(1, 10**9))
+
+    def run():
+        suffix = f" #{next(runs)}"
+        for pid, name, contact, address, products, category in rows:
+            journal.update({pid: (name, contact + suffix, address, products, category)})
+        journal.flush()
+    return run
+
+# Bulk cases change the rows and undo the change in the same run, so the data stays as generated
+
+def _bulk_rows(ctx, count):
+    return ctx.conn.execute("SELECT id, name, contact, address, products, category FROM producers ORDER BY id LIMIT ?",
+                            (count,)).fetchall()
+
+def bench_recategorize_row_by_row(ctx):
+    ctx.ensure_app_schema()
+    rows = _bulk_rows(ctx, BULK_COUNT)
+
+    def run():
+        for pid, name, contact, address, products, category in rows:
+            repo.update_producer(ctx.cursor, pid, (name, contact, address, products, "Recategorized"))
+        ctx.conn.commit()
+        for pid, name, contact, address, products, category in rows:
+            repo.update_producer(ctx.cursor, pid, (name, contact, address, products, category))
+        ctx.conn.commit()
+    return run
+
+def _bench_bulk_recategorize(count):
+    def factory(ctx):
+        ctx.ensure_app_schema()
+        ids = [row[0] for row in _bulk_rows(ctx, count)]
+        journal = write_journal.WriteJournal(ctx.conn)
+
+        def run():
+            journal.recategorize(ids, "Recategorized")
+            journal.flush()
+            journal.undo()
+            journal.flush()
+        return run
+    return factory
+
+def bench_bulk_delete_undo(ctx):
+    ctx.ensure_app_schema()
+    ids = [row[0] for row in _bulk_rows(ctx, BULK_COUNT)]
+    journal = write_journal.WriteJournal(ctx.conn)
+
+    def run():
+        journal.delete(ids)
+        journal.flush()
+        journal.undo()
+        journal.flush()
+    return run
+
+def bench_export_csv(ctx):
+    out_path = ctx.scratch_path(".csv")
+    return lambda: repo.write_producers_csv(ctx.cursor, out_path)
+
+def bench_export_csv_row_store(ctx):
+    out_path = ctx.scratch_path(".csv")
+    store = repo.load_producer_store(ctx.cursor)
+    return lambda: repo.write_producers_csv(ctx.cursor, out_path, store)
+
+def bench_pg_load_all(ctx):
+    cursor = ctx.postgres_cursor()
+    return cursor and (lambda: repo.load_producer_store(cursor))
+
+def bench_pg_export_csv(ctx):
+    cursor = ctx.postgres_cursor()
+    out_path = ctx.scratch_path(".csv")
+    return cursor and (lambda: repo.write_producers_csv(cursor, out_path))
+
+def bench_pg_bulk_copy(ctx):
+    cursor = ctx.postgres_cursor()
+    if cursor is None:
+        return None
+    # Names that cannot clash with the rows already loaded
+    rows = [(f"copy-{row[0]}",) + tuple(row[1:]) for row in synthetic_data.generate_producers(ctx.size, ctx.seed + 2)]
+
+    def run():
+        repo.insert_producers(cursor, rows)
+        cursor.connection.rollback()  # keep the table at its original size between runs
+    return run
+
+def bench_export_pdf(ctx):
+    if not repo.REPORTLAB_AVAILABLE:
+        return None
+    rows = min(ctx.size, PDF_EXPORT_ROW_CAP)
+    db_path = ctx.db_path
+    if rows < ctx.size:
+        db_path = ctx.scratch_path(".sqlite")
+        synthetic_data.populate_database(db_path, rows, ctx.seed)
+    conn = ctx.connect(db_path)
+    out_path = ctx.scratch_path(".pdf")
+    return lambda: repo.write_producers_pdf(conn.cursor(), out_path)
+
+def bench_identify_keywords(ctx):
+    text = synthetic_data.generate_spec_text(max(1, ctx.size // 10), ctx.seed)
+    return lambda: identify_product_keywords(text)
+
+def bench_extract_pdf_text(ctx):
+    if not PYPDF2_AVAILABLE:
+        return None
+    pdf_path = ctx.scratch_path(".pdf")
+    synthetic_data.write_text_pdf(pdf_path, max(1, ctx.size // 1000), seed=ctx.seed)
+    return lambda: read_pdf_text(pdf_path)
+
+def _noop_scan_job(emit, item):
+    return item
+
+def _scan_in_process(files):
+    return [file_scan.scan_file(lambda update: None, path) for path in files]
+
+def bench_scan_files_in_process(ctx):
+    files = ctx.scan_files()
+    return lambda: _scan_in_process(files)
+
+def _scan_pool_case(ctx, workers):
+    files = ctx.scan_files()
+    service = ctx.scan_service(workers)
+    return lambda: service.map(file_scan.scan_file, files)
+
+def bench_scan_files_pool_1_worker(ctx):
+    return _scan_pool_case(ctx, 1)
+
+def bench_scan_files_pool_all_cores(ctx):
+    cores = os.cpu_count() or 1
+    run = _scan_pool_case(ctx, cores)
+    sequential = time_call(lambda: _scan_in_process(ctx.scan_files()), 1)["median_s"]
+    pooled = time_call(run, 1)["median_s"]
+    print(f"  ({len(ctx.scan_files())} files on {cores} worker(s): {sequential / pooled:.1f}x the in-process throughput, "
+          f"ideal {cores}.0x)")
+    return run
+
+def bench_retrieve_context(ctx):
+    return lambda: [repo.retrieve_context(ctx.cursor, q) for q in CHAT_QUESTIONS]
+
+def bench_chat_round_trip(ctx):
+    model = FakeGeminiModel()
+    return lambda: [gemini_chat_response(q, repo.retrieve_context(ctx.cursor, q), model=model) for q in CHAT_QUESTIONS]
+
+def bench_chat_session(ctx):
+    model = FakeGeminiModel()
+    questions = CHAT_QUESTIONS * 8  # 40 turns; the prompt size levels off once the budgets fill
+
+    def run():
+        session = chat_session.ChatSession(provider=ai_providers.GeminiProvider(model))
+        for q in questions:
+            session.ask(q, repo.retrieve_context_rows(ctx.cursor, q))
+    prompts.stats.reset()
+    run()
+    entry = prompts.stats.snapshot()["chat_session"]
+    print(f"  (prompt tokens per turn: avg {entry['avg_tokens']:.0f}, max {entry['max_tokens']}; "
+          f"{entry['truncated']} of {entry['prompts']} prompts cut to the budget)")
+    return run
+
+def bench_local_answers(ctx):
+    local_answers.install_search_index(ctx.conn)
+    answered = sum(1 for q in LOCAL_ANSWER_QUESTIONS if local_answers.answer_question(ctx.conn, q))
+    print(f"  (answered locally: {answered} of {len(LOCAL_ANSWER_QUESTIONS)} questions)")
+    return lambda: [local_answers.answer_question(ctx.conn, q) for q in LOCAL_ANSWER_QUESTIONS]
+
+def bench_geocode_addresses(ctx):
+    gazetteer = geocoding.Gazetteer()
+    addresses = [row[2] for row in synthetic_data.generate_producers(min(ctx.size, 10000), ctx.seed)]
+    return lambda: [gazetteer.geocode(a) for a in addresses]
+
+def bench_geo_radius(ctx):
+    ctx.ensure_geocoded()
+    site = ctx.gazetteer.resolve_site("Berlin")
+    return lambda: geocoding.within_radius(ctx.conn, site[0], site[1], 200, limit=100)
+
+def bench_geo_radius_count(ctx):
+    ctx.ensure_geocoded()
+    site = ctx.gazetteer.resolve_site("Madrid")
+    return lambda: geocoding.count_within_radius(ctx.conn, site[0], site[1], 200)
+
+def bench_geo_bbox(ctx):
+    ctx.ensure_geocoded()
+    # Roughly Denmark: a small box holding the Copenhagen and Aarhus clusters
+    return lambda: geocoding.within_bbox(ctx.conn, 54.5, 8.0, 57.8, 13.0, limit=100)
+
+def bench_geo_region_counts(ctx):
+    ctx.ensure_geocoded()
+    return lambda: geocoding.region_counts(ctx.conn)
+
+def bench_snapshot_load_all(ctx):
+    cursor = ctx.snapshot_cursor()
+    return lambda: repo.search_producers(cursor)
+
+def bench_snapshot_search_name(ctx):
+    cursor = ctx.snapshot_cursor()
+    return lambda: repo.search_producers(cursor, "Solar", "Name")
+
+def bench_snapshot_build(ctx):
+    return lambda: snapshot.build_snapshot(ctx.db_path, ctx.scratch_path(".sqlite"))
+
+def _batch_query_case(ctx, concurrency):
+    provider = ai_providers.GeminiProvider(
+        FakeGeminiModel(BATCH_LLM_LATENCY_S, reply="SELECT id, name, category FROM producers WHERE category = 'Solar' LIMIT 100"))
+    # 50 pasted questions with some repeats, as analysts tend to send
+    questions = [f"List solar producers, batch question {i % 40}" for i in range(BATCH_QUESTION_COUNT)]
+
+    def run():
+        pool = ai_query.ReadConnectionPool(lambda: ai_query.connect_read_only(ctx.db_path))
+        try:
+            ai_query.run_batch(questions, provider, pool, lambda result: None, concurrency)
+        finally:
+            pool.close()
+    return run
+
+def bench_ai_batch_sequential(ctx):
+    return _batch_query_case(ctx, 1)
+
+def bench_ai_batch_concurrent(ctx):
+    return _batch_query_case(ctx, ai_query.DEFAULT_CONCURRENCY)
+
+def _same_results(cursor, sql, reference):
+    """
+    True if sql returns the reference query's rows. Only the reference's columns are compared
+    (generated SQL may select more), and row order only where the reference sets one.
+    """
+    expected = cursor.execute(reference).fetchall()
+    width = len(cursor.description)
+    rows = [row[:width] for row in cursor.execute(sql).fetchall()]
+    if "ORDER BY" in reference.upper():
+        return rows == expected
+    return sorted(rows, key=repr) == sorted(expected, key=repr)
+
+def _sql_question_case(ctx, providers, policy=ai_providers.DEFAULT_POLICY):
+    """
+    Answers SQL_QUESTIONS through a router; prints how many match the reference results, how many
+    were declined (INVALID_QUERY) and how many got wrong SQL, and who answered.
+    """
+    router = ai_providers.ProviderRouter(providers, policy)
+    cursor = ctx.conn.cursor()
+
+    def run():
+        answers = []
+        for question, _ in SQL_QUESTIONS:
+            try:
+                answers.append(ai_query.generate_sql(router, question))
+            except ai_providers.ProviderError:
+                answers.append((None, None))
+        return answers
+
+    correct = declined = 0
+    for (_, reference), (sql, _) in zip(SQL_QUESTIONS, run()):
+        if sql is None and reference is not None:
+            declined += 1
+            continue
+        try:
+            correct += (sql is None) if reference is None else _same_results(cursor, sql, reference)
+        except sqlite3.Error:
+            pass
+    answered_by = {name: entry["answers"] for name, entry in router.snapshot().items()}
+    print(f"  (correct: {correct}, declined: {declined}, wrong: {len(SQL_QUESTIONS) - correct - declined} "
+          f"of {len(SQL_QUESTIONS)} questions; answers by provider: {answered_by})")
+    return run
+
+def bench_ai_sql_local(ctx):
+    return _sql_question_case(ctx, [ai_providers.LocalProvider()])
+
+def bench_ai_sql_slow_remote_hedged(ctx):
+    # The fake remote answers INVALID_QUERY after SLOW_LLM_LATENCY_S; the local backend is asked after 20 ms
+    slow = FakeGeminiModel(SLOW_LLM_LATENCY_S, reply="INVALID_QUERY")
+    return _sql_question_case(ctx, [ai_providers.GeminiProvider(slow), ai_providers.LocalProvider()], HEDGE_POLICY)
+
+def bench_ai_sql_remote_down(ctx):
+    # After FAILURE_LIMIT errors the router stops calling the remote and answers locally straight away
+    down = FakeGeminiModel(0.01, fail=True)
+    return _sql_question_case(ctx, [ai_providers.GeminiProvider(down), ai_providers.LocalProvider()], HEDGE_POLICY)
+
+def bench_ai_sql_gemini(ctx):
+    provider = ai_providers.GeminiProvider()
+    if not provider.available():
+        return None
+    return _sql_question_case(ctx, [provider])
+
+def _enrichment_case(ctx, label, warm, concurrency=enrichment.DEFAULT_CONCURRENCY, per_host=enrichment.PER_HOST_CONCURRENCY):
+    server, targets = ctx.fixture_sites()
+    warm_cache = ctx.scratch_path("_cache")
+
+    def run(cache_dir=None):
+        # A warm run revalidates every page of a filled cache (max_age=0), so each request is a 304
+        return enrichment.crawl(targets, lambda result: None, cache_dir=cache_dir or ctx.scratch_path("_cache"),
+                                concurrency=concurrency, per_host=per_host, host_map=server.host_map(),
+                                max_age=0 if warm else enrichment.CACHE_MAX_AGE)
+    if warm:
+        run(warm_cache)
+    before = server.stats()[0]
+    stats = run(warm_cache if warm else None)
+    print(f"  ({label}: {len(targets)} sites, {stats['requests']} requests, {stats['not_modified']} not modified, "
+          f"{stats['reused_connections']} on reused connections, {stats['bytes']} bytes; "
+          f"server saw {server.stats()[0] - before} requests, at most {server.stats()[1]} at once per host)")
+    return (lambda: run(warm_cache)) if warm else run
+
+def bench_enrichment_sequential(ctx):
+    return _enrichment_case(ctx, "one request at a time", False, concurrency=1, per_host=1)
+
+def bench_enrichment_cold(ctx):
+    return _enrichment_case(ctx, "empty cache", False)
+
+def bench_enrichment_revalidate(ctx):
+    return _enrichment_case(ctx, "cached, revalidated", True)
+
+BENCHMARKS = {
+    "load_producers_all": bench_load_all,
+    "load_producers_search_name": bench_search_by_name,
+    "load_producers_search_category": bench_search_by_category,
+    "row_store_load_all": bench_row_store_load_all,
+    "row_store_page_500": bench_row_store_page,
+    "row_store_70k_categories": bench_row_store_many_categories,
+    "import_producers_from_file": bench_import_csv,
+    "reimport_unchanged_master_csv": bench_reimport_unchanged_master,
+    "watch_sync_unchanged": bench_watch_sync_unchanged,
+    "watch_sync_1pct_changed": bench_watch_sync_1pct_changed,
+    "edit_200_commit_each": bench_edits_commit_each,
+    "edit_200_journal_coalesced": bench_edits_journal,
+    "recategorize_10k_row_by_row": bench_recategorize_row_by_row,
+    "bulk_recategorize_1": _bench_bulk_recategorize(1),
+    "bulk_recategorize_10k": _bench_bulk_recategorize(BULK_COUNT),
+    "bulk_delete_undo_10k": bench_bulk_delete_undo,
+    "export_to_csv": bench_export_csv,
+    "export_to_csv_row_store": bench_export_csv_row_store,
+    "export_to_pdf": bench_export_pdf,
+    "identify_product_keywords": bench_identify_keywords,
+    "extract_text_from_pdf": bench_extract_pdf_text,
+    "scan_files_in_process": bench_scan_files_in_process,
+    "scan_files_pool_1_worker": bench_scan_files_pool_1_worker,
+    "scan_files_pool_all_cores": bench_scan_files_pool_all_cores,
+    "retrieve_context": bench_retrieve_context,
+    "chat_round_trip_fake_gemini": bench_chat_round_trip,
+    "chat_session_40_turns_fake_gemini": bench_chat_session,
+    "chat_local_answers": bench_local_answers,
+    "ai_batch_query_50_sequential": bench_ai_batch_sequential,
+    "ai_batch_query_50_concurrent": bench_ai_batch_concurrent,
+    "ai_sql_questions_local": bench_ai_sql_local,
+    "ai_sql_questions_slow_remote_hedged": bench_ai_sql_slow_remote_hedged,
+    "ai_sql_questions_remote_down": bench_ai_sql_remote_down,
+    "ai_sql_questions_gemini": bench_ai_sql_gemini,
+    "geocode_addresses_10k": bench_geocode_addresses,
+    "geo_within_radius_200km": bench_geo_radius,
+    "geo_count_within_radius_200km": bench_geo_radius_count,
+    "geo_within_bbox": bench_geo_bbox,
+    "geo_region_counts": bench_geo_region_counts,
+    "snapshot_load_producers_all": bench_snapshot_load_all,
+    "snapshot_search_name": bench_snapshot_search_name,
+    "snapshot_build": bench_snapshot_build,
+    "enrichment_crawl_sequential": bench_enrichment_sequential,
+    "enrichment_crawl_cold": bench_enrichment_cold,
+    "enrichment_crawl_revalidate": bench_enrichment_revalidate,
+    "pg_load_producers_all": bench_pg_load_all,
+    "pg_export_csv_server_cursor": bench_pg_export_csv,
+    "pg_import_copy": bench_pg_bulk_copy,
+}
+
+
+def run_benchmarks(sizes, repeat=3, seed=42, selected=None, workdir=None):
+    """Runs the selected benchmarks for every size and returns the results document."""
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            print(f"Preparing {size} synthetic producers...")
+            ctx = BenchContext(tmp, size, seed)
+            size_results = {}
+            try:
+                for name, factory in BENCHMARKS.items():
+                    if selected and name not in selected:
+                        continue
+                    func = factory(ctx)
+                    if func is None:
+                        print(f"  {name}: skipped (optional library or server not available)")
+                        size_results[name] = {"skipped": True}
+                        continue
+                    stats = time_call(func, repeat)
+                    size_results[name] = stats
+                    print(f"  {name}: median {stats['median_s'] * 1000:.2f} ms")
+            finally:
+                ctx.close()
+            results[str(size)] = size_results
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+def compare_to_baseline(current, baseline, threshold):
+    """
+    Returns a list of (size, benchmark, baseline_s, current_s, ratio) tuples for
+    benchmarks whose median time grew by more than threshold (e.g. 0.25 = 25%).
+    """
+    regressions = []
+    for size, benches in current["results"].items():
+        for name, stats in benches.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base or base.get("skipped") or stats.get("skipped"):
+                continue
+            ratio = stats["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+            if ratio > 1 + threshold:
+                regressions.append((size, name, base["median_s"], stats["median_s"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark GlobalEnergyDB hot paths on synthetic data.")
+    parser.add_argument("--sizes", nargs="+", default=["10k"], help="Producer counts, e.g. 10k 100k 1m")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (median is compared)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--workdir", help="Directory for temporary databases (defaults to the system temp dir)")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes]
+    current = run_benchmarks(sizes, args.repeat, args.seed, args.only, args.workdir)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(current, baseline, args.threshold)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}.")
+        return 0
+    print(f"Regressions beyond {args.threshold:.0%} against {args.baseline}:")
+    for size, name, base_s, cur_s, ratio in regressions:
+        print(f"  [{size}] {name}: {base_s * 1000:.2f} ms -> {cur_s * 1000:.2f} ms ({ratio:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Chatbot sessions with bounded memory.
+
+Each chatbot window keeps one ChatSession. Every prompt is assembled from four parts, each
+held to its own token budget, so prompt size stays bounded however long the chat runs:
+  - producer facts retrieved so far, deduplicated across turns (least recently used dropped first),
+  - a rolling summary of older turns,
+  - the most recent turns verbatim,
+  - the new question.
+Token counts are estimated locally by prompts.estimate_tokens; no tokenizer call is made.
+Answers come from an AI provider (by default the shared Gemini/offline router in ai_providers.py).
+"""
+import re
+import time
+from collections import OrderedDict, deque
+
+import ai_providers
+import instrumentation
+import producers_repository as repo
+import prompts
+from prompts import estimate_tokens
+
+HISTORY_TOKEN_BUDGET = 1200
+SUMMARY_TOKEN_BUDGET = 300
+FACTS_TOKEN_BUDGET = 800
+SUMMARY_ANSWER_CHARS = 160
+
+WEB_SEARCH_TAG_RE = re.compile(r'\[WEB_SEARCH_SUGGESTION:\s*(.*?)\s*\]')
+
+ERROR_MESSAGE = "I'm sorry, I encountered an error while processing your request. Please try again."
+
+
+def _first_sentence(text, limit=SUMMARY_ANSWER_CHARS):
+    text = " ".join(text.split())
+    for end in (". ", "? ", "! ", "\n"):
+        cut = text.find(end)
+        if 0 < cut < limit:
+            return text[:cut + 1]
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+class ChatSession:
+    """Conversation state for one chatbot window. Not thread-safe; send one message at a time."""
+
+    def __init__(self, provider=None, history_budget=HISTORY_TOKEN_BUDGET, summary_budget=SUMMARY_TOKEN_BUDGET,
+                 facts_budget=FACTS_TOKEN_BUDGET):
+        self.provider = provider
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self.facts_budget = facts_budget
+        self.turns = deque()  # (question, answer, tokens)
+        self.history_tokens = 0
+        self.summary = deque()  # (line, tokens)
+        self.summary_tokens = 0
+        self.summary_dropped = False
+        self.facts = OrderedDict()  # producer name -> (context line, tokens)
+        self.facts_tokens = 0
+        self.stats = []  # one dict per turn
+
+    # --- Memory management ---
+
+    def add_facts(self, rows):
+        """Adds retrieved (name, products, category) rows; returns (new, already known) counts."""
+        new = reused = 0
+        for row in rows:
+            if row[0] in self.facts:
+                self.facts.move_to_end(row[0])
+                reused += 1
+                continue
+            line = repo.format_context_row(row)
+            tokens = estimate_tokens(line)
+            self.facts[row[0]] = (line, tokens)
+            self.facts_tokens += tokens
+            new += 1
+        while self.facts_tokens > self.facts_budget and len(self.facts) > 1:
+            _, (_, tokens) = self.facts.popitem(last=False)
+            self.facts_tokens -= tokens
+        return new, reused
+
+    def record_turn(self, question, answer):
+        """Appends a finished turn, compacting the oldest turns into the summary when over budget."""
+        tokens = estimate_tokens(question) + estimate_tokens(answer)
+        self.turns.append((question, answer, tokens))
+        self.history_tokens += tokens
+        while self.history_tokens > self.history_budget and len(self.turns) > 1:
+            old_question, old_answer, old_tokens = self.turns.popleft()
+            self.history_tokens -= old_tokens
+            self._summarize(old_question, old_answer)
+
+    def _summarize(self, question, answer):
+        line = f"- User asked: {_first_sentence(question)} Answer: {_first_sentence(answer)}"
+        tokens = estimate_tokens(line)
+        self.summary.append((line, tokens))
+        self.summary_tokens += tokens
+        while self.summary_tokens > self.summary_budget and len(self.summary) > 1:
+            _, dropped = self.summary.popleft()
+            self.summary_tokens -= dropped
+            self.summary_dropped = True
+
+    def prompt_values(self, question):
+        """The CHAT_SESSION template values for a question: instructions, context, memory and question."""
+        if self.facts:
+            context = "Context (producer information from the database):\n" + \
+                      "\n".join(line for line, _ in self.facts.values()) + repo.GENERAL_DB_INFO
+        else:
+            context = "Context:\nNo specific producer data found in the database for your query." + repo.GENERAL_DB_INFO
+        memory = []
+        if self.summary:
+            header = "Summary of the earlier conversation" + (" (oldest part omitted)" if self.summary_dropped else "") + ":"
+            memory.append(header + "\n" + "\n".join(line for line, _ in self.summary))
+        if self.turns:
+            memory.append("Recent conversation:\n" + "\n".join(f"User: {q}\nAssistant: {a}" for q, a, _ in self.turns))
+        return {"instructions": prompts.CHAT_INSTRUCTIONS.render(question=question), "context": context,
+                "memory": "".join("\n\n" + part for part in memory), "question": question}
+
+    # --- Turns ---
+
+    def ask(self, question, rows):
+        """
+        Answers a question with the given retrieved rows plus the session memory.
+        Returns the raw response (which may contain a web search suggestion tag).
+        """
+        new_facts, reused_facts = self.add_facts(rows)
+        provider = self.provider or ai_providers.default_router()
+        values = self.prompt_values(question)
+        start = time.perf_counter()
+        try:
+            # rows is not a template field; the offline backend answers from it
+            completion = provider.complete(prompts.CHAT_SESSION, rows=rows, **values)
+        except Exception as e:
+            instrumentation.count("chat.errors")
+            return f"{ERROR_MESSAGE} ({e})"
+        prompt_tokens = 0 if completion.provider == "local" else prompts.CHAT_SESSION.estimate_tokens(**values)
+        self._add_stats(completion.provider, prompt_tokens, completion.text, time.perf_counter() - start,
+                        new_facts, reused_facts)
+        self.record_turn(question, WEB_SEARCH_TAG_RE.sub("", completion.text).strip())
+        return completion.text
+
+    def record_local_answer(self, question, answer, seconds):
+        """Records a turn answered without the LLM (e.g. from analytics) so follow-ups can refer to it."""
+        self._add_stats("local", 0, answer, seconds, 0, 0)
+        self.record_turn(question, answer)
+
+    def _add_stats(self, source, prompt_tokens, answer, seconds, new_facts, reused_facts):
+        stats = {
+            "turn": len(self.stats) + 1,
+            "source": source,
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": estimate_tokens(answer),
+            "history_tokens": self.history_tokens,
+            "summary_tokens": self.summary_tokens,
+            "facts_tokens": self.facts_tokens,
+            "new_facts": new_facts,
+            "reused_facts": reused_facts,
+            "latency_ms": seconds * 1000,
+        }
+        self.stats.append(stats)
+        if source != "local":
+            instrumentation.count("chat.prompt_tokens", stats["prompt_tokens"])
+            instrumentation.count("chat.response_tokens", stats["response_tokens"])
+            instrumentation.count("chat.reused_facts", reused_facts)
+            if instrumentation.is_enabled():
+                instrumentation.record("chat.turn", seconds)
+        return stats
+
+    def last_stats(self):
+        return self.stats[-1] if self.stats else None
@@ -0,0 +1,711 @@
+"""
+Web enrichment: crawls producer websites for contact, address and product candidates.
+
+A producer's website comes from its contact field: a URL, or the domain of a company email
+address. Sites are crawled on an asyncio event loop, with the blocking HTTP calls in worker
+threads:
+  - at most PER_HOST_CONCURRENCY requests run against one host, and `concurrency` overall,
+  - keep-alive connections are reused per host,
+  - robots.txt is read once per host and obeyed,
+  - responses are kept in an on-disk cache; stale entries are revalidated with
+    If-None-Match / If-Modified-Since, so an unchanged page costs a 304 without a body,
+  - each site's home page is read, plus a few of its contact/about/product pages.
+Nothing found is written to the producers table directly. Candidates go to a review queue
+(the enrichment_candidates table), where each one is accepted or rejected by hand.
+"""
+import asyncio
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import urllib.robotparser
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import producers_repository as repo
+from instrumentation import timed
+
+USER_AGENT = "GlobalEnergyDB-Enrichment/1.0"
+DEFAULT_CONCURRENCY = 8
+PER_HOST_CONCURRENCY = 2
+REQUEST_TIMEOUT = 10  # seconds
+MAX_PAGES_PER_SITE = 4  # the home page plus up to three linked pages
+MAX_BODY_BYTES = 2 * 1024 * 1024
+MAX_REDIRECTS = 3
+CACHE_MAX_AGE = 24 * 3600  # cached pages younger than this are used without a request
+ROBOTS_MAX_AGE = 24 * 3600
+DEFAULT_CACHE_DIR = "enrichment_cache"
+# "address:port" of a fixture_server.py instance to crawl instead of the real sites
+FIXTURES_ENV = "GEDB_ENRICHMENT_FIXTURES"
+
+FIELD_CONTACT = "contact"
+FIELD_ADDRESS = "address"
+FIELD_PRODUCTS = "products"
+
+# Linked pages worth reading for contact details and products
+FOLLOW_LINK_RE = re.compile(r"contact|about|impressum|imprint|product|solution|company|location", re.IGNORECASE)
+PRODUCT_PAGE_RE = re.compile(r"product|solution|portfolio|offer", re.IGNORECASE)
+
+# Email domains that say nothing about the producer's own website
+FREE_MAIL_DOMAINS = {"gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com", "live.com", "aol.com",
+                     "icloud.com", "gmx.de", "gmx.net", "web.de", "mail.ru", "qq.com", "163.com", "proton.me", "protonmail.com"}
+
+EMAIL_RE = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+PHONE_RE = re.compile(r"(?<![\w+])\+?\(?\d{1,4}\)?(?:[ .-]?\(?\d{2,5}\)?){2,5}(?!\w)")
+URL_RE = re.compile(r"\b(?:https?://|www\.)[^\s,;]+", re.IGNORECASE)
+_IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp")
+
+
+def producer_website(contact):
+    """Returns the website URL implied by a contact field (a URL, or a company email's domain), or None."""
+    if not contact:
+        return None
+    match = URL_RE.search(contact)
+    if match:
+        url = match.group(0).rstrip(".)")
+        return url if url.lower().startswith("http") else "https://" + url
+    match = EMAIL_RE.search(contact)
+    if match:
+        domain = match.group(0).split("@", 1)[1].lower()
+        if domain not in FREE_MAIL_DOMAINS:
+            return f"https://{domain}/"
+    return None
+
+def fixture_host_map():
+    """Returns the host_map for the fixture server named in GEDB_ENRICHMENT_FIXTURES, or None."""
+    value = os.environ.get(FIXTURES_ENV, "")
+    if not value:
+        return None
+    address, _, port = value.rpartition(":")
+    return {"*": (address or "127.0.0.1", int(port))}
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return parts.scheme.lower(), parts.netloc.lower()
+
+
+# --- On-disk HTTP cache ---
+
+class HttpCache:
+    """
+    Stores responses as <sha256 of url>.body plus a .json file with the status, validators
+    (ETag, Last-Modified) and fetch time. Safe to share between threads.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".json", base + ".body"
+
+    def get(self, url):
+        """Returns the cached entry (a dict with 'body' bytes) or None."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                meta["body"] = f.read()
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta_path, meta):
+        temp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, meta_path)
+
+    def put(self, url, status, headers, body, final_url):
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        temp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, body_path)
+        # The metadata is written last, so a reader never pairs it with a half-written body
+        self._write_meta(meta_path, {
+            "url": url, "final_url": final_url, "status": status, "fetched_at": time.time(),
+            "etag": headers.get("etag"), "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type", ""),
+        })
+
+    def touch(self, url, entry):
+        """Marks a revalidated (304) entry as fresh again."""
+        meta = {k: v for k, v in entry.items() if k != "body"}
+        meta["fetched_at"] = time.time()
+        self._write_meta(self._paths(url)[0], meta)
+
+
+# --- HTTP fetching ---
+
+class _HostConnections:
+    """Idle keep-alive connections per (scheme, host), handed to one thread at a time."""
+
+    def __init__(self, timeout, host_map=None):
+        self.timeout = timeout
+        self.host_map = host_map or {}
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Returns (connection, reused)."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, netloc = key
+        mapped = self.host_map.get(netloc) or self.host_map.get("*")
+        if mapped:
+            # Mapped hosts are local fixture sites, served over plain HTTP
+            return http.client.HTTPConnection(*mapped, timeout=self.timeout), False
+        parts = urlsplit(f"//{netloc}")
+        if scheme == "https":
+            return http.client.HTTPSConnection(parts.hostname, parts.port, timeout=self.timeout), False
+        return http.client.HTTPConnection(parts.hostname, parts.port, timeout=self.timeout), False
+
+    def release(self, key, conn, reusable):
+        if not reusable:
+            conn.close()
+            return
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+class Fetcher:
+    """
+    Blocking, thread-safe page fetcher with an on-disk cache and connection reuse.
+    host_map maps a host name (or "*" for every host) to the (address, port) to connect to,
+    which lets the crawler reach fixture sites on a local server while sending their real
+    Host header.
+    """
+
+    def __init__(self, cache, timeout=REQUEST_TIMEOUT, max_age=CACHE_MAX_AGE, host_map=None):
+        self.cache = cache
+        self.max_age = max_age
+        self.connections = _HostConnections(timeout, host_map)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "downloaded": 0, "not_modified": 0, "cache_hits": 0,
+                      "reused_connections": 0, "bytes": 0, "errors": 0, "robots_blocked": 0}
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def _send(self, url, headers):
+        """One HTTP GET on a pooled connection; returns (status, lowercased headers, body)."""
+        key = _host_key(url)
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        request_headers = {"Host": parts.netloc, "User-Agent": USER_AGENT, "Accept-Encoding": "gzip",
+                           "Connection": "keep-alive"}
+        request_headers.update(headers)
+        for attempt in range(2):
+            conn, reused = self.connections.acquire(key)
+            try:
+                conn.request("GET", path, headers=request_headers)
+                response = conn.getresponse()
+                body = response.read(MAX_BODY_BYTES + 1)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                # A kept-alive connection may have been closed by the server; retry once on a new one
+                if reused and attempt == 0:
+                    continue
+                raise
+            self._count("requests")
+            if reused:
+                self._count("reused_connections")
+            too_large = len(body) > MAX_BODY_BYTES
+            self.connections.release(key, conn, not response.will_close and not too_large)
+            response_headers = {k.lower(): v for k, v in response.getheaders()}
+            if response_headers.get("content-encoding") == "gzip":
+                body = gzip.decompress(body)
+            return response.status, response_headers, body[:MAX_BODY_BYTES]
+
+    def fetch(self, url):
+        """
+        Returns {'url', 'final_url', 'status', 'body', 'content_type', 'source'} where source is
+        'cache' (fresh), 'not_modified' (revalidated) or 'network'. Raises OSError/HTTPException.
+        """
+        url = urldefrag(url)[0]
+        entry = self.cache.get(url)
+        if entry and time.time() - entry["fetched_at"] < self.max_age:
+            self._count("cache_hits")
+            return self._result(url, entry, "cache")
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        target = url
+        for _ in range(MAX_REDIRECTS + 1):
+            try:
+                status, response_headers, body = self._send(target, headers)
+            except (OSError, http.client.HTTPException):
+                self._count("errors")
+                raise
+            if status in (301, 302, 303, 307, 308) and response_headers.get("location"):
+                target = urljoin(target, response_headers["location"])
+                continue
+            break
+        if status == 304 and entry:
+            self._count("not_modified")
+            self.cache.touch(url, entry)
+            return self._result(url, entry, "not_modified")
+        self._count("downloaded")
+        self._count("bytes", len(body))
+        if status == 200:
+            self.cache.put(url, status, response_headers, body, target)
+        return {"url": url, "final_url": target, "status": status, "body": body,
+                "content_type": response_headers.get("content-type", ""), "source": "network"}
+
+    @staticmethod
+    def _result(url, entry, source):
+        return {"url": url, "final_url": entry.get("final_url", url), "status": entry["status"], "body": entry["body"],
+                "content_type": entry.get("content_type", ""), "source": source}
+
+    def close(self):
+        self.connections.close()
+
+
+class RobotsCache:
+    """robots.txt rules per host, fetched through the Fetcher (and so through the HTTP cache)."""
+
+    def __init__(self, fetcher, max_age=ROBOTS_MAX_AGE):
+        self.fetcher = fetcher
+        self.max_age = max_age
+        self._parsers = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _parser(self, url):
+        scheme, netloc = _host_key(url)
+        with self._lock:
+            host_lock = self._locks.setdefault(netloc, threading.Lock())
+        # One fetch per host even when several pages of it are requested at once
+        with host_lock:
+            cached = self._parsers.get(netloc)
+            if cached and time.time() - cached[1] < self.max_age:
+                return cached[0]
+            parser = urllib.robotparser.RobotFileParser()
+            try:
+                result = self.fetcher.fetch(f"{scheme}://{netloc}/robots.txt")
+                status = result["status"]
+            except (OSError, http.client.HTTPException):
+                status = None
+            if status == 200:
+                parser.parse(result["body"].decode('utf-8', errors='replace').splitlines())
+            elif status in (401, 403) or status is None or status >= 500:
+                parser.disallow_all = True
+            else:
+                parser.allow_all = True  # no robots.txt
+            self._parsers[netloc] = (parser, time.time())
+            return parser
+
+    def allowed(self, url):
+        return self._parser(url).can_fetch(USER_AGENT, url)
+
+
+# --- Extraction ---
+
+class _PageParser(HTMLParser):
+    """Collects visible text, links, <address> blocks, list items, schema.org microdata and JSON-LD."""
+
+    _CAPTURED_TAGS = {"a": "a", "address": "address", "li": "li"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.links = []  # (href, link text)
+        self.addresses = []
+        self.itemprops = []  # (property, value)
+        self.json_ld = []
+        self.list_items = []
+        self._skip = 0
+        self._capture = []  # open captures: [(tag, element number), kind, extra, text parts]
+        self._elements = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self._elements += 1
+        element = (tag, self._elements)
+        if tag in ("script", "style", "noscript"):
+            if tag == "script" and (attrs.get("type") or "").lower() == "application/ld+json":
+                self._capture.append([element, "json_ld", None, []])
+            else:
+                self._skip += 1
+            return
+        kind = self._CAPTURED_TAGS.get(tag)
+        if kind and (kind != "a" or attrs.get("href")):
+            self._capture.append([element, kind, attrs.get("href"), []])
+        # Properties with nested items (itemscope) are read from their children instead
+        if attrs.get("itemprop") and "itemscope" not in attrs:
+            if attrs.get("content"):
+                self.itemprops.append((attrs["itemprop"], attrs["content"]))
+            else:
+                self._capture.append([element, "itemprop", attrs["itemprop"], []])
+        if tag in ("br", "p", "div", "tr"):
+            self._feed_text("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "noscript") and not (self._capture and self._capture[-1][1] == "json_ld"):
+            self._skip = max(0, self._skip - 1)
+            return
+        # Close the captures this element opened (an element can open two: e.g. <li itemprop=...>)
+        if not self._capture or self._capture[-1][0][0] != tag:
+            return
+        element = self._capture[-1][0]
+        while self._capture and self._capture[-1][0] == element:
+            _, kind, extra, parts = self._capture.pop()
+            raw = "".join(parts)
+            value = " ".join(raw.split())
+            if kind == "json_ld":
+                self.json_ld.append(raw)
+            elif kind == "a":
+                self.links.append((extra, value))
+            elif kind == "address":
+                self.addresses.append(", ".join(p.strip(" ,") for p in raw.splitlines() if p.strip(" ,")))
+            elif kind == "li" and value:
+                self.list_items.append(value)
+            elif kind == "itemprop" and value:
+                self.itemprops.append((extra, value))
+
+    def _feed_text(self, data):
+        for capture in self._capture:
+            capture[3].append(data)
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self._feed_text(data)
+        if not (self._capture and self._capture[-1][1] == "json_ld"):
+            self.text.append(data)
+
+
+def _json_ld_objects(raw):
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, dict):
+            yield item
+            stack.extend(v for v in item.values() if isinstance(v, (dict, list)))
+
+def _format_postal_address(address):
+    if isinstance(address, str):
+        return address.strip()
+    if not isinstance(address, dict):
+        return ""
+    country = address.get("addressCountry", "")
+    if isinstance(country, dict):
+        country = country.get("name", "")
+    parts = [address.get("streetAddress"), address.get("postalCode"), address.get("addressLocality"), country]
+    return ", ".join(str(p).strip() for p in parts if p)
+
+def _clean_phone(value):
+    digits = re.sub(r"\D", "", value)
+    return " ".join(value.split()) if 8 <= len(digits) <= 15 else None
+
+def candidate_key(field, value):
+    """Comparison key for a candidate value: phone numbers by their digits, everything else case-insensitively."""
+    value = " ".join(value.split()).lower()
+    if field == FIELD_CONTACT and "@" not in value and PHONE_RE.fullmatch(value):
+        return re.sub(r"\D", "", value)
+    return value
+
+def parse_page(html, page_url):
+    """Returns (candidates, links): candidates are (field, value) pairs; links are absolute same-host URLs worth following."""
+    parser = _PageParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass  # keep whatever was parsed before the markup broke down
+    text = "".join(parser.text)
+    found = []
+
+    def add(field, value):
+        value = " ".join(str(value).split()).strip(" ,;")
+        if value and (field, value) not in found:
+            found.append((field, value))
+
+    for email in EMAIL_RE.findall(text):
+        if not email.lower().endswith(_IMAGE_SUFFIXES):
+            add(FIELD_CONTACT, email)
+    for href, _ in parser.links:
+        if href.lower().startswith("mailto:"):
+            add(FIELD_CONTACT, href[7:].split("?")[0])
+        elif href.lower().startswith("tel:"):
+            phone = _clean_phone(href[4:])
+            if phone:
+                add(FIELD_CONTACT, phone)
+    for line in text.splitlines():
+        if re.search(r"phone|tel\b|call|fax", line, re.IGNORECASE):
+            for match in PHONE_RE.findall(line):
+                phone = _clean_phone(match)
+                if phone:
+                    add(FIELD_CONTACT, phone)
+
+    for address in parser.addresses:
+        add(FIELD_ADDRESS, address)
+    microdata = dict(parser.itemprops)
+    if microdata.get("streetAddress"):
+        add(FIELD_ADDRESS, _format_postal_address(microdata))
+    for prop in ("telephone", "email"):
+        if microdata.get(prop):
+            add(FIELD_CONTACT, microdata[prop])
+
+    for raw in parser.json_ld:
+        for obj in _json_ld_objects(raw):
+            if obj.get("address"):
+                add(FIELD_ADDRESS, _format_postal_address(obj["address"]))
+            for prop in ("telephone", "email"):
+                if isinstance(obj.get(prop), str):
+                    add(FIELD_CONTACT, obj[prop])
+            types = obj.get("@type")
+            types = types if isinstance(types, list) else [types]
+            if "Product" in types and isinstance(obj.get("name"), str):
+                add(FIELD_PRODUCTS, obj["name"])
+
+    if PRODUCT_PAGE_RE.search(urlsplit(page_url).path):
+        for item in parser.list_items:
+            if 3 <= len(item) <= 60:
+                add(FIELD_PRODUCTS, item)
+    for line in text.splitlines():
+        match = re.match(r"\s*(?:Product|Model|Type):\s*(.+)", line)
+        if match:
+            add(FIELD_PRODUCTS, match.group(1).split(",")[0].split("(")[0])
+
+    host = urlsplit(page_url).netloc.lower()
+    links = []
+    for href, label in parser.links:
+        url = urldefrag(urljoin(page_url, href))[0]
+        parts = urlsplit(url)
+        if parts.scheme in ("http", "https") and parts.netloc.lower() == host and url not in links \
+                and (FOLLOW_LINK_RE.search(parts.path) or FOLLOW_LINK_RE.search(label)):
+            links.append(url)
+    return found, links
+
+
+# --- Crawling ---
+
+async def crawl_async(targets, fetcher, on_result, concurrency=DEFAULT_CONCURRENCY, per_host=PER_HOST_CONCURRENCY,
+                      stop_event=None):
+    """
+    Crawls every (producer_id, url) target. on_result(result) is called on the event loop thread
+    as each site finishes, with result = {'producer_id', 'url', 'pages', 'candidates': [(field, value,
+    source_url)], 'error'}. Sites not started before stop_event is set are skipped.
+    Returns the number of sites crawled.
+    """
+    loop = asyncio.get_running_loop()
+    robots = RobotsCache(fetcher)
+    overall = asyncio.Semaphore(concurrency)
+    host_limits = {}
+    crawled = 0
+
+    async def fetch(url):
+        host = _host_key(url)
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(per_host))
+        async with host_limit, overall:
+            if stop_event and stop_event.is_set():
+                return None
+            if not await loop.run_in_executor(executor, robots.allowed, url):
+                fetcher._count("robots_blocked")
+                return None
+            return await loop.run_in_executor(executor, fetcher.fetch, url)
+
+    def parse(page):
+        if page is None or page["status"] != 200 or "html" not in page["content_type"].lower():
+            return [], []
+        charset = re.search(r"charset=([\w-]+)", page["content_type"])
+        try:
+            html = page["body"].decode(charset.group(1) if charset else 'utf-8', errors='replace')
+        except LookupError:
+            html = page["body"].decode('utf-8', errors='replace')
+        return parse_page(html, page["final_url"])
+
+    async def crawl_site(producer_id, url):
+        nonlocal crawled
+        result = {"producer_id": producer_id, "url": url, "pages": 0, "candidates": [], "error": None}
+        try:
+            home = await fetch(url)
+            if stop_event and stop_event.is_set():
+                return
+            found, links = parse(home)
+            pages = [(home, found)]
+            # Links robots.txt disallows do not count against the site's page budget
+            allowed = []
+            for link in links:
+                if len(allowed) >= MAX_PAGES_PER_SITE - 1:
+                    break
+                if await loop.run_in_executor(executor, robots.allowed, link):
+                    allowed.append(link)
+                else:
+                    fetcher._count("robots_blocked")
+            followed = await asyncio.gather(*(fetch(link) for link in allowed), return_exceptions=True)
+            for page in followed:
+                if not isinstance(page, BaseException):
+                    pages.append((page, parse(page)[0]))
+            seen = set()
+            for page, page_found in pages:
+                if page is None:
+                    continue
+                result["pages"] += 1
+                for field, value in page_found:
+                    key = candidate_key(field, value)
+                    if key not in seen:
+                        seen.add(key)
+                        result["candidates"].append((field, value, page["final_url"]))
+            if home is None:
+                result["error"] = "Blocked by robots.txt"
+            elif home["status"] != 200:
+                result["error"] = f"HTTP {home['status']}"
+        except (OSError, http.client.HTTPException) as e:
+            result["error"] = str(e) or e.__class__.__name__
+        crawled += 1
+        on_result(result)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="enrichment") as executor:
+        await asyncio.gather(*(crawl_site(pid, url) for pid, url in targets))
+    return crawled
+
+@timed("enrichment.crawl")
+def crawl(targets, on_result, cache_dir=DEFAULT_CACHE_DIR, concurrency=DEFAULT_CONCURRENCY, per_host=PER_HOST_CONCURRENCY,
+          stop_event=None, host_map=None, max_age=CACHE_MAX_AGE):
+    """Blocking wrapper around crawl_async() for a background thread. Returns the fetcher's counters."""
+    fetcher = Fetcher(HttpCache(cache_dir), max_age=max_age, host_map=host_map)
+    try:
+        asyncio.run(crawl_async(targets, fetcher, on_result, concurrency, per_host, stop_event))
+    finally:
+        fetcher.close()
+    return dict(fetcher.stats)
+
+
+# --- Review queue ---
+
+REVIEW_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS enrichment_candidates (
+        id INTEGER PRIMARY KEY,
+        producer_id INTEGER NOT NULL,
+        field TEXT NOT NULL,
+        value TEXT NOT NULL,
+        source_url TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',  -- 'pending', 'accepted' or 'rejected'
+        found_at REAL,
+        UNIQUE (producer_id, field, value)
+    );
+    CREATE INDEX IF NOT EXISTS idx_enrichment_candidates_status ON enrichment_candidates(status, producer_id);
+"""
+
+STATUS_PENDING = "pending"
+STATUS_ACCEPTED = "accepted"
+STATUS_REJECTED = "rejected"
+
+def install_review_schema(conn):
+    conn.executescript(REVIEW_SCHEMA_SQL)
+    conn.commit()
+
+def crawl_targets(conn, producer_ids=None, limit=None):
+    """Returns [(producer_id, website)] for the given producers (default: all) whose contact implies a website."""
+    if producer_ids is not None:
+        cursor = conn.cursor()
+        repo.stage_producer_ids(cursor, producer_ids)
+        rows = cursor.execute("SELECT id, contact FROM producers" + repo.IN_SELECTED_IDS + " ORDER BY id").fetchall()
+    else:
+        rows = conn.execute("SELECT id, contact FROM producers ORDER BY id").fetchall()
+    targets = []
+    for pid, contact in rows:
+        url = producer_website(contact)
+        if url:
+            targets.append((pid, url))
+            if limit and len(targets) >= limit:
+                break
+    return targets
+
+def queue_candidates(conn, result):
+    """
+    Adds a crawl result's candidates to the review queue, skipping values the producer already
+    has and candidates reviewed before. Returns the number queued. The caller commits.
+    """
+    row = conn.execute("SELECT name, contact, address, products FROM producers WHERE id = ?", (result["producer_id"],)).fetchone()
+    if row is None:
+        return 0
+    name, contact, address, products = row
+    current = {FIELD_CONTACT: [candidate_key(FIELD_CONTACT, v) for v in re.split(r"[,;]", contact or "")],
+               FIELD_ADDRESS: [candidate_key(FIELD_ADDRESS, address or "")],
+               FIELD_PRODUCTS: [candidate_key(FIELD_PRODUCTS, v) for v in (products or "").split(",")]}
+    now = time.time()
+    queued = 0
+    for field, value, source_url in result["candidates"]:
+        # An <address> block usually starts with the company name, which is not part of the address
+        if field == FIELD_ADDRESS and value.lower().startswith(name.lower() + ", "):
+            value = value[len(name) + 2:]
+        if candidate_key(field, value) in current[field]:
+            continue
+        cursor = conn.execute("INSERT OR IGNORE INTO enrichment_candidates (producer_id, field, value, source_url, found_at) "
+                              "VALUES (?, ?, ?, ?, ?)", (result["producer_id"], field, value, source_url, now))
+        queued += cursor.rowcount
+    return queued
+
+def pending_candidates(conn, limit=1000):
+    """Returns (candidate id, producer id, producer name, field, value, source url) rows awaiting review."""
+    return conn.execute("SELECT c.id, c.producer_id, p.name, c.field, c.value, c.source_url FROM enrichment_candidates c "
+                        "JOIN producers p ON p.id = c.producer_id WHERE c.status = ? ORDER BY c.producer_id, c.field, c.id LIMIT ?",
+                        (STATUS_PENDING, limit)).fetchall()
+
+# Position of each candidate field in a producer's (name, contact, address, products, category) values
+FIELD_POSITIONS = {FIELD_CONTACT: 1, FIELD_ADDRESS: 2, FIELD_PRODUCTS: 3}
+
+def accept_candidates(cursor, candidate_ids, update):
+    """
+    Applies candidates to their producers: an address replaces the old one, contact details and
+    products are appended. The new values go through update({producer id: (name, contact, address,
+    products, category)}), the app's write journal, so an accept can be undone like any edit.
+    Returns the ids of the producers changed. The caller commits.
+    """
+    candidates = []
+    for start in range(0, len(candidate_ids), 500):
+        chunk = list(candidate_ids[start:start + 500])
+        candidates.extend(cursor.execute(
+            f"SELECT id, producer_id, field, value FROM enrichment_candidates WHERE id IN ({','.join('?' * len(chunk))}) "
+            "AND status = ? ORDER BY id", chunk + [STATUS_PENDING]).fetchall())
+    producers = {row[0]: list(row[1:6]) for row in repo.fetch_producer_rows(cursor, {c[1] for c in candidates})}
+    for _, producer_id, field, value in candidates:
+        values = producers.get(producer_id)
+        if values is None:
+            continue
+        position = FIELD_POSITIONS[field]
+        if field == FIELD_ADDRESS or not values[position]:
+            values[position] = value
+        else:
+            values[position] += ", " + value
+    changed = update({producer_id: tuple(values) for producer_id, values in producers.items()}) if producers else []
+    cursor.executemany("UPDATE enrichment_candidates SET status = ? WHERE id = ?",
+                       [(STATUS_ACCEPTED, candidate[0]) for candidate in candidates])
+    return changed
+
+def reject_candidate(conn, candidate_id):
+    """Marks a candidate rejected, so later crawls do not queue it again. The caller commits."""
+    conn.execute("UPDATE enrichment_candidates SET status = ? WHERE id = ?", (STATUS_REJECTED, candidate_id))
@@ -0,0 +1,89 @@
+"""
+Text extraction and keyword identification for the file-scanning features.
+Kept free of Tkinter so it can be used from app.py and from headless tools. scan_file() is
+the job the app runs in the scan worker pool (scan_service.py).
+"""
+import os
+
+from instrumentation import timed
+
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+
+KEYWORD_STOP_WORDS = {"the", "a", "an", "and", "or", "for", "with", "from", "to", "in"}
+MAX_KEYWORDS = 20
+
+TEXT_EXTENSIONS = (".txt", ".csv")
+SCAN_EXTENSIONS = (".pdf",) + TEXT_EXTENSIONS
+TEXT_BLOCK_LINES = 2000  # a TXT/CSV scan reports progress after each block of this many lines
+
+
+def iter_pdf_pages(filepath):
+    """Yields (page number, page count, page text) for each page of a PDF. Raises on unreadable files."""
+    if not PYPDF2_AVAILABLE:
+        raise RuntimeError("PyPDF2 library not found. PDF text extraction is disabled.")
+    with open(filepath, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        pages = reader.pages
+        for number, page in enumerate(pages, start=1):
+            yield number, len(pages), page.extract_text() or ""
+
+@timed("file.read_pdf_text")
+def read_pdf_text(filepath):
+    """Extracts text from a given PDF file. Raises on unreadable files."""
+    return "".join(text for _, _, text in iter_pdf_pages(filepath))
+
+def _iter_text_blocks(filepath):
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        lines = f.read().split('\n')
+    count = max(1, (len(lines) + TEXT_BLOCK_LINES - 1) // TEXT_BLOCK_LINES)
+    for block in range(count):
+        yield block + 1, count, '\n'.join(lines[block * TEXT_BLOCK_LINES:(block + 1) * TEXT_BLOCK_LINES])
+
+def _keyword_candidates(text):
+    potential_keywords = []
+    lines = text.split('\n')
+    for line in lines:
+        if "Model:" in line or "Product:" in line or "Type:" in line:
+            parts = line.split(':')
+            if len(parts) > 1:
+                potential_keywords.append(parts[1].strip().split(',')[0].split('(')[0].strip())
+
+        words = line.split()
+        for word in words:
+            if len(word) > 2 and word[0].isupper() and word.lower() not in KEYWORD_STOP_WORDS:
+                potential_keywords.append(word)
+    return potential_keywords
+
+def _filter_keywords(potential_keywords):
+    filtered_keywords = list(set([kw.strip(".,:;'\"") for kw in potential_keywords if kw and len(kw) > 2]))
+    return filtered_keywords[:MAX_KEYWORDS]
+
+@timed("file.identify_product_keywords")
+def identify_product_keywords(text):
+    """A very basic function to identify potential product-related keywords from text."""
+    return _filter_keywords(_keyword_candidates(text))
+
+def scan_file(emit, filepath):
+    """
+    Scan job: reads a PDF, TXT or CSV file and identifies product keywords in it.
+    After each PDF page (or block of text lines) emits {'part', 'parts', 'keywords'} with that
+    part's keywords; returns {'text', 'keywords'} for the whole file.
+    """
+    if filepath.lower().endswith(".pdf"):
+        parts = iter_pdf_pages(filepath)
+    elif filepath.lower().endswith(TEXT_EXTENSIONS):
+        parts = _iter_text_blocks(filepath)
+    else:
+        raise ValueError(f"File type for '{os.path.basename(filepath)}' is not supported for keyword scanning.")
+    texts = []
+    candidates = []
+    for number, count, text in parts:
+        found = _keyword_candidates(text)
+        emit({"part": number, "parts": count, "keywords": _filter_keywords(found)})
+        texts.append(text)
+        candidates.extend(found)
+    return {"text": "\n".join(texts), "keywords": _filter_keywords(candidates)}
@@ -0,0 +1,200 @@
+"""
+Local HTTP server with fixture websites for testing the enrichment crawler offline.
+
+Each producer gets a small site, served as a virtual host named after its email domain
+(info@nordic12.example.com -> nordic12.example.com): a home page with schema.org JSON-LD,
+contact, about and product pages, and a robots.txt that disallows /private/. The server
+speaks HTTP/1.1 with keep-alive, answers If-None-Match with 304, compresses for gzip
+clients, and counts requests and the most requests in flight per host.
+
+    python fixture_server.py --db global_energy_db.sqlite --port 8765
+
+The crawler reaches the sites through host_map(), which sends every fixture host to this
+server while keeping the site's own Host header. To point the app's Web Enrichment window
+at a running fixture server, start the app with GEDB_ENRICHMENT_FIXTURES=127.0.0.1:8765.
+"""
+import argparse
+import email.utils
+import gzip
+import hashlib
+import html
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import synthetic_data
+from enrichment import producer_website
+
+LAST_MODIFIED = email.utils.formatdate(1700000000, usegmt=True)
+ROBOTS_TXT = "User-agent: *\nDisallow: /private/\n"
+GZIP_MIN_BYTES = 1024
+
+
+def _page(title, body, head=""):
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>{head}</head>"
+            f"<body><nav><a href=\"/\">Home</a> <a href=\"/about\">About us</a> <a href=\"/products\">Products</a> "
+            f"<a href=\"/contact\">Contact</a> <a href=\"/private/contact-list\">Staff</a></nav>{body}</body></html>")
+
+def build_site(index, name, contact, address, products, category):
+    """Returns (host, {path: (content type, body bytes)}) for one producer, or None without a website."""
+    website = producer_website(contact)
+    if not website:
+        return None
+    host = urlsplit(website).netloc
+    street, city, country = (address.split(", ") + ["", ""])[:3]
+    offered = [p.strip() for p in (products or "").split(",") if p.strip()]
+    # One product the database does not list yet, so the crawler has something new to find
+    extra = [p for p in synthetic_data.CATEGORY_PRODUCTS.get(category, []) if p not in offered][:1]
+    phone = f"+{10 + index % 89} {200 + index % 700} {100000 + index * 7919 % 900000}"
+    organization = {
+        "@context": "https://schema.org", "@type": "Organization", "name": name, "email": f"sales@{host}",
+        "telephone": phone,
+        "address": {"@type": "PostalAddress", "streetAddress": street, "addressLocality": city, "addressCountry": country},
+        "makesOffer": [{"@type": "Offer", "itemOffered": {"@type": "Product", "name": p}} for p in offered + extra],
+    }
+    json_ld = f"<script type=\"application/ld+json\">{json.dumps(organization)}</script>"
+    items = "".join(f"<li>{html.escape(p)}</li>" for p in offered + extra)
+    pages = {
+        "/": _page(name, f"<h1>{html.escape(name)}</h1><p>{html.escape(category or '')} equipment and services.</p>", json_ld),
+        "/about": _page(f"About {name}", f"<h1>About us</h1><p>{html.escape(name)} serves the {html.escape(category or '')} "
+                                         f"sector from {html.escape(city)}.</p><p>Type: {html.escape((offered + extra)[0])}</p>"),
+        "/contact": _page(f"Contact {name}", f"<h1>Contact</h1><address>{html.escape(name)}<br>{html.escape(street)}<br>"
+                                             f"{html.escape(city)}<br>{html.escape(country)}</address>"
+                                             f"<p>Phone: <a href=\"tel:{phone.replace(' ', '')}\">{phone}</a></p>"
+                                             f"<p>Email: <a href=\"mailto:sales@{host}\">sales@{host}</a></p>"),
+        "/products": _page(f"{name} products", f"<h1>Products</h1><ul>{items}</ul>"),
+        "/private/contact-list": _page("Staff", f"<p>Internal: staff{index}@{host}</p>"),
+    }
+    site = {path: ("text/html; charset=utf-8", body.encode('utf-8')) for path, body in pages.items()}
+    site["/robots.txt"] = ("text/plain", ROBOTS_TXT.encode('utf-8'))
+    return host, site
+
+def build_fixture_sites(producers):
+    """Builds sites for (name, contact, address, products, category) rows. Returns {host: site}."""
+    sites = {}
+    for index, row in enumerate(producers):
+        built = build_site(index, *row)
+        if built:
+            sites[built[0]] = built[1]
+    return sites
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so the crawler's connection reuse is exercised
+    disable_nagle_algorithm = True  # headers and body are separate writes; don't hold the body back
+
+    def do_GET(self):
+        server = self.server
+        host = (self.headers.get("Host") or "").lower()
+        server.enter(host)
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            site = server.sites.get(host)
+            page = site.get(self.path.split("?")[0]) if site else None
+            if page is None:
+                self._send(404, "text/plain", b"Not found")
+                return
+            content_type, body = page
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send(200, content_type, body, etag)
+        finally:
+            server.leave(host)
+
+    def _send(self, status, content_type, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark and test output quiet
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Serves {host: {path: (content type, body)}} on 127.0.0.1 (port 0 picks a free port)."""
+    daemon_threads = True
+
+    def __init__(self, sites, port=0, delay=0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.sites = sites
+        self.delay = delay  # seconds added to every response, to make concurrency measurable
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.active = {}
+        self.max_active = {}
+        self._thread = None
+
+    def enter(self, host):
+        with self.lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+
+    def leave(self, host):
+        with self.lock:
+            self.active[host] -= 1
+
+    def host_map(self):
+        """The Fetcher host_map sending every fixture host to this server."""
+        address = self.server_address[:2]
+        return {host: address for host in self.sites}
+
+    def stats(self):
+        """Returns (total requests, most concurrent requests seen on one host)."""
+        with self.lock:
+            return sum(self.requests.values()), max(self.max_active.values(), default=0)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fixture producer websites for the enrichment crawler.")
+    parser.add_argument("--db", help="Producers database to build sites from (default: synthetic producers)")
+    parser.add_argument("--count", type=int, default=100, help="Synthetic producers to build sites for without --db")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds added to every response")
+    args = parser.parse_args()
+
+    if args.db:
+        conn = sqlite3.connect(args.db)
+        try:
+            rows = conn.execute("SELECT name, contact, address, products, category FROM producers ORDER BY id").fetchall()
+        finally:
+            conn.close()
+    else:
+        rows = list(synthetic_data.generate_producers(args.count))
+    server = FixtureServer(build_fixture_sites(rows), args.port, args.delay)
+    print(f"Serving {len(server.sites)} fixture sites on http://127.0.0.1:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Gemini AI access for GlobalEnergyDB: loads the encrypted API key and wraps model calls.
+Kept free of Tkinter so it can be used from app.py and from headless tools.
+"""
+# --- Gemini AI Integration ---
+import base64 # base64 is a standard library, no need for try-except here
+import logging
+
+import instrumentation
+import prompts
+
+logger = logging.getLogger(__name__)
+
+try:
+    from Crypto.Cipher import AES # Import AES for decryption
+    AES_AVAILABLE = True
+except ImportError:
+    AES_AVAILABLE = False
+    logger.warning("PyCryptodome library not found. Secure API key loading will be disabled. Install with 'pip install pycryptodome'")
+
+try:
+    import google.generativeai as genai
+    GEMINI_API_KEY_LOADED = False # Flag to track if API key was loaded successfully
+    if AES_AVAILABLE:
+        try:
+            # Key for AES encryption (must be 16 bytes for AES-128, 24 for AES-192, 32 for AES-256)
+            # This secret must match the one used in encrypt_key.py
+            SECRET_KEY = b'mysecretaeskey12'
+
+            def unpad(s): return s.rstrip(b' ') # Define unpad function
+
+            def load_encrypted_api_key():
+                with open("encrypted_key.txt", "r") as f:
+                    encrypted = base64.b64decode(f.read())
+                cipher = AES.new(SECRET_KEY, AES.MODE_ECB)
+                decrypted = unpad(cipher.decrypt(encrypted))
+                return decrypted.decode()
+
+            gemini_api_key = load_encrypted_api_key()
+            genai.configure(api_key=gemini_api_key)
+            GEMINI_AVAILABLE = True
+            GEMINI_API_KEY_LOADED = True
+            logger.info("Gemini AI API configured securely from encrypted_key.txt.")
+        except FileNotFoundError:
+            GEMINI_AVAILABLE = False
+            logger.warning("encrypted_key.txt not found. Please run encrypt_key.py first.")
+        except Exception as e:
+            GEMINI_AVAILABLE = False
+            logger.error("Error loading Gemini API key from file: %s", e)
+    else:
+        GEMINI_AVAILABLE = False
+        logger.warning("PyCryptodome is not available, cannot load encrypted API key.")
+
+except ImportError:
+    GEMINI_AVAILABLE = False
+    logger.warning("Google Generative AI library not found. Gemini AI features will be disabled. Install with 'pip install google-generativeai'")
+except Exception as e:
+    # This catches errors from genai.configure if key is invalid even if loaded from file
+    GEMINI_AVAILABLE = False
+    logger.error("Error configuring Gemini AI: %s. Gemini AI features will be disabled.", e)
+
+
+def get_gemini_model():
+    """Returns a configured Gemini GenerativeModel if available."""
+    if not GEMINI_AVAILABLE or not GEMINI_API_KEY_LOADED:
+        return None
+    try:
+        return genai.GenerativeModel('gemini-1.5-flash')
+    except Exception as e:
+        # Logged rather than shown, as messagebox might block in a thread
+        logger.error("Gemini AI Error: Failed to load Gemini model: %s", e)
+        return None
+
+def send_prompt(model, prompt, operation="gemini.prompt"):
+    """Sends a single-turn prompt and returns the response text, timed under the given operation name."""
+    with instrumentation.timer(operation):
+        response = model.start_chat(history=[]).send_message(prompt)
+    instrumentation.count(operation + ".prompt_chars", len(prompt))
+    return response.text
+
+# Removed gemini_web_search as it's no longer used for direct browser opening
+# The functions that previously called it will now use webbrowser directly.
+
+def gemini_chat_response(user_query, context, model=None):
+    """
+    Generates a chatbot response using Gemini AI, based on user query and provided context.
+    If the answer is not in context, it will suggest a web search with a special tag.
+    A model object can be passed in (e.g. a fake backend for benchmarks); otherwise Gemini is used.
+    """
+    if model is None:
+        model = get_gemini_model()
+    if not model:
+        return "Chatbot is currently unavailable: Gemini AI not configured."
+
+    try:
+        # Prompt for Retrieval Augmented Generation (RAG)
+        # Instruct the LLM to provide a web search suggestion if context is insufficient.
+        prompt = prompts.CHAT_RESPONSE.render(instructions=prompts.CHAT_INSTRUCTIONS.render(question=user_query),
+                                              context=context, question=user_query)
+
+        return send_prompt(model, prompt, "gemini.chat_response")
+    except Exception as e:
+        logger.error("Gemini AI Error in chatbot response: %s", e)
+        return "I'm sorry, I encountered an error while processing your request. Please try again."
@@ -0,0 +1,314 @@
+"""
+Offline address parsing, geocoding and spatial queries for producers.
+
+Addresses are matched against a bundled gazetteer (gazetteer.csv: city and country centroids)
+without any network access. Results are stored in the latitude/longitude/geo_precision columns
+of 'producers' and indexed in an SQLite R*Tree (producer_geo) for radius and bounding-box queries.
+"""
+import csv
+import math
+import os
+import re
+import sys
+import unicodedata
+
+from instrumentation import timed
+
+# PyInstaller unpacks bundled data files to sys._MEIPASS
+_BASE_DIR = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+GAZETTEER_FILE = os.path.join(_BASE_DIR, "gazetteer.csv")
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+GEOCODE_BATCH_SIZE = 2000
+
+PRECISION_CITY = "city"
+PRECISION_COUNTRY = "country"
+PRECISION_NONE = "none"  # address could not be matched; not retried until the address changes
+
+COUNTRY_ALIASES = {
+    "usa": "united states", "us": "united states", "u.s.": "united states", "u.s.a.": "united states",
+    "united states of america": "united states", "america": "united states",
+    "uk": "united kingdom", "u.k.": "united kingdom", "great britain": "united kingdom", "britain": "united kingdom",
+    "england": "united kingdom", "scotland": "united kingdom", "wales": "united kingdom",
+    "uae": "united arab emirates", "u.a.e.": "united arab emirates",
+    "deutschland": "germany", "espana": "spain", "holland": "netherlands", "the netherlands": "netherlands",
+    "korea": "south korea", "republic of korea": "south korea", "prc": "china", "russian federation": "russia",
+    "brasil": "brazil", "ksa": "saudi arabia", "viet nam": "vietnam", "turkiye": "turkey",
+}
+CITY_ALIASES = {
+    "munchen": "munich", "koln": "cologne", "frankfurt am main": "frankfurt", "nyc": "new york",
+    "new york city": "new york", "la": "los angeles", "sf": "san francisco", "den haag": "the hague",
+    "goteborg": "gothenburg", "bombay": "mumbai", "madras": "chennai", "delhi": "new delhi",
+    "bengaluru": "bangalore", "calcutta": "kolkata", "saigon": "ho chi minh city", "lisboa": "lisbon",
+    "roma": "rome", "milano": "milan", "torino": "turin", "napoli": "naples", "wien": "vienna",
+    "geneve": "geneva", "sevilla": "seville", "kobenhavn": "copenhagen", "st petersburg": "saint petersburg",
+    "st. petersburg": "saint petersburg",
+}
+
+# Named bounding boxes for per-region views: (min_lat, min_lon, max_lat, max_lon)
+REGIONS = {
+    "Europe": (34.0, -25.0, 72.0, 45.0),
+    "North America": (7.0, -170.0, 72.0, -50.0),
+    "South America": (-56.0, -82.0, 13.0, -34.0),
+    "Africa": (-35.0, -18.0, 38.0, 52.0),
+    "Middle East": (12.0, 34.0, 42.0, 63.0),
+    "Asia": (-11.0, 60.0, 56.0, 150.0),
+    "Oceania": (-48.0, 110.0, 0.0, 180.0),
+}
+
+GEO_SCHEMA_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS producer_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+    -- Recreated so databases with the older trigger (which fired on any write to address) get the WHEN clause
+    DROP TRIGGER IF EXISTS producers_geo_address_changed;
+    CREATE TRIGGER producers_geo_address_changed AFTER UPDATE OF address ON producers
+    WHEN OLD.address IS NOT NEW.address BEGIN
+        UPDATE producers SET latitude = NULL, longitude = NULL, geo_precision = NULL WHERE id = NEW.id;
+        DELETE FROM producer_geo WHERE id = NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS producers_geo_deleted AFTER DELETE ON producers BEGIN
+        DELETE FROM producer_geo WHERE id = OLD.id;
+    END;
+    CREATE INDEX IF NOT EXISTS idx_producers_geo_pending ON producers (geo_precision) WHERE geo_precision IS NULL;
+"""
+
+# Any word containing a digit: house numbers and postcodes such as 10115 or AB10
+_POSTCODE_RE = re.compile(r"\b[\w\-]*\d[\w\-]*\b")
+
+
+def normalize_place(text):
+    """Lower-cases, strips accents, postcodes and extra whitespace from a place name."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _POSTCODE_RE.sub(" ", text.lower())
+    return " ".join(text.replace("-", " ").split())
+
+
+class Gazetteer:
+    """City and country centroids loaded from a CSV file."""
+
+    def __init__(self, path=GAZETTEER_FILE):
+        self.countries = {}  # normalized country -> (lat, lon, display name)
+        self.cities = {}  # normalized city -> [(normalized country, lat, lon, display name)]
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                country = normalize_place(row["country"])
+                lat, lon = float(row["latitude"]), float(row["longitude"])
+                if row["city"]:
+                    self.cities.setdefault(normalize_place(row["city"]), []).append((country, lat, lon, row["city"]))
+                else:
+                    self.countries[country] = (lat, lon, row["country"])
+
+    def _country(self, token):
+        token = COUNTRY_ALIASES.get(token, token)
+        return token if token in self.countries else None
+
+    def _city(self, token, country):
+        entries = self.cities.get(CITY_ALIASES.get(token, token))
+        if not entries:
+            return None
+        if country:
+            for entry in entries:
+                if entry[0] == country:
+                    return entry
+            return None
+        return entries[0] if len(entries) == 1 else None
+
+    def parse_address(self, address):
+        """
+        Splits a free-text address into (city, country) names known to the gazetteer.
+        Either part may be None. The country is looked for at the end of the address and the
+        city in the remaining comma-separated parts, right to left, using their last 1-3 words.
+        """
+        if not address:
+            return None, None
+        parts = [normalize_place(p) for p in address.split(",")]
+        parts = [p for p in parts if p]
+        country = None
+        if parts and self._country(parts[-1]):
+            country = self._country(parts.pop())
+        for part in reversed(parts):
+            words = part.split()
+            for size in (3, 2, 1):
+                if len(words) >= size:
+                    entry = self._city(" ".join(words[-size:]), country)
+                    if entry:
+                        return entry[3], self.countries.get(entry[0], (0, 0, entry[0]))[2]
+            # Countries written without a separating comma, e.g. "Berlin Germany"
+            if country is None and len(words) > 1 and self._country(words[-1]):
+                country = self._country(words[-1])
+                entry = self._city(" ".join(words[:-1]), country)
+                if entry:
+                    return entry[3], self.countries[country][2]
+        return None, self.countries[country][2] if country else None
+
+    def geocode(self, address):
+        """Returns (latitude, longitude, precision) for an address, or None if it cannot be matched."""
+        city, country = self.parse_address(address)
+        if city:
+            country_key = normalize_place(country) if country else None
+            entry = self._city(normalize_place(city), country_key)
+            if entry:
+                return entry[1], entry[2], PRECISION_CITY
+        if country:
+            lat, lon, _ = self.countries[normalize_place(country)]
+            return lat, lon, PRECISION_COUNTRY
+        return None
+
+    def resolve_site(self, text):
+        """Resolves 'lat, lon' or a place name to (lat, lon), or None."""
+        match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*[, ]\s*(-?\d+(?:\.\d+)?)\s*", text or "")
+        if match:
+            lat, lon = float(match.group(1)), float(match.group(2))
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return lat, lon
+            return None
+        result = self.geocode(text)
+        return (result[0], result[1]) if result else None
+
+
+# --- Schema and background geocoding ---
+
+def install_geo_schema(conn):
+    """Adds the latitude/longitude/geo_precision columns, the R*Tree index and its triggers."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(producers)")}
+    for column, col_type in (("latitude", "REAL"), ("longitude", "REAL"), ("geo_precision", "TEXT")):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE producers ADD COLUMN {column} {col_type}")
+    conn.executescript(GEO_SCHEMA_SQL)
+    conn.commit()
+
+def _store_locations(conn, located, unmatched):
+    conn.executemany("UPDATE producers SET latitude = ?, longitude = ?, geo_precision = ? WHERE id = ?",
+                     [(lat, lon, precision, pid) for pid, lat, lon, precision in located])
+    conn.executemany("INSERT OR REPLACE INTO producer_geo (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                     [(pid, lat, lat, lon, lon) for pid, lat, lon, _ in located])
+    conn.executemany("UPDATE producers SET geo_precision = ? WHERE id = ?", [(PRECISION_NONE, pid) for pid in unmatched])
+
+def geocode_rows(conn, gazetteer, rows):
+    """Geocodes (id, address) rows and stores the results (without committing)."""
+    located = []
+    unmatched = []
+    for pid, address in rows:
+        result = gazetteer.geocode(address)
+        if result:
+            located.append((pid, result[0], result[1], result[2]))
+        else:
+            unmatched.append(pid)
+    _store_locations(conn, located, unmatched)
+    return len(located)
+
+@timed("geo.geocode_pending")
+def geocode_pending(conn, gazetteer, batch_size=GEOCODE_BATCH_SIZE, progress=None, stop_event=None):
+    """
+    Geocodes every producer without a geo_precision yet, committing one batch at a time so
+    other connections are never blocked for long. Returns the number of rows processed.
+    progress(done) is called after each batch; setting stop_event stops after the current batch.
+    """
+    done = 0
+    last_id = 0
+    while not (stop_event and stop_event.is_set()):
+        rows = conn.execute("SELECT id, address FROM producers WHERE geo_precision IS NULL AND id > ? ORDER BY id LIMIT ?",
+                            (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        geocode_rows(conn, gazetteer, rows)
+        conn.commit()
+        last_id = rows[-1][0]
+        done += len(rows)
+        if progress:
+            progress(done)
+    return done
+
+
+# --- Spatial queries ---
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def _bounding_boxes(lat, lon, radius_km):
+    """Returns R*Tree boxes (min_lat, max_lat, min_lon, max_lon) covering a circle, split at the antimeridian."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE_LAT * cos_lat) >= 180:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    dlon = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180:
+        return [(min_lat, max_lat, min_lon + 360, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+_RESULT_COLUMNS = "p.id, p.name, p.contact, p.address, p.products, p.category, p.latitude, p.longitude"
+
+# SQLite's default limit on host parameters per statement is 999 on older builds
+_ID_CHUNK = 500
+
+def _fetch_by_ids(conn, ids):
+    rows = {}
+    for i in range(0, len(ids), _ID_CHUNK):
+        chunk = ids[i:i + _ID_CHUNK]
+        for row in conn.execute(f"SELECT {_RESULT_COLUMNS} FROM producers p WHERE p.id IN ({','.join('?' * len(chunk))})", chunk):
+            rows[row[0]] = row
+    return rows
+
+@timed("geo.within_radius")
+def within_radius(conn, lat, lon, radius_km, limit=None):
+    """
+    Returns [(distance_km, row)] for producers within radius_km of (lat, lon), nearest first.
+    Rows are (id, name, contact, address, products, category, latitude, longitude).
+    Candidates and their coordinates come straight from the R*Tree, so producer rows are
+    only read for the results actually returned.
+    """
+    candidates = []
+    for min_lat, max_lat, min_lon, max_lon in _bounding_boxes(lat, lon, radius_km):
+        for pid, p_lat, p_lon in conn.execute(
+                "SELECT id, min_lat, min_lon FROM producer_geo "
+                "WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?",
+                (min_lat, max_lat, min_lon, max_lon)):
+            distance = haversine_km(lat, lon, p_lat, p_lon)
+            if distance <= radius_km:
+                candidates.append((distance, pid))
+    candidates.sort()
+    if limit:
+        candidates = candidates[:limit]
+    rows = _fetch_by_ids(conn, [pid for _, pid in candidates])
+    return [(distance, rows[pid]) for distance, pid in candidates if pid in rows]
+
+def count_within_radius(conn, lat, lon, radius_km):
+    """Counts producers within radius_km of (lat, lon) using only the R*Tree."""
+    total = 0
+    for min_lat, max_lat, min_lon, max_lon in _bounding_boxes(lat, lon, radius_km):
+        for _, p_lat, p_lon in conn.execute(
+                "SELECT id, min_lat, min_lon FROM producer_geo "
+                "WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?",
+                (min_lat, max_lat, min_lon, max_lon)):
+            if haversine_km(lat, lon, p_lat, p_lon) <= radius_km:
+                total += 1
+    return total
+
+@timed("geo.within_bbox")
+def within_bbox(conn, min_lat, min_lon, max_lat, max_lon, limit=None):
+    """Returns producer rows located inside a bounding box (see within_radius for the row layout)."""
+    sql = (f"SELECT {_RESULT_COLUMNS} FROM producer_geo g JOIN producers p ON p.id = g.id "
+           "WHERE g.max_lat >= ? AND g.min_lat <= ? AND g.max_lon >= ? AND g.min_lon <= ?")
+    params = [min_lat, max_lat, min_lon, max_lon]
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def count_within_bbox(conn, min_lat, min_lon, max_lat, max_lon):
+    return conn.execute("SELECT COUNT(*) FROM producer_geo WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?",
+                        (min_lat, max_lat, min_lon, max_lon)).fetchone()[0]
+
+def region_counts(conn):
+    """Returns [(region, producer count)] for the named REGIONS."""
+    return [(name, count_within_bbox(conn, *box)) for name, box in REGIONS.items()]
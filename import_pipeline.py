@@ -0,0 +1,333 @@
+"""
+Multi-file, multi-format producer import pipeline.
+
+Stages:
+  1. Format readers (CSV/TXT, XLSX, JSON/JSONL) yield batches of (line number, values) rows.
+  2. Files are parsed in parallel in a process pool (the app's shared scan service, or a pool
+     made for the import), each mapped onto the producer columns through a column mapping
+     (auto-detected from the header or taken from a saved profile).
+  3. A single writer stage bulk-inserts all parsed rows in one transaction, with the usual
+     duplicate/malformed accounting. Rejected rows are written to a reject CSV file.
+"""
+import csv
+import datetime
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import producers_repository as repo
+import scan_service
+from instrumentation import timed
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+PROFILES_FILE = "import_profiles.json"
+
+BATCH_SIZE = 5000
+
+# SQLite's default limit on host parameters per statement is 999 on older builds
+NAME_LOOKUP_CHUNK = 500
+
+
+class ImportFormatError(ValueError):
+    """Raised when a file cannot be read or mapped onto the producer columns."""
+
+
+# --- Format readers ---
+# Each reader returns (header, batches) where batches yields lists of (line_no, values).
+
+def _batched(numbered_rows):
+    batch = []
+    for item in numbered_rows:
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def read_delimited(path):
+    """Reads comma-separated CSV/TXT files with a header row."""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+        header = next(csv.reader(file), None)
+    if header is None:
+        raise ImportFormatError(f"{os.path.basename(path)} is empty.")
+
+    # Files are reopened lazily, so an unconsumed batches generator holds no handles
+    def batches():
+        with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+            reader = csv.reader(file)
+            next(reader)
+            # Line numbers count the header as line 1; blank lines are kept and rejected as malformed
+            yield from _batched((reader.line_num, row) for row in reader)
+    return header, batches()
+
+def _open_first_sheet_rows(path):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    return workbook, workbook.worksheets[0].iter_rows(values_only=True)
+
+def read_xlsx(path):
+    """Reads the first worksheet of an Excel workbook; the first row is the header."""
+    if not OPENPYXL_AVAILABLE:
+        raise ImportFormatError("openpyxl library not found. XLSX import is disabled. Install with 'pip install openpyxl'")
+    workbook, rows = _open_first_sheet_rows(path)
+    try:
+        first = next(rows, None)
+    finally:
+        workbook.close()
+    if first is None:
+        raise ImportFormatError(f"{os.path.basename(path)} is empty.")
+    header = ["" if v is None else str(v) for v in first]
+
+    def batches():
+        workbook, rows = _open_first_sheet_rows(path)
+        try:
+            next(rows)
+            numbered = ((line_no, ["" if v is None else str(v) for v in row])
+                        for line_no, row in enumerate(rows, start=2) if any(v is not None for v in row))
+            yield from _batched(numbered)
+        finally:
+            workbook.close()
+    return header, batches()
+
+def read_json(path):
+    """
+    Reads a JSON array of objects (or an object holding one such array),
+    or JSON Lines with one object per line (.jsonl/.ndjson).
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                data = next((v for v in data.values() if isinstance(v, list)), None)
+            if not isinstance(data, list):
+                raise ImportFormatError(f"{os.path.basename(path)} does not contain a list of producer records.")
+            records = data
+
+    header = []
+    seen = set()
+    for record in records:
+        if isinstance(record, dict):
+            for key in record:
+                if key not in seen:
+                    seen.add(key)
+                    header.append(key)
+
+    def batches():
+        numbered = []
+        for line_no, record in enumerate(records, start=1):
+            if isinstance(record, dict):
+                values = ["" if record.get(k) is None else str(record.get(k)) for k in header]
+            else:
+                values = []  # reported as malformed by the parser
+            numbered.append((line_no, values))
+        yield from _batched(numbered)
+    return header, batches()
+
+READERS = {
+    ".csv": read_delimited,
+    ".txt": read_delimited,
+    ".xlsx": read_xlsx,
+    ".json": read_json,
+    ".jsonl": read_json,
+    ".ndjson": read_json,
+}
+
+SUPPORTED_EXTENSIONS = tuple(READERS)
+
+def get_reader(path):
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ImportFormatError(f"Unsupported file type: {os.path.basename(path)}")
+    return reader
+
+
+# --- Column mapping profiles ---
+
+def load_profiles(path=PROFILES_FILE):
+    """Returns saved column-mapping profiles as {profile_name: {producer_column: source_column}}."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_profile(name, mapping, path=PROFILES_FILE):
+    profiles = load_profiles(path)
+    profiles[name] = mapping
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, indent=2)
+
+def read_header(path):
+    """Returns the header columns of a file without parsing its rows."""
+    header, batches = get_reader(path)(path)
+    batches.close()
+    return header
+
+def resolve_mapping(header, profiles=None):
+    """
+    Returns {producer_column: source_column} for a header, or None if it cannot be mapped.
+    A header containing every producer column (case-insensitive) maps directly; otherwise
+    the first saved profile whose source columns are all present is used.
+    """
+    lowered = {col.strip().lower(): col for col in header}
+    if all(col in lowered for col in repo.IMPORT_COLUMNS):
+        return {col: lowered[col] for col in repo.IMPORT_COLUMNS}
+    for mapping in (profiles or {}).values():
+        if all(str(mapping.get(col, "")).strip().lower() in lowered for col in repo.IMPORT_COLUMNS):
+            return {col: lowered[mapping[col].strip().lower()] for col in repo.IMPORT_COLUMNS}
+    return None
+
+
+# --- Parse stage (runs in worker processes) ---
+
+def parse_file(path, mapping=None, profiles=None):
+    """
+    Parses one file into producer rows.
+    Returns {'path', 'rows': [(line_no, values5)], 'rejects': [(line_no, reason, raw_values)]}.
+    Raises ImportFormatError if the header cannot be mapped.
+    """
+    header, batches = get_reader(path)(path)
+    if mapping is None:
+        mapping = resolve_mapping(header, profiles)
+    if mapping is None:
+        batches.close()
+        raise ImportFormatError(f"{os.path.basename(path)}: header must contain 'Name', 'Contact', 'Address', 'Products', and 'Category' columns, or match a saved column-mapping profile.")
+
+    position = {col.strip().lower(): i for i, col in enumerate(header)}
+    indexes = [position[mapping[col].strip().lower()] for col in repo.IMPORT_COLUMNS]
+    max_idx = max(indexes)
+
+    rows = []
+    rejects = []
+    for batch in batches:
+        for line_no, values in batch:
+            if len(values) <= max_idx:
+                rejects.append((line_no, "malformed", values))
+                continue
+            record = tuple(values[i].strip() for i in indexes)
+            if not record[0]:
+                rejects.append((line_no, "missing name", values))
+                continue
+            rows.append((line_no, record))
+    return {"path": path, "rows": rows, "rejects": rejects}
+
+def _parse_file_safe(path, mapping, profiles):
+    try:
+        return parse_file(path, mapping, profiles)
+    except Exception as e:
+        message = str(e) if isinstance(e, ImportFormatError) else f"{os.path.basename(path)}: {e}"
+        return {"path": path, "rows": [], "rejects": [], "error": message}
+
+def _parse_job(emit, path, mapping, profiles):
+    """parse_file() as a scan service job."""
+    return _parse_file_safe(path, mapping, profiles)
+
+def _job_result(path, job):
+    try:
+        return job.result()
+    except scan_service.ScanError as e:
+        return {"path": path, "rows": [], "rejects": [], "error": f"{os.path.basename(path)}: {e}"}
+
+@timed("import.parse_files")
+def parse_files(paths, mappings=None, profiles=None, max_workers=None, service=None, priority=scan_service.PRIORITY_NORMAL):
+    """
+    Parses several files, in parallel worker processes when there is more than one.
+    With a ScanService every file is parsed in its warm workers (at the given priority),
+    without time or memory limits; otherwise a process pool is started for the call.
+    mappings optionally gives an explicit {path: mapping}. Results keep the input order;
+    a file that fails to parse gets an 'error' entry instead of raising.
+    """
+    mappings = mappings or {}
+    args = [(p, mappings.get(p), profiles) for p in paths]
+    if service is not None:
+        jobs = [service.submit(_parse_job, *a, priority=priority, time_limit=0, memory_limit_mb=0) for a in args]
+        return [_job_result(path, job) for path, job in zip(paths, jobs)]
+    if len(paths) <= 1:
+        return [_parse_file_safe(*a) for a in args]
+    workers = min(len(paths), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse_file_safe, *zip(*args)))
+
+
+# --- Write stage (single writer) ---
+
+def _existing_names(cursor, names):
+    found = set()
+    for i in range(0, len(names), NAME_LOOKUP_CHUNK):
+        found.update(repo.existing_names(cursor, names[i:i + NAME_LOOKUP_CHUNK]))
+    return found
+
+@timed("import.write_rows")
+def write_parsed(conn, parsed, reject_path=None):
+    """
+    Inserts parsed rows in one transaction, skipping names already in the database or seen
+    earlier in this import. Returns a summary dict; rejected rows go to reject_path if given.
+    """
+    cursor = conn.cursor()
+    imported = 0
+    duplicates = 0
+    malformed = 0
+    reject_rows = []
+    errors = []
+    seen = set()
+
+    try:
+        for result in parsed:
+            source = os.path.basename(result["path"])
+            if result.get("error"):
+                errors.append(result["error"])
+                continue
+            for line_no, reason, values in result["rejects"]:
+                malformed += 1
+                reject_rows.append([source, line_no, reason] + list(values))
+
+            rows = result["rows"]
+            for start in range(0, len(rows), BATCH_SIZE):
+                batch = rows[start:start + BATCH_SIZE]
+                existing = _existing_names(cursor, list({record[0] for _, record in batch}))
+                to_insert = []
+                for line_no, record in batch:
+                    if record[0] in existing or record[0] in seen:
+                        duplicates += 1
+                        reject_rows.append([source, line_no, "duplicate"] + list(record))
+                    else:
+                        seen.add(record[0])
+                        to_insert.append(record)
+                repo.insert_producers(cursor, to_insert)
+                imported += len(to_insert)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if reject_rows and reject_path:
+        with open(reject_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Source File", "Line", "Reason", "Values..."])
+            writer.writerows(reject_rows)
+
+    return {
+        "imported": imported,
+        "duplicates": duplicates,
+        "malformed": malformed,
+        "errors": errors,
+        "reject_file": reject_path if reject_rows and reject_path else None,
+    }
+
+def default_reject_path(paths):
+    """Returns a timestamped reject file path next to the first imported file."""
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(os.path.dirname(os.path.abspath(paths[0])), f"import_rejects_{stamp}.csv")
+
+def import_files(conn, paths, mappings=None, profiles=None, reject_path=None, service=None):
+    """Parses (in service's workers if given) and writes the given files; see write_parsed() for the returned summary."""
+    if profiles is None:
+        profiles = load_profiles()
+    parsed = parse_files(paths, mappings, profiles, service=service)
+    return write_parsed(conn, parsed, reject_path)
@@ -0,0 +1,174 @@
+"""
+Lightweight timers, counters and latency histograms for GlobalEnergyDB hot paths.
+
+Instrumentation is off by default and costs one flag check per call while disabled.
+Enable it with the GEDB_INSTRUMENTATION=1 environment variable, from the Diagnostics
+window, or by calling enable(). Operations slower than the slow threshold are logged
+to the 'globalenergydb.slow' logger, and also to the file named by GEDB_SLOW_LOG if set.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# Samples kept per operation for percentile estimates; older samples are dropped
+HISTOGRAM_SAMPLES = 2048
+
+slow_logger = logging.getLogger("globalenergydb.slow")
+
+
+class _OperationStats:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=HISTOGRAM_SAMPLES)
+
+
+class _State:
+    def __init__(self):
+        self.enabled = os.environ.get("GEDB_INSTRUMENTATION", "") not in ("", "0", "false", "False")
+        self.slow_threshold = float(os.environ.get("GEDB_SLOW_MS", "250")) / 1000.0
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.counters = {}
+        self.slow_handler = None
+
+_state = _State()
+
+
+def enable(on=True):
+    _state.enabled = bool(on)
+
+def is_enabled():
+    return _state.enabled
+
+def get_slow_threshold_ms():
+    return _state.slow_threshold * 1000.0
+
+def set_slow_threshold_ms(ms):
+    _state.slow_threshold = ms / 1000.0
+
+def set_slow_log_file(path):
+    """Also write slow-operation records to the given file (None stops file logging)."""
+    if _state.slow_handler:
+        slow_logger.removeHandler(_state.slow_handler)
+        _state.slow_handler.close()
+        _state.slow_handler = None
+    if path:
+        handler = logging.FileHandler(path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_logger.addHandler(handler)
+        _state.slow_handler = handler
+
+if os.environ.get("GEDB_SLOW_LOG"):
+    set_slow_log_file(os.environ["GEDB_SLOW_LOG"])
+
+def reset():
+    with _state.lock:
+        _state.operations.clear()
+        _state.counters.clear()
+
+
+def record(name, seconds):
+    """Records one timed sample for an operation."""
+    with _state.lock:
+        stats = _state.operations.get(name)
+        if stats is None:
+            stats = _state.operations[name] = _OperationStats()
+        stats.count += 1
+        stats.total += seconds
+        if seconds > stats.max:
+            stats.max = seconds
+        stats.samples.append(seconds)
+    if seconds >= _state.slow_threshold:
+        slow_logger.warning("slow operation %s took %.1f ms", name, seconds * 1000)
+
+def count(name, n=1):
+    """Increments a named counter (no-op while disabled)."""
+    if not _state.enabled:
+        return
+    with _state.lock:
+        _state.counters[name] = _state.counters.get(name, 0) + n
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            count(self.name + ".errors")
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """Context manager that times its block under the given operation name."""
+    if not _state.enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+def timed(name):
+    """Decorator that times every call of the wrapped function."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            with _Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+def snapshot():
+    """Returns {'operations': {name: stats}, 'counters': {...}} with latencies in milliseconds."""
+    with _state.lock:
+        operations = {name: (s.count, s.total, s.max, sorted(s.samples)) for name, s in _state.operations.items()}
+        counters = dict(_state.counters)
+    result = {}
+    for name, (n, total, max_s, samples) in sorted(operations.items()):
+        result[name] = {
+            "count": n,
+            "total_ms": total * 1000,
+            "mean_ms": total / n * 1000 if n else 0.0,
+            "p50_ms": _percentile(samples, 0.50) * 1000,
+            "p95_ms": _percentile(samples, 0.95) * 1000,
+            "max_ms": max_s * 1000,
+        }
+    return {"enabled": _state.enabled, "operations": result, "counters": counters}
+
+def dump_json(path):
+    """Writes the current snapshot to a JSON file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, indent=2)
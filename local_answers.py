@@ -0,0 +1,233 @@
+"""
+Deterministic answers for simple chatbot questions, without calling the LLM.
+
+Common question shapes are matched with templates and answered from indexed queries:
+  - find by product:  "who makes heat pumps", "suppliers of biodiesel", "where can I buy LNG"
+  - list by category: "list solar producers", "which companies are in the wind category"
+  - lookup by name:   "tell me about Nordic Hydro Power", "what does Atlas Solar sell", "contact for X"
+Products and names are searched through an FTS5 index kept in step with 'producers' by
+triggers; categories and exact names use NOCASE indexes. Anything that does not match a
+template, or matches nothing in the database, is left to the LLM (the answer is None).
+"""
+import re
+import threading
+
+from instrumentation import timed
+
+ANSWER_ROW_LIMIT = 10
+# Matches are counted up to this many, so broad questions stay as fast as narrow ones
+COUNT_CAP = 1000
+
+SEARCH_SCHEMA_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_producers_category_nocase ON producers(category COLLATE NOCASE, name);
+    CREATE INDEX IF NOT EXISTS idx_producers_name_nocase ON producers(name COLLATE NOCASE);
+    CREATE VIRTUAL TABLE IF NOT EXISTS producer_search USING fts5(
+        name, products, content='producers', content_rowid='id', tokenize='porter unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS producers_search_insert AFTER INSERT ON producers BEGIN
+        INSERT INTO producer_search (rowid, name, products) VALUES (NEW.id, NEW.name, NEW.products);
+    END;
+    CREATE TRIGGER IF NOT EXISTS producers_search_delete AFTER DELETE ON producers BEGIN
+        INSERT INTO producer_search (producer_search, rowid, name, products) VALUES ('delete', OLD.id, OLD.name, OLD.products);
+    END;
+    -- Recreated so older databases get the WHEN clause: full-row writes that keep the name and products skip the index
+    DROP TRIGGER IF EXISTS producers_search_update;
+    CREATE TRIGGER producers_search_update AFTER UPDATE OF name, products ON producers
+    WHEN OLD.name IS NOT NEW.name OR OLD.products IS NOT NEW.products BEGIN
+        INSERT INTO producer_search (producer_search, rowid, name, products) VALUES ('delete', OLD.id, OLD.name, OLD.products);
+        INSERT INTO producer_search (rowid, name, products) VALUES (NEW.id, NEW.name, NEW.products);
+    END;
+"""
+
+INTENT_PRODUCT = "product"
+INTENT_CATEGORY = "category"
+INTENT_NAME = "name"
+
+_SUBJECT = r"(?:producers|companies|suppliers|manufacturers|makers|vendors|sellers|firms)"
+_VERB = r"(?:makes?|sells?|produces?|supplies|supply|manufactures?|offers?|provides?)"
+
+# Order matters: the first matching template decides the intent
+_TEMPLATES = [
+    (INTENT_NAME, re.compile(r"^(?:what is the |what's the )?(?P<field>contact|address|category|products)(?: details| info)? (?:of|for) (?P<x>.+)$")),
+    (INTENT_NAME, re.compile(r"^what (?:does|do) (?P<x>.+?) (?:make|sell|produce|supply|offer)$")),
+    (INTENT_PRODUCT, re.compile(rf"^(?:who|which {_SUBJECT}|what {_SUBJECT}) {_VERB} (?P<x>.+)$")),
+    (INTENT_PRODUCT, re.compile(rf"^(?:list |show |find |show me |give me )?(?:all |the )?{_SUBJECT} (?:of|for|selling|making|producing|supplying|offering|that {_VERB}|who {_VERB}) (?P<x>.+)$")),
+    (INTENT_PRODUCT, re.compile(r"^where (?:can|do) i (?:buy|get|find|source) (?P<x>.+)$")),
+    (INTENT_CATEGORY, re.compile(rf"^(?:which|what) {_SUBJECT} are (?:in|under) (?:the )?(?P<x>.+?)(?: category)?$")),
+    (INTENT_CATEGORY, re.compile(rf"^(?:list|show|find|show me|give me)(?: all| the| all the)? (?P<x>.+?) {_SUBJECT}$")),
+    (INTENT_CATEGORY, re.compile(rf"^(?:who|which|what) are the (?P<x>.+?) {_SUBJECT}$")),
+    (INTENT_NAME, re.compile(r"^(?:tell me about|what do you know about|info(?:rmation)? (?:on|about)|details (?:for|of|on)|look ?up|who is) (?P<x>.+)$")),
+]
+
+# Words dropped when a product phrase is retried as a category ("solar panels" -> "solar")
+_GENERIC_WORDS = {"panel", "panels", "energy", "power", "equipment", "products", "product", "systems", "system",
+                  "technology", "technologies", "plants", "plant", "any", "the", "some"}
+
+
+def install_search_index(conn):
+    """Creates the lookup indexes and the FTS5 product/name index, filling it on first creation."""
+    exists = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'producer_search'").fetchone()
+    if exists and "category" in exists[0]:
+        # Older index that also held the category, which no lookup reads (categories use the
+        # NOCASE index); it made every recategorize rewrite the full-text entries too
+        conn.executescript("""
+            DROP TRIGGER IF EXISTS producers_search_insert;
+            DROP TRIGGER IF EXISTS producers_search_delete;
+            DROP TRIGGER IF EXISTS producers_search_update;
+            DROP TABLE producer_search;
+        """)
+        exists = None
+    conn.executescript(SEARCH_SCHEMA_SQL)
+    if not exists:
+        conn.execute("INSERT INTO producer_search (producer_search) VALUES ('rebuild')")
+    conn.commit()
+
+def normalize_question(question):
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+def match_question(question):
+    """Returns (intent, phrase, field) for a recognised question shape, or None."""
+    q = normalize_question(question)
+    for intent, pattern in _TEMPLATES:
+        match = pattern.match(q)
+        if match:
+            phrase = re.sub(r"^(?:the|a|an|any|some) ", "", match.group("x").strip())
+            field = match.groupdict().get("field")
+            if phrase:
+                return intent, phrase, field
+    return None
+
+def _fts_query(column, phrase):
+    tokens = re.findall(r"\w+", phrase)
+    if not tokens:
+        return None
+    # Each token is quoted, so user text can never be read as FTS operators
+    return f"{column} : (" + " AND ".join(f'"{t}"' for t in tokens) + ")"
+
+
+# --- Indexed lookups ---
+
+def _rows_for_fts(conn, column, phrase):
+    query = _fts_query(column, phrase)
+    if query is None:
+        return 0, []
+    total = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM producer_search WHERE producer_search MATCH ? LIMIT ?)",
+                         (query, COUNT_CAP + 1)).fetchone()[0]
+    if not total:
+        return 0, []
+    rows = conn.execute("SELECT p.name, p.contact, p.address, p.products, p.category FROM producer_search s "
+                        "JOIN producers p ON p.id = s.rowid WHERE producer_search MATCH ? LIMIT ?",
+                        (query, ANSWER_ROW_LIMIT)).fetchall()
+    return total, rows
+
+def _category_rows(conn, phrase):
+    candidates = [phrase]
+    stripped = " ".join(w for w in phrase.split() if w not in _GENERIC_WORDS)
+    if stripped and stripped != phrase:
+        candidates.append(stripped)
+    for candidate in candidates:
+        row = conn.execute("SELECT category FROM producers WHERE category = ? COLLATE NOCASE LIMIT 1", (candidate,)).fetchone()
+        if row:
+            category = row[0]
+            total = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM producers WHERE category = ? COLLATE NOCASE LIMIT ?)",
+                                 (category, COUNT_CAP + 1)).fetchone()[0]
+            rows = conn.execute("SELECT name, contact, address, products, category FROM producers "
+                                "WHERE category = ? COLLATE NOCASE ORDER BY name LIMIT ?", (category, ANSWER_ROW_LIMIT)).fetchall()
+            return category, total, rows
+    return None, 0, []
+
+def _format_list(title, total, rows):
+    found = f"more than {COUNT_CAP}" if total > COUNT_CAP else str(total)
+    lines = [f"{title} ({found} found):"]
+    lines.extend(f"- {name} ({category or 'N/A'}): {products or 'N/A'}" for name, _, _, products, category in rows)
+    if total > COUNT_CAP:
+        lines.append("...and many more. Use Search in the main window to see them all.")
+    elif total > len(rows):
+        lines.append(f"...and {total - len(rows)} more. Use Search in the main window to see them all.")
+    return "\n".join(lines)
+
+def _format_producer(row, field=None):
+    name, contact, address, products, category = row
+    values = {"contact": contact, "address": address, "products": products, "category": category}
+    if field:
+        return f"{field.capitalize()} of {name}: {values[field] or 'N/A'}"
+    return f"{name}\n- Category: {category or 'N/A'}\n- Products: {products or 'N/A'}\n" \
+           f"- Contact: {contact or 'N/A'}\n- Address: {address or 'N/A'}"
+
+def _answer_product(conn, phrase):
+    total, rows = _rows_for_fts(conn, "products", phrase)
+    if rows:
+        return _format_list(f"Producers offering {phrase}", total, rows), rows
+    category, total, rows = _category_rows(conn, phrase)
+    if rows:
+        return _format_list(f"{category} producers", total, rows), rows
+    return None, []
+
+def _answer_category(conn, phrase):
+    category, total, rows = _category_rows(conn, phrase)
+    if rows:
+        return _format_list(f"{category} producers", total, rows), rows
+    total, rows = _rows_for_fts(conn, "products", phrase)
+    if rows:
+        return _format_list(f"Producers offering {phrase}", total, rows), rows
+    return None, []
+
+def _answer_name(conn, phrase, field):
+    row = conn.execute("SELECT name, contact, address, products, category FROM producers WHERE name = ? COLLATE NOCASE",
+                       (phrase,)).fetchone()
+    if row:
+        return _format_producer(row, field), [row]
+    total, rows = _rows_for_fts(conn, "name", phrase)
+    if total == 1:
+        return _format_producer(rows[0], field), rows
+    if 1 < total <= ANSWER_ROW_LIMIT:
+        names = "\n".join(f"- {r[0]}" for r in rows)
+        return f"Several producers match '{phrase}':\n{names}\nPlease ask about one of them by its full name.", rows
+    return None, []
+
+_HANDLERS = {
+    INTENT_PRODUCT: lambda conn, phrase, field: _answer_product(conn, phrase),
+    INTENT_CATEGORY: lambda conn, phrase, field: _answer_category(conn, phrase),
+    INTENT_NAME: _answer_name,
+}
+
+@timed("chat.local_answer")
+def answer_question(conn, question):
+    """
+    Returns {'text', 'intent', 'rows'} for questions answerable from the database, or None.
+    rows are (name, contact, address, products, category) tuples behind the answer.
+    """
+    matched = match_question(question)
+    if not matched:
+        return None
+    intent, phrase, field = matched
+    text, rows = _HANDLERS[intent](conn, phrase, field)
+    if not text:
+        return None
+    return {"text": text, "intent": intent, "rows": rows}
+
+
+class MatchStats:
+    """Counts how many chatbot questions were answered locally, per intent."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.questions = 0
+        self.by_source = {}
+
+    def record(self, source):
+        """source is an intent name, 'analytics', or None when the LLM had to answer."""
+        with self.lock:
+            self.questions += 1
+            key = source or "llm"
+            self.by_source[key] = self.by_source.get(key, 0) + 1
+
+    def snapshot(self):
+        """Returns (questions, answered locally, {source: count})."""
+        with self.lock:
+            return self.questions, self.questions - self.by_source.get("llm", 0), dict(self.by_source)
+
+    def summary(self):
+        questions, local, _ = self.snapshot()
+        fraction = local / questions if questions else 0.0
+        return f"Answered locally: {local} of {questions} questions ({fraction:.0%})"
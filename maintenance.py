@@ -0,0 +1,374 @@
+"""
+Database maintenance: online backups, statistics, compaction and integrity checks.
+
+Every task uses its own connection and works in small steps, so the app stays usable:
+  - backups copy the live database with SQLite's online backup API a few hundred pages
+    at a time, pausing between steps so the app's writes are never held up for long,
+  - PRAGMA optimize keeps the query planner's statistics current (a full ANALYZE runs
+    only when there are none yet),
+  - incremental vacuum hands free pages left by deletes back to the file system in
+    bounded batches,
+  - PRAGMA quick_check looks for corruption without the cost of a full integrity_check.
+MaintenanceScheduler runs the tasks that are due once the app has been idle for a while
+and stops between steps as soon as the user is back. Each run reports the database size
+and the timing of a few representative queries before and after.
+
+    python maintenance.py global_energy_db.sqlite
+    python maintenance.py global_energy_db.sqlite --tasks backup quick_check
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from instrumentation import timed
+
+TASK_BACKUP = "backup"
+TASK_OPTIMIZE = "optimize"
+TASK_VACUUM = "vacuum"
+TASK_QUICK_CHECK = "quick_check"
+ALL_TASKS = (TASK_BACKUP, TASK_OPTIMIZE, TASK_VACUUM, TASK_QUICK_CHECK)
+
+# How often each task is due, in seconds
+TASK_INTERVALS = {
+    TASK_BACKUP: 24 * 3600,
+    TASK_OPTIMIZE: 6 * 3600,
+    TASK_VACUUM: 24 * 3600,
+    TASK_QUICK_CHECK: 24 * 3600,
+}
+
+IDLE_SECONDS = 120  # no keyboard or mouse input for this long counts as idle
+BUSY_TIMEOUT = 10  # seconds a maintenance step waits for the app to release a write lock
+
+BACKUP_KEEP = 5
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+VACUUM_PAGES_PER_STEP = 512
+ANALYSIS_LIMIT = 1000  # rows sampled per index by PRAGMA optimize
+QUICK_CHECK_MAX_ERRORS = 20
+
+# Representative reads timed before and after maintenance
+PROBE_QUERIES = [
+    ("count", "SELECT COUNT(*) FROM producers"),
+    ("search_name", "SELECT COUNT(*) FROM producers WHERE name LIKE '%Solar%'"),
+    ("category", "SELECT COUNT(*) FROM producers WHERE category = 'Wind' COLLATE NOCASE"),
+    ("page_by_id", "SELECT id, name, contact, address, products, category FROM producers WHERE id > 1000 ORDER BY id LIMIT 500"),
+]
+
+
+def connect(db_path):
+    """Opens an autocommit connection for maintenance (VACUUM cannot run inside a transaction)."""
+    return sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+
+def default_backup_dir(db_path):
+    return os.path.splitext(db_path)[0] + "_backups"
+
+def state_path_for(db_path):
+    return os.path.splitext(db_path)[0] + ".maintenance.json"
+
+
+# --- Measurements ---
+
+def database_size(conn):
+    """Returns {'file_bytes', 'free_bytes', 'pages', 'free_pages'} from the page counts."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"file_bytes": pages * page_size, "free_bytes": free_pages * page_size,
+            "pages": pages, "free_pages": free_pages}
+
+def time_queries(conn, queries=PROBE_QUERIES, repeat=3):
+    """Returns {query name: best time in ms}; queries that fail (e.g. a missing table) are skipped."""
+    timings = {}
+    for name, sql in queries:
+        best = None
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sql).fetchall()
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+        except sqlite3.Error:
+            continue
+        timings[name] = best
+    return timings
+
+
+# --- Tasks ---
+
+@timed("maintenance.backup")
+def backup_database(db_path, backup_dir=None, keep=BACKUP_KEEP, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+    """
+    Copies the live database into backup_dir with the online backup API, keeping the newest
+    `keep` backups. Returns {'path', 'size', 'pages', 'seconds'}.
+    """
+    backup_dir = backup_dir or default_backup_dir(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    dest_path = os.path.join(backup_dir, f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}.sqlite")
+    temp_path = dest_path + ".tmp"
+    start = time.perf_counter()
+    copied = [0]
+
+    def progress(status, remaining, total):
+        copied[0] = total
+
+    source = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        dest = sqlite3.connect(temp_path)
+        try:
+            # Each step holds a read lock for `pages` pages only; writes land between steps
+            source.backup(dest, pages=pages, progress=progress, sleep=sleep)
+        finally:
+            dest.close()
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        source.close()
+    os.replace(temp_path, dest_path)
+
+    backups = sorted(glob.glob(os.path.join(backup_dir, f"{glob.escape(stem)}-*.sqlite")))
+    for old in backups[:-keep] if keep else []:
+        os.remove(old)
+    return {"path": dest_path, "size": os.path.getsize(dest_path), "pages": copied[0],
+            "seconds": time.perf_counter() - start}
+
+@timed("maintenance.optimize")
+def optimize(conn):
+    """Refreshes planner statistics. Returns 'analyze' when a full ANALYZE was needed, else 'optimize'."""
+    has_stats = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if not has_stats:
+        conn.execute("ANALYZE")
+        return "analyze"
+    conn.execute(f"PRAGMA analysis_limit = {int(ANALYSIS_LIMIT)}")
+    conn.execute("PRAGMA optimize")
+    return "optimize"
+
+def enable_incremental_vacuum(conn):
+    """
+    Switches the database to auto_vacuum=INCREMENTAL. A database created without it needs one
+    full VACUUM to convert, which rewrites the file; returns True when that happened.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+@timed("maintenance.vacuum")
+def incremental_vacuum(conn, pages_per_step=VACUUM_PAGES_PER_STEP, should_stop=None):
+    """
+    Releases free pages in batches of pages_per_step until none are left or should_stop()
+    returns True. Returns {'converted', 'pages_freed', 'stopped'}.
+    """
+    converted = enable_incremental_vacuum(conn)
+    freed = 0
+    stopped = False
+    while True:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free_pages:
+            break
+        if should_stop and should_stop():
+            stopped = True
+            break
+        # The pragma frees one page per step; execute() steps it only once, executescript() to the end
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages_per_step)});")
+        freed += free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"converted": converted, "pages_freed": freed, "stopped": stopped}
+
+@timed("maintenance.quick_check")
+def quick_check(conn, max_errors=QUICK_CHECK_MAX_ERRORS):
+    """Runs PRAGMA quick_check. Returns (ok, [problems])."""
+    problems = [row[0] for row in conn.execute(f"PRAGMA quick_check({int(max_errors)})")]
+    return problems == ["ok"], [] if problems == ["ok"] else problems
+
+
+# --- Runs ---
+
+def run_maintenance(db_path, tasks=ALL_TASKS, should_stop=None, backup_dir=None):
+    """
+    Runs the given tasks in order on a fresh connection. Tasks not started before should_stop()
+    returns True are listed under 'skipped'. Returns a report dict (see format_report()).
+    """
+    report = {"database": db_path, "started": time.time(), "tasks": {}, "skipped": []}
+    conn = connect(db_path)
+    try:
+        report["size_before"] = database_size(conn)
+        report["queries_before"] = time_queries(conn)
+        for task in tasks:
+            if should_stop and should_stop():
+                report["skipped"].append(task)
+                continue
+            start = time.perf_counter()
+            try:
+                if task == TASK_BACKUP:
+                    result = backup_database(db_path, backup_dir)
+                elif task == TASK_OPTIMIZE:
+                    result = {"mode": optimize(conn)}
+                elif task == TASK_VACUUM:
+                    result = incremental_vacuum(conn, should_stop=should_stop)
+                elif task == TASK_QUICK_CHECK:
+                    ok, problems = quick_check(conn)
+                    result = {"ok": ok, "problems": problems}
+                else:
+                    raise ValueError(f"Unknown maintenance task: {task}")
+            except (sqlite3.Error, OSError) as e:
+                result = {"error": str(e)}
+            result["seconds"] = time.perf_counter() - start
+            report["tasks"][task] = result
+        report["size_after"] = database_size(conn)
+        report["queries_after"] = time_queries(conn)
+    finally:
+        conn.close()
+    report["seconds"] = time.time() - report["started"]
+    return report
+
+def _mib(size):
+    return f"{size / 1048576:.2f} MiB"
+
+def format_report(report):
+    """Renders a maintenance report as readable text."""
+    lines = [f"Maintenance of {report['database']} on {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(report['started']))} "
+             f"({report['seconds']:.1f} s)"]
+    for task, result in report["tasks"].items():
+        if "error" in result:
+            detail = f"failed: {result['error']}"
+        elif task == TASK_BACKUP:
+            detail = f"{result['path']} ({_mib(result['size'])})"
+        elif task == TASK_OPTIMIZE:
+            detail = "full ANALYZE" if result["mode"] == "analyze" else "PRAGMA optimize"
+        elif task == TASK_VACUUM:
+            detail = f"{result['pages_freed']} free pages released" + \
+                     (" (converted to incremental auto-vacuum)" if result["converted"] else "") + \
+                     (", stopped early" if result["stopped"] else "")
+        else:
+            detail = "ok" if result["ok"] else "PROBLEMS FOUND: " + "; ".join(result["problems"][:5])
+        lines.append(f"  - {task}: {detail} [{result['seconds']:.2f} s]")
+    if report["skipped"]:
+        lines.append(f"  - skipped (activity resumed): {', '.join(report['skipped'])}")
+
+    before, after = report["size_before"], report["size_after"]
+    lines.append(f"Size: {_mib(before['file_bytes'])} ({_mib(before['free_bytes'])} free) -> "
+                 f"{_mib(after['file_bytes'])} ({_mib(after['free_bytes'])} free)")
+    lines.append("Query timings (best of 3, ms):")
+    for name, ms in report["queries_before"].items():
+        after_ms = report["queries_after"].get(name)
+        lines.append(f"  - {name}: {ms:.2f} -> " + (f"{after_ms:.2f}" if after_ms is not None else "n/a"))
+    return "\n".join(lines)
+
+
+# --- Scheduling ---
+
+class MaintenanceScheduler:
+    """
+    Decides when maintenance runs. The app reports user activity with note_activity() and calls
+    poll() periodically; due tasks start in a background thread once the app has been idle for
+    idle_seconds, and stop between steps when activity resumes. Last run times and the latest
+    report are kept in a small JSON state file.
+    """
+
+    def __init__(self, db_path, state_path=None, idle_seconds=IDLE_SECONDS, intervals=None, on_finish=None):
+        self.db_path = db_path
+        self.state_path = state_path or state_path_for(db_path)
+        self.idle_seconds = idle_seconds
+        self.intervals = dict(TASK_INTERVALS, **(intervals or {}))
+        self.on_finish = on_finish  # called from the worker thread with the report
+        self.last_activity = time.monotonic()
+        self.lock = threading.Lock()
+        self.running = False
+        self.closing = threading.Event()
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if isinstance(state, dict):
+                state.setdefault("last_run", {})
+                return state
+        except (OSError, ValueError):
+            pass
+        return {"last_run": {}, "last_report": None}
+
+    def _save_state(self):
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+
+    def note_activity(self, event=None):
+        self.last_activity = time.monotonic()
+
+    def is_idle(self):
+        return time.monotonic() - self.last_activity >= self.idle_seconds
+
+    def due_tasks(self, now=None):
+        now = time.time() if now is None else now
+        return [t for t in ALL_TASKS if now - self.state["last_run"].get(t, 0) >= self.intervals[t]]
+
+    def last_report(self):
+        return self.state.get("last_report")
+
+    def poll(self):
+        """Starts due tasks if the app is idle; returns True when a run was started."""
+        if not self.is_idle():
+            return False
+        tasks = self.due_tasks()
+        return bool(tasks) and self._start(tasks, lambda: self.closing.is_set() or not self.is_idle())
+
+    def run_now(self, tasks=ALL_TASKS):
+        """Starts the given tasks immediately, whatever the idle state; returns False if a run is in progress."""
+        return self._start(list(tasks), self.closing.is_set)
+
+    def _start(self, tasks, should_stop):
+        with self.lock:
+            if self.running:
+                return False
+            self.running = True
+        threading.Thread(target=self._run, args=(tasks, should_stop), daemon=True).start()
+        return True
+
+    def _run(self, tasks, should_stop):
+        try:
+            report = run_maintenance(self.db_path, tasks, should_stop)
+            for task, result in report["tasks"].items():
+                # A vacuum cut short is finished on the next idle period
+                if "error" not in result and not result.get("stopped"):
+                    self.state["last_run"][task] = report["started"]
+            self.state["last_report"] = report
+            try:
+                self._save_state()
+            except OSError:
+                pass
+        except Exception as e:
+            report = {"error": str(e)}
+        finally:
+            with self.lock:
+                self.running = False
+        if self.on_finish and not self.closing.is_set():
+            self.on_finish(report)
+
+    def close(self):
+        """Asks a running maintenance pass to stop at its next step."""
+        self.closing.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run GlobalEnergyDB database maintenance now.")
+    parser.add_argument("database")
+    parser.add_argument("--tasks", nargs="+", choices=ALL_TASKS, default=list(ALL_TASKS))
+    parser.add_argument("--backup-dir", help="where backups are written (default: <database>_backups)")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.database):
+        parser.error(f"database not found: {args.database}")
+    report = run_maintenance(args.database, args.tasks, backup_dir=args.backup_dir)
+    print(format_report(report))
+    failed = any("error" in r or r.get("ok") is False for r in report["tasks"].values())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+Database access for the 'producers' table.
+Functions take an open connection or cursor so they can be shared by the Tkinter app and
+by headless tools such as benchmark.py. SQL is written for SQLite with '?' placeholders;
+storage.dialect_for() adapts it when the connection belongs to a PostgreSQL server.
+"""
+import csv
+import datetime
+import re
+
+import storage
+from instrumentation import timed
+from prompts import PRODUCER_FIELD_TOKENS, truncate_text
+from row_store import RowStore
+
+# --- Attempt to import optional libraries ---
+try:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+PRODUCER_HEADERS = ["ID", "Name", "Contact", "Address", "Products", "Category"]
+IMPORT_COLUMNS = ["name", "contact", "address", "products", "category"]
+
+# Explicit column list: the table also carries geocoding columns that the grid and exports don't show
+SELECT_PRODUCERS_SQL = "SELECT id, name, contact, address, products, category FROM producers"
+
+INSERT_PRODUCER_SQL = "INSERT INTO producers (name, contact, address, products, category) VALUES (?, ?, ?, ?, ?)"
+
+# Insert, or replace the other fields of the producer with the same name (SQLite 3.24+ and PostgreSQL)
+UPSERT_PRODUCER_SQL = INSERT_PRODUCER_SQL + (" ON CONFLICT (name) DO UPDATE SET contact = excluded.contact, "
+                                             "address = excluded.address, products = excluded.products, category = excluded.category")
+
+# Temporary table holding the ids a bulk operation works on; see stage_producer_ids()
+SELECTED_IDS_TABLE = "selected_producer_ids"
+IN_SELECTED_IDS = f" WHERE id IN (SELECT id FROM {SELECTED_IDS_TABLE})"
+
+GENERAL_DB_INFO = "\nGeneral information about GlobalEnergyDB: This project aims to centralize data on global energy production, consumption, and reserves. It includes details on producers and their products (e.g., solar, wind, oil, gas)."
+
+
+def create_producers_table(conn):
+    """Creates the 'producers' table if it doesn't exist."""
+    storage.dialect_for(conn).create_producers_table(conn)
+
+def build_search_clause(search_term, search_by, like="LIKE"):
+    """Returns the (WHERE clause, params) pair for a producer search, or ("", [])."""
+    if search_term and search_by:
+        if search_by == "Name":
+            return f" WHERE name {like} ?", [f"%{search_term}%"]
+        elif search_by == "Category":
+            return f" WHERE category {like} ?", [f"%{search_term}%"]
+    return "", []
+
+@timed("db.search_producers")
+def search_producers(cursor, search_term="", search_by=""):
+    """Returns all producer rows, optionally filtered by name or category."""
+    dialect = storage.dialect_for(cursor)
+    where_sql, params = build_search_clause(search_term, search_by, dialect.like)
+    cursor.execute(dialect.sql(SELECT_PRODUCERS_SQL + where_sql), params)
+    return cursor.fetchall()
+
+@timed("db.load_producer_store")
+def load_producer_store(cursor, search_term="", search_by=""):
+    """Like search_producers(), but streams the rows into a compact RowStore ordered by id."""
+    dialect = storage.dialect_for(cursor)
+    where_sql, params = build_search_clause(search_term, search_by, dialect.like)
+    return RowStore(dialect.stream(cursor, SELECT_PRODUCERS_SQL + where_sql + " ORDER BY id", params))
+
+def fetch_producer_row(cursor, producer_id, search_term="", search_by=""):
+    """Returns one producer row if it exists and matches the search filter, else None."""
+    dialect = storage.dialect_for(cursor)
+    where_sql, params = build_search_clause(search_term, search_by, dialect.like)
+    where_sql = (where_sql + " AND" if where_sql else " WHERE") + " id = ?"
+    cursor.execute(dialect.sql(SELECT_PRODUCERS_SQL + where_sql), params + [producer_id])
+    return cursor.fetchone()
+
+@timed("db.producer_exists")
+def producer_exists(cursor, name):
+    cursor.execute(storage.dialect_for(cursor).sql("SELECT 1 FROM producers WHERE name = ?"), (name,))
+    return cursor.fetchone() is not None
+
+@timed("db.insert_producer")
+def insert_producer(cursor, values):
+    """Inserts one (name, contact, address, products, category) row; returns its new id. The caller commits."""
+    return storage.dialect_for(cursor).insert_returning_id(cursor, INSERT_PRODUCER_SQL, values)
+
+@timed("db.update_producer")
+def update_producer(cursor, producer_id, values):
+    """Replaces the five editable fields of a producer. The caller commits."""
+    cursor.execute(storage.dialect_for(cursor).sql(
+        "UPDATE producers SET name=?, contact=?, address=?, products=?, category=? WHERE id=?"),
+        tuple(values) + (producer_id,))
+
+@timed("db.delete_producer")
+def delete_producer(cursor, producer_id):
+    cursor.execute(storage.dialect_for(cursor).sql("DELETE FROM producers WHERE id=?"), (producer_id,))
+
+def restore_producers(cursor, rows):
+    """Re-inserts deleted producers with their original ids, in one executemany. The caller commits."""
+    cursor.executemany(storage.dialect_for(cursor).sql(
+        "INSERT INTO producers (id, name, contact, address, products, category) VALUES (?, ?, ?, ?, ?, ?)"),
+        [tuple(row) for row in rows])
+
+def update_producers(cursor, rows):
+    """Writes full (id, name, contact, address, products, category) rows back, in one executemany. The caller commits."""
+    cursor.executemany(storage.dialect_for(cursor).sql(
+        "UPDATE producers SET name=?, contact=?, address=?, products=?, category=? WHERE id=?"),
+        [tuple(row[1:]) + (row[0],) for row in rows])
+
+# --- Bulk operations over a set of ids ---
+# The ids go into a temporary table once; every bulk statement then joins against it, so
+# changing 10,000 producers is one statement with one parameter, like changing one.
+
+@timed("db.stage_producer_ids")
+def stage_producer_ids(cursor, producer_ids):
+    """Replaces the contents of the selected-ids table with producer_ids. Returns how many were staged."""
+    ids = sorted({int(pid) for pid in producer_ids})
+    storage.dialect_for(cursor).stage_ids(cursor, SELECTED_IDS_TABLE, ids)
+    return len(ids)
+
+def fetch_staged_rows(cursor):
+    """Returns the producer rows for the staged ids, in id order."""
+    cursor.execute(SELECT_PRODUCERS_SQL + IN_SELECTED_IDS + " ORDER BY id")
+    return cursor.fetchall()
+
+def stream_staged_producers(cursor):
+    """Iterates over the producer rows for the staged ids in id order, for exports."""
+    return storage.dialect_for(cursor).stream(cursor, SELECT_PRODUCERS_SQL + IN_SELECTED_IDS + " ORDER BY id")
+
+@timed("db.recategorize_staged")
+def recategorize_staged(cursor, category):
+    """Sets the category of every staged producer. Returns the number of rows updated. The caller commits."""
+    cursor.execute(storage.dialect_for(cursor).sql("UPDATE producers SET category = ?" + IN_SELECTED_IDS), (category,))
+    return cursor.rowcount
+
+@timed("db.delete_staged")
+def delete_staged(cursor):
+    """Deletes every staged producer. Returns the number of rows deleted. The caller commits."""
+    cursor.execute("DELETE FROM producers" + IN_SELECTED_IDS)
+    return cursor.rowcount
+
+def fetch_producer_rows(cursor, producer_ids, batch=500):
+    """Returns the producer rows for the given ids (those that exist), in id order."""
+    dialect = storage.dialect_for(cursor)
+    ids = sorted({int(pid) for pid in producer_ids})
+    rows = []
+    for start in range(0, len(ids), batch):
+        chunk = ids[start:start + batch]
+        cursor.execute(dialect.sql(SELECT_PRODUCERS_SQL + f" WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id"), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+def existing_names(cursor, names):
+    """Returns the subset of names already in the table (names should be at most a few hundred)."""
+    if not names:
+        return set()
+    sql = f"SELECT name FROM producers WHERE name IN ({','.join('?' * len(names))})"
+    cursor.execute(storage.dialect_for(cursor).sql(sql), list(names))
+    return {row[0] for row in cursor.fetchall()}
+
+def fetch_producers_by_name(cursor, names):
+    """Returns {name: (name, contact, address, products, category)} for the names that exist (at most a few hundred)."""
+    if not names:
+        return {}
+    sql = f"SELECT name, contact, address, products, category FROM producers WHERE name IN ({','.join('?' * len(names))})"
+    cursor.execute(storage.dialect_for(cursor).sql(sql), list(names))
+    return {row[0]: tuple(row) for row in cursor.fetchall()}
+
+@timed("db.upsert_producers")
+def upsert_producers(cursor, rows):
+    """Inserts (name, contact, address, products, category) rows, updating producers whose name exists. The caller commits."""
+    cursor.executemany(storage.dialect_for(cursor).sql(UPSERT_PRODUCER_SQL), [tuple(row) for row in rows])
+
+@timed("db.delete_producers_by_name")
+def delete_producers_by_name(cursor, names):
+    """Deletes the producers with the given names. The caller commits."""
+    cursor.executemany(storage.dialect_for(cursor).sql("DELETE FROM producers WHERE name = ?"), [(name,) for name in names])
+
+@timed("db.insert_producers")
+def insert_producers(cursor, rows):
+    """Bulk-inserts (name, contact, address, products, category) rows: executemany on SQLite, COPY on PostgreSQL."""
+    storage.dialect_for(cursor).bulk_insert(cursor, "producers", IMPORT_COLUMNS, rows)
+
+def stream_producers(cursor):
+    """Iterates over every producer row in id order without loading them all at once."""
+    return storage.dialect_for(cursor).stream(cursor, SELECT_PRODUCERS_SQL + " ORDER BY id")
+
+@timed("export.csv")
+def write_producers_csv(cursor, filepath, rows=None):
+    """Writes every producer row to a CSV file. rows (e.g. a cached RowStore) saves the query."""
+    with open(filepath, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(PRODUCER_HEADERS)
+        writer.writerows(stream_producers(cursor) if rows is None else rows)
+
+@timed("export.pdf")
+def write_producers_pdf(cursor, filepath, rows=None):
+    """Writes every producer row to a PDF table using ReportLab. rows (e.g. a cached RowStore) saves the query."""
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError("ReportLab library not found. PDF export is disabled. Please install it using 'pip install reportlab'.")
+
+    doc = SimpleDocTemplate(filepath, pagesize=letter)
+    styles = getSampleStyleSheet()
+    elements = []
+
+    elements.append(Paragraph("Global Energy Producers Database", styles['h1']))
+    elements.append(Spacer(1, 0.2 * inch))
+
+    data = [list(PRODUCER_HEADERS)]
+    for row in stream_producers(cursor) if rows is None else rows:
+        data.append(list(row))
+
+    table = Table(data)
+
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    elements.append(table)
+    elements.append(Spacer(1, 0.2 * inch))
+
+    current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    elements.append(Paragraph(f"Exported on: {current_time}", styles['Normal']))
+
+    doc.build(elements)
+
+CONTEXT_STOP_WORDS = {"what", "is", "are", "tell", "me", "about", "who", "which", "show", "list", "of", "the", "a", "an", "find"}
+
+@timed("db.retrieve_context")
+def retrieve_context_rows(cursor, query, limit=5):
+    """Returns up to limit (name, products, category) rows matching keywords in the query."""
+    # Simple keyword extraction (can be enhanced with NLP libraries)
+    keywords = re.findall(r'\b\w+\b', query.lower())
+    # Filter out common stop words if necessary for more precise search
+    filtered_keywords = [word for word in keywords if word not in CONTEXT_STOP_WORDS and len(word) > 2]
+
+    # Build a dynamic query to search across relevant columns
+    dialect = storage.dialect_for(cursor)
+    like = dialect.like
+    sql_parts = []
+    params = []
+    for kw in filtered_keywords:
+        sql_parts.append(f"name {like} ? OR products {like} ? OR category {like} ?")
+        params.extend([f"%{kw}%", f"%{kw}%", f"%{kw}%"])
+
+    if not sql_parts:
+        return []
+    query_sql = "SELECT name, products, category FROM producers WHERE " + " OR ".join(sql_parts) + " LIMIT ?" # Limit results for concise context
+    cursor.execute(dialect.sql(query_sql), params + [limit])
+    return cursor.fetchall()
+
+def format_context_row(row):
+    """Formats a (name, products, category) row as one readable context line, each field cut to its prompt limit."""
+    name, products, category = (truncate_text(value, PRODUCER_FIELD_TOKENS[field]) if value else "N/A"
+                                for value, field in zip(row, ("name", "products", "category")))
+    return f"- Name: {name}, Products: {products}, Category: {category}"
+
+def retrieve_context(cursor, query):
+    """
+    Retrieves relevant context from the producers database based on keywords in the query.
+    This simulates the "learning from stored data" aspect.
+    """
+    context_data = []
+    rows = retrieve_context_rows(cursor, query)
+    if rows:
+        context_data.append("Relevant producer information from the database:")
+        context_data.extend(format_context_row(row) for row in rows)
+
+    # Always include some general information about the DB if no specific data is found
+    if not context_data:
+        context_data.append("No specific producer data found in the database for your query.")
+
+    context_data.append(GENERAL_DB_INFO)
+
+    return "\n".join(context_data)
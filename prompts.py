@@ -0,0 +1,191 @@
+"""
+Prompt building for every Gemini request.
+
+Each prompt comes from a PromptTemplate, parsed once at import:
+  - values are cut to a per-field token limit (a producer with a huge products list cannot
+    inflate a prompt),
+  - the finished prompt is held to a per-request token budget. Over budget, the largest
+    values that may shrink are cut further, never the fixed instruction text,
+  - the prompt's size is recorded per feature in `stats`, shown in the Diagnostics window.
+Token counts are estimated locally (about four characters per token); no tokenizer call is made.
+"""
+import string
+import threading
+
+import instrumentation
+
+MAX_PROMPT_TOKENS = 4000  # default per-request budget
+MIN_FIELD_TOKENS = 8  # a value is never cut shorter than this to meet the budget
+TRUNCATION_MARK = "..."
+
+# Per-field limits for producer values quoted in prompts and chat context
+PRODUCER_FIELD_TOKENS = {"name": 40, "contact": 60, "address": 60, "products": 150, "category": 20}
+QUESTION_TOKENS = 250
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting: about four characters per token."""
+    return (len(text) + 3) // 4 if text else 0
+
+def truncate_text(text, max_tokens):
+    """Cuts text to about max_tokens, at a word boundary where possible, marking the cut."""
+    text = text or ""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(0, max_chars - len(TRUNCATION_MARK))]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,;") + TRUNCATION_MARK
+
+
+class PromptStats:
+    """Prompt counts and estimated sizes per feature. Safe to update from worker threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.features = {}
+
+    def record(self, feature, tokens, truncated_fields):
+        with self.lock:
+            entry = self.features.setdefault(feature, {"prompts": 0, "tokens": 0, "max_tokens": 0, "truncated": 0})
+            entry["prompts"] += 1
+            entry["tokens"] += tokens
+            entry["max_tokens"] = max(entry["max_tokens"], tokens)
+            entry["truncated"] += bool(truncated_fields)
+        instrumentation.count(f"prompt.{feature}.tokens", tokens)
+
+    def snapshot(self):
+        """Returns {feature: {'prompts', 'tokens', 'avg_tokens', 'max_tokens', 'truncated'}}."""
+        with self.lock:
+            return {feature: dict(entry, avg_tokens=entry["tokens"] / entry["prompts"])
+                    for feature, entry in sorted(self.features.items())}
+
+    def reset(self):
+        with self.lock:
+            self.features.clear()
+
+stats = PromptStats()
+
+
+class PromptTemplate:
+    """
+    A prompt with {field} placeholders. field_tokens caps individual values; fixed names the
+    fields that are never shortened to meet the budget. A template without a feature name is a
+    fragment for a larger prompt and is not counted in the stats.
+    """
+
+    def __init__(self, feature, text, field_tokens=None, fixed=(), budget=MAX_PROMPT_TOKENS):
+        self.feature = feature
+        self.field_tokens = field_tokens or {}
+        self.fixed = set(fixed)
+        self.budget = budget
+        self._parts = []  # (literal text, field name or None)
+        for literal, field, _, _ in string.Formatter().parse(text):
+            self._parts.append((literal, field))
+        self.fields = [field for _, field in self._parts if field]
+        self._static_tokens = sum(estimate_tokens(literal) for literal, _ in self._parts)
+
+    def estimate_tokens(self, **values):
+        """Estimated size of the rendered prompt, without rendering it or recording stats."""
+        total = self._static_tokens
+        for field in self.fields:
+            tokens = estimate_tokens(str(values[field])) if values.get(field) is not None else 0
+            limit = self.field_tokens.get(field)
+            total += min(tokens, limit) if limit else tokens
+        return min(total, self.budget)
+
+    def render(self, **values):
+        """Returns the prompt with every field filled in, truncated to the field limits and the budget."""
+        texts = {}
+        truncated = set()
+        for field in self.fields:
+            value = str(values[field]) if values.get(field) is not None else ""
+            limit = self.field_tokens.get(field)
+            if limit and estimate_tokens(value) > limit:
+                value = truncate_text(value, limit)
+                truncated.add(field)
+            texts[field] = value
+
+        total = self._static_tokens + sum(estimate_tokens(texts[field]) for field in self.fields)
+        while total > self.budget:
+            shrinkable = [f for f in texts if f not in self.fixed and estimate_tokens(texts[f]) > MIN_FIELD_TOKENS]
+            if not shrinkable:
+                break
+            field = max(shrinkable, key=lambda f: len(texts[f]))
+            tokens = estimate_tokens(texts[field])
+            texts[field] = truncate_text(texts[field], max(MIN_FIELD_TOKENS, tokens - (total - self.budget)))
+            truncated.add(field)
+            total -= tokens - estimate_tokens(texts[field])
+
+        prompt = "".join(literal + (texts[field] if field else "") for literal, field in self._parts)
+        if self.feature:
+            stats.record(self.feature, estimate_tokens(prompt), truncated)
+        return prompt
+
+
+# --- Templates ---
+
+CATEGORY_EXAMPLES = "'Solar', 'Wind', 'Hydro', 'Biofuel', 'Geothermal', 'Nuclear', 'Fossil Fuel'"
+
+TABLE_DESCRIPTION = "Stores information about global energy producers including their name, contact details, address, products they offer, and their energy category (e.g., Solar, Wind, Hydro, Biofuel, Geothermal, Nuclear, Fossil Fuel)."
+
+ADD_SUGGESTION = PromptTemplate(
+    "add_suggestion",
+    "Given the producer name '{name}', contact '{contact}', and address '{address}', "
+    f"suggest a suitable category (e.g., {CATEGORY_EXAMPLES}) "
+    "and representative products. Format as 'Category: [category], Products: [product1, product2]'. "
+    "If no information is sufficient, state 'Category: Unknown, Products: None'.",
+    PRODUCER_FIELD_TOKENS, budget=400)
+
+UPDATE_ASSESSMENT = PromptTemplate(
+    "update_assessment",
+    "Review the following producer data for potential issues or suggestions: "
+    "Name: {name}, Contact: {contact}, Address: {address}, Products: {products}, Category: {category}. "
+    "Provide a brief assessment or suggest improvements if any. If no issues, state 'No issues found'.",
+    PRODUCER_FIELD_TOKENS, budget=500)
+
+SQL_GENERATION = PromptTemplate(
+    "sql_generation",
+    "Given the SQLite database schema:\n\n"
+    "CREATE TABLE producers (\n"
+    "    id INTEGER PRIMARY KEY AUTOINCREMENT,\n"
+    "    name TEXT NOT NULL UNIQUE,\n"
+    "    contact TEXT,\n"
+    "    address TEXT,\n"
+    "    products TEXT,\n"
+    "    category TEXT,\n"
+    "    latitude REAL,\n"
+    "    longitude REAL,\n"
+    "    geo_precision TEXT -- 'city', 'country' or 'none'\n"
+    ");\n\n"
+    f"Table description: {TABLE_DESCRIPTION}\n\n"
+    "Convert the following natural language query into a valid SQLite SQL SELECT statement. "
+    "Only provide the SQL query, nothing else. Do not add any backticks or extra formatting. "
+    "If the query cannot be translated to a SELECT statement, respond with 'INVALID_QUERY'.\n\n"
+    "Natural language query: '{question}'\n\nSQL:",
+    {"question": QUESTION_TOKENS}, budget=600)
+
+# The assistant instructions that open every chatbot prompt
+CHAT_INSTRUCTIONS = PromptTemplate(
+    None,
+    "You are a helpful assistant providing information about global energy data. "
+    "Answer the following question concisely based ONLY on the provided context about producers. "
+    "If the answer is not available in the context, respond with: "
+    "'I don't have that specific information in my database. You might find it by searching online. "
+    "[WEB_SEARCH_SUGGESTION: {question} global energy]' "
+    "Otherwise, provide the answer directly from the context. ",
+    {"question": QUESTION_TOKENS})
+
+# Single-turn chatbot answer (gemini_chat_response)
+CHAT_RESPONSE = PromptTemplate(
+    "chat_response",
+    "{instructions}\n\nContext:\n{context}\n\nQuestion: {question}",
+    {"question": QUESTION_TOKENS}, fixed=("instructions",), budget=2000)
+
+# Chatbot turn with session memory; ChatSession keeps each part within its own budget first
+CHAT_SESSION = PromptTemplate(
+    "chat_session",
+    "{instructions}\n\n{context}{memory}\n\nQuestion: {question}",
+    {"question": QUESTION_TOKENS}, fixed=("instructions",), budget=3000)
@@ -0,0 +1,302 @@
+"""
+Compact in-memory storage for producer result sets.
+
+A RowStore keeps (id, name, contact, address, products, category) rows in columns instead of
+a list of tuples:
+  - ids in an array of 32-bit integers, kept in ascending order (widened to 64 bits if an id
+    does not fit),
+  - categories as 16-bit codes into a list of interned category strings (widened to 32 bits
+    past 65,536 distinct categories, which free-text imports can reach),
+  - the four free-text fields UTF-8 encoded back to back in per-chunk blobs, each led by
+    the fields' byte lengths. A blob holds up to CHUNK_ROWS rows and is zlib-compressed;
+    the most recently used chunk is kept unpacked, with its field end offsets.
+Reading a page of rows touches one or two chunks. Single-row changes re-encode one chunk;
+bulk removals re-encode each affected chunk once, and bulk category changes touch no chunk.
+"""
+import bisect
+import sys
+import zlib
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+
+CHUNK_ROWS = 512
+TEXT_FIELDS = 4  # name, contact, address, products
+COMPRESSION_LEVEL = 6
+_LENGTH_SIZE = array('I').itemsize
+
+# Result sets kept by SearchCache; each is small, so several filters can stay warm
+SEARCH_CACHE_SIZE = 4
+
+
+class _Chunk:
+    """One compressed block of rows: field lengths (array of 'I') followed by the UTF-8 text."""
+    __slots__ = ("blob", "count")
+
+    def __init__(self, texts):
+        """texts is a list of 4-tuples of str (name, contact, address, products)."""
+        parts = []
+        lengths = array('I')
+        for fields in texts:
+            for value in fields:
+                encoded = value.encode('utf-8')
+                parts.append(encoded)
+                lengths.append(len(encoded))
+        self.blob = zlib.compress(lengths.tobytes() + b"".join(parts), COMPRESSION_LEVEL)
+        self.count = len(texts)
+
+    def unpack(self):
+        """Returns (text bytes, field end offsets) for the whole chunk."""
+        data = zlib.decompress(self.blob)
+        header = self.count * TEXT_FIELDS * _LENGTH_SIZE
+        lengths = array('I')
+        lengths.frombytes(data[:header])
+        return data[header:], list(accumulate(lengths))
+
+
+class RowStore:
+    """Columnar, compressed producer rows ordered by id. See the module docstring for the layout."""
+    __slots__ = ("ids", "category_codes", "categories", "_category_index", "_chunks", "_chunk_starts",
+                 "_cached_chunk", "_cached_data", "_pending")
+
+    def __init__(self, rows=()):
+        self.ids = array('I')
+        self.category_codes = array('H')
+        self.categories = []
+        self._category_index = {}
+        self._chunks = []
+        self._chunk_starts = array('q')  # position of each chunk's first row
+        self._cached_chunk = None
+        self._cached_data = None
+        self._pending = []
+        self.extend(rows)
+
+    # --- Building ---
+
+    def _category_code(self, category):
+        category = category if category is not None else ""
+        code = self._category_index.get(category)
+        if code is None:
+            code = len(self.categories)
+            if code > 0xFFFF and self.category_codes.typecode == 'H':
+                self.category_codes = array('I', self.category_codes)
+            category = sys.intern(category)
+            self._category_index[category] = code
+            self.categories.append(category)
+        return code
+
+    def _fit_id(self, pid):
+        if self.ids.typecode == 'I' and not 0 <= pid <= 0xFFFFFFFF:
+            self.ids = array('q', self.ids)
+
+    def _flush(self):
+        if self._pending:
+            self._chunk_starts.append(len(self.ids) - len(self._pending))
+            self._chunks.append(_Chunk(self._pending))
+            self._pending = []
+
+    def extend(self, rows):
+        """Appends rows in ascending id order (as returned by an ORDER BY id query)."""
+        for pid, name, contact, address, products, category in rows:
+            if self.ids and pid <= self.ids[-1]:
+                raise ValueError("RowStore rows must be appended in ascending id order")
+            self._fit_id(pid)
+            self.ids.append(pid)
+            code = self._category_code(category)  # may widen category_codes, so look it up after
+            self.category_codes.append(code)
+            self._pending.append((name or "", contact or "", address or "", products or ""))
+            if len(self._pending) >= CHUNK_ROWS:
+                self._flush()
+        self._flush()
+
+    # --- Reading ---
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _unpacked(self, c):
+        if self._cached_chunk != c:
+            self._cached_data = self._chunks[c].unpack()
+            self._cached_chunk = c
+        return self._cached_data
+
+    def _decode(self, c, i):
+        data, ends = self._unpacked(c)
+        base = i * TEXT_FIELDS
+        start = ends[base - 1] if base else 0
+        values = []
+        for k in range(TEXT_FIELDS):
+            end = ends[base + k]
+            values.append(data[start:end].decode('utf-8'))
+            start = end
+        return values
+
+    def _chunk_texts(self, c):
+        return [tuple(self._decode(c, i)) for i in range(self._chunks[c].count)]
+
+    def _locate(self, position):
+        c = bisect.bisect_right(self._chunk_starts, position) - 1
+        return c, position - self._chunk_starts[c]
+
+    def row(self, position):
+        c, i = self._locate(position)
+        name, contact, address, products = self._decode(c, i)
+        return (self.ids[position], name, contact, address, products, self.categories[self.category_codes[position]])
+
+    def rows(self, start=0, stop=None):
+        """Returns rows[start:stop] as tuples, decompressing each chunk involved once."""
+        stop = len(self.ids) if stop is None else min(stop, len(self.ids))
+        result = []
+        position = start
+        while position < stop:
+            c, i = self._locate(position)
+            for j in range(i, min(self._chunks[c].count, i + stop - position)):
+                name, contact, address, products = self._decode(c, j)
+                result.append((self.ids[position], name, contact, address, products,
+                               self.categories[self.category_codes[position]]))
+                position += 1
+        return result
+
+    def __iter__(self):
+        for start in range(0, len(self.ids), CHUNK_ROWS):
+            yield from self.rows(start, start + CHUNK_ROWS)
+
+    def position_of(self, producer_id):
+        """Returns the position of a producer id, or None if it is not in the store."""
+        position = bisect.bisect_left(self.ids, producer_id)
+        if position < len(self.ids) and self.ids[position] == producer_id:
+            return position
+        return None
+
+    # --- Single-row changes ---
+
+    def _rewrite_chunk(self, c, texts):
+        self._cached_chunk = None
+        delta = len(texts) - self._chunks[c].count
+        if texts:
+            self._chunks[c] = _Chunk(texts)
+        else:
+            del self._chunks[c]
+            del self._chunk_starts[c]
+        for k in range(c + 1 if texts else c, len(self._chunk_starts)):
+            self._chunk_starts[k] += delta
+
+    def put(self, row):
+        """Inserts a row, or replaces the row with the same id. Returns its position."""
+        pid = row[0]
+        texts_value = tuple(v or "" for v in row[1:5])
+        position = self.position_of(pid)
+        if position is not None:
+            c, i = self._locate(position)
+            texts = self._chunk_texts(c)
+            texts[i] = texts_value
+            self.category_codes[position] = self._category_code(row[5])
+            self._rewrite_chunk(c, texts)
+            return position
+
+        position = bisect.bisect_left(self.ids, pid)
+        if not self._chunks:
+            self.extend([row])
+            return 0
+        c, i = self._locate(position)
+        texts = self._chunk_texts(c)
+        texts.insert(i, texts_value)
+        self._fit_id(pid)
+        self.ids.insert(position, pid)
+        code = self._category_code(row[5])
+        self.category_codes.insert(position, code)
+        self._rewrite_chunk(c, texts)
+        if len(texts) > 2 * CHUNK_ROWS:
+            # Split an overgrown chunk in two; later chunks keep their positions
+            half = len(texts) // 2
+            self._chunks[c] = _Chunk(texts[:half])
+            self._chunks.insert(c + 1, _Chunk(texts[half:]))
+            self._chunk_starts.insert(c + 1, self._chunk_starts[c] + half)
+        return position
+
+    def remove(self, producer_id):
+        """Removes a producer id if present. Returns its former position, or None."""
+        position = self.position_of(producer_id)
+        if position is None:
+            return None
+        c, i = self._locate(position)
+        texts = self._chunk_texts(c)
+        del texts[i]
+        del self.ids[position]
+        del self.category_codes[position]
+        self._rewrite_chunk(c, texts)
+        return position
+
+    # --- Bulk changes ---
+
+    def set_category(self, producer_ids, category):
+        """Sets the category of every listed producer in the store. Returns how many were found."""
+        code = self._category_code(category)
+        found = 0
+        for pid in producer_ids:
+            position = self.position_of(pid)
+            if position is not None:
+                self.category_codes[position] = code
+                found += 1
+        return found
+
+    def remove_many(self, producer_ids):
+        """Removes every listed producer in the store. Returns how many were removed."""
+        positions = sorted(filter(lambda p: p is not None, map(self.position_of, set(producer_ids))))
+        if not positions:
+            return 0
+        by_chunk = {}
+        for position in positions:
+            c, i = self._locate(position)
+            by_chunk.setdefault(c, []).append(i)
+        # Last chunk first, so the starts of the chunks still to be rewritten stay valid
+        for c in sorted(by_chunk, reverse=True):
+            dropped = set(by_chunk[c])
+            self._rewrite_chunk(c, [t for i, t in enumerate(self._chunk_texts(c)) if i not in dropped])
+        ids, codes = array(self.ids.typecode), array(self.category_codes.typecode)
+        start = 0
+        for position in positions + [len(self.ids)]:
+            ids.extend(self.ids[start:position])
+            codes.extend(self.category_codes[start:position])
+            start = position + 1
+        self.ids, self.category_codes = ids, codes
+        return len(positions)
+
+    # --- Memory accounting ---
+
+    def memory_bytes(self):
+        """Approximate bytes held by the store, excluding the shared category strings."""
+        size = sys.getsizeof(self.ids) + sys.getsizeof(self.category_codes) + sys.getsizeof(self._chunk_starts)
+        size += sys.getsizeof(self._chunks)
+        for chunk in self._chunks:
+            size += sys.getsizeof(chunk) + sys.getsizeof(chunk.blob)
+        return size
+
+
+class SearchCache:
+    """Keeps the RowStores of the most recent searches, keyed by (search term, search by)."""
+
+    def __init__(self, size=SEARCH_CACHE_SIZE):
+        self.size = size
+        self._stores = OrderedDict()
+
+    def get(self, key):
+        store = self._stores.get(key)
+        if store is not None:
+            self._stores.move_to_end(key)
+        return store
+
+    def put(self, key, store):
+        self._stores[key] = store
+        self._stores.move_to_end(key)
+        while len(self._stores) > self.size:
+            self._stores.popitem(last=False)
+
+    def items(self):
+        return list(self._stores.items())
+
+    def discard(self, key):
+        self._stores.pop(key, None)
+
+    def clear(self):
+        self._stores.clear()
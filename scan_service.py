@@ -0,0 +1,366 @@
+"""
+A persistent pool of worker processes for CPU-bound file analysis.
+
+PDF parsing, text decoding and keyword extraction are pure Python, so threads would only take
+turns on the GIL; they run in worker processes instead. One ScanService is shared by every
+file-analysis feature:
+  - worker processes start on the first job (up to one per core) and then stay warm, so later
+    jobs pay no process start-up or import cost. They are started by the service thread, outside
+    the lock, so submit() returns at once even on the UI thread,
+  - jobs wait in a priority queue (lower numbers first, first come first served within a
+    priority), so a file the user is waiting for overtakes background work,
+  - a job function receives an emit() callback; what it emits is streamed back to the app as
+    partial results (ScanJob.partials, or on_partial) while the job runs,
+  - every job can have a time limit and a memory limit. A worker that overruns its time limit
+    is killed and replaced; a memory limit caps the worker's address space for the job (where
+    the resource module exists), so one corrupt PDF fails on its own instead of stalling or
+    exhausting everything.
+Each worker talks to the service over its own pipe, so killing one never corrupts the others'
+messages. Job functions must be importable module-level functions taking (emit, *args).
+"""
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+import instrumentation
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+PRIORITY_INTERACTIVE = 0  # the user is waiting on the result
+PRIORITY_NORMAL = 5
+PRIORITY_BACKGROUND = 10
+
+DEFAULT_TIME_LIMIT_S = 120.0
+DEFAULT_MEMORY_LIMIT_MB = 1024
+POLL_S = 0.25  # how often running jobs are checked against their time limits
+STOP_TIMEOUT_S = 2.0
+
+
+class ScanError(Exception):
+    """A scan job failed: the job raised, or its worker process died."""
+
+
+class ScanLimitError(ScanError):
+    """A scan job was stopped for exceeding its time or memory limit."""
+
+
+class ScanJob(Future):
+    """A submitted job: a Future for its result, plus the partial results it has emitted so far."""
+
+    def __init__(self, job_id, fn, args, priority, time_limit, memory_limit_mb, on_partial):
+        super().__init__()
+        self.id = job_id
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.on_partial = on_partial
+        self.partials = queue.Queue()
+
+
+# --- Worker process ---
+
+def _address_space_bytes():
+    """The process's current virtual memory size, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class _MemoryLimit:
+    """Caps the worker's address space at its current size plus limit_mb for the duration of a job."""
+
+    def __init__(self, limit_mb):
+        self.limit_mb = limit_mb
+        self.saved = None
+
+    def __enter__(self):
+        current = _address_space_bytes() if RESOURCE_AVAILABLE and self.limit_mb else None
+        if current is not None:
+            self.saved = resource.getrlimit(resource.RLIMIT_AS)
+            soft = current + self.limit_mb * 1024 * 1024
+            hard = self.saved[1]
+            if hard == resource.RLIM_INFINITY or soft < hard:
+                resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+        return self
+
+    def __exit__(self, *exc):
+        if self.saved is not None:
+            resource.setrlimit(resource.RLIMIT_AS, self.saved)
+        return False
+
+def _worker_main(conn):
+    """Runs jobs received over conn until told to stop (None) or the service goes away."""
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        job_id, fn, args, memory_limit_mb = message
+
+        def emit(payload):
+            conn.send(("partial", job_id, payload))
+        try:
+            with _MemoryLimit(memory_limit_mb):
+                result = fn(emit, *args)
+            reply = ("done", job_id, result)
+        except MemoryError:
+            reply = ("limit", job_id, f"exceeded its memory limit of {memory_limit_mb} MB")
+        except Exception as e:
+            reply = ("error", job_id, f"{type(e).__name__}: {e}")
+        try:
+            conn.send(reply)
+        except Exception as e:  # e.g. a result that cannot be pickled
+            conn.send(("error", job_id, f"could not return the result: {e}"))
+
+
+# --- Service ---
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True,
+                                       name="gedb-scan-worker")
+        self.process.start()
+        child_conn.close()
+        self.job = None
+        self.deadline = None
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(STOP_TIMEOUT_S)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ScanService:
+    """A lazily started, persistent pool of scan worker processes. Safe to submit to from any thread."""
+
+    def __init__(self, max_workers=None, time_limit=DEFAULT_TIME_LIMIT_S, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                 context=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self._context = context or multiprocessing.get_context()
+        self._lock = threading.Lock()
+        self._pending = []  # heap of (priority, sequence, job)
+        self._sequence = itertools.count()
+        self._workers = []
+        self._starting = 0  # worker slots reserved by the service thread while their processes start
+        self._thread = None
+        self._wake_reader = self._wake_writer = None
+        self._closed = False
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timed_out": 0, "memory_exceeded": 0}
+
+    def submit(self, fn, *args, priority=PRIORITY_NORMAL, time_limit=None, memory_limit_mb=None, on_partial=None):
+        """
+        Queues fn(emit, *args) for a worker process and returns its ScanJob. time_limit and
+        memory_limit_mb default to the service's; 0 means unlimited. on_partial(payload) is
+        called (on the service thread) for each emitted partial result.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The scan service has been closed.")
+            job = ScanJob(next(self._sequence), fn, args, priority,
+                          self.time_limit if time_limit is None else time_limit,
+                          self.memory_limit_mb if memory_limit_mb is None else memory_limit_mb, on_partial)
+            heapq.heappush(self._pending, (priority, job.id, job))
+            self.stats["submitted"] += 1
+            if self._thread is None:
+                self._wake_reader, self._wake_writer = self._context.Pipe(duplex=False)
+                self._thread = threading.Thread(target=self._run, name="gedb-scan-service", daemon=True)
+                self._thread.start()
+            self._dispatch()
+            if self._pending:
+                self._wake()  # the service thread starts more workers; never this (possibly UI) thread
+        instrumentation.count("scan.jobs")
+        return job
+
+    def map(self, fn, items, priority=PRIORITY_NORMAL, **limits):
+        """Runs fn(emit, item) for every item and returns the results in order (raising the first failure)."""
+        jobs = [self.submit(fn, item, priority=priority, **limits) for item in items]
+        return [job.result() for job in jobs]
+
+    # --- Scheduling (under self._lock) ---
+
+    def _dispatch(self):
+        """Hands pending jobs to idle workers."""
+        while self._pending:
+            worker = next((w for w in self._workers if w.job is None), None)
+            if worker is None:
+                return
+            _, _, job = heapq.heappop(self._pending)
+            if not job.set_running_or_notify_cancel():
+                continue  # cancelled while it was waiting
+            try:
+                worker.conn.send((job.id, job.fn, job.args, job.memory_limit_mb))
+            except Exception as e:  # e.g. arguments that cannot be pickled
+                job.set_exception(ScanError(f"could not start the job: {e}"))
+                self.stats["failed"] += 1
+                continue
+            worker.job = job
+            worker.deadline = time.monotonic() + job.time_limit if job.time_limit else None
+
+    def _reserve_workers(self):
+        """Reserves a slot for each worker to start for the waiting jobs, up to max_workers."""
+        count = max(0, min(len(self._pending), self.max_workers - len(self._workers) - self._starting))
+        self._starting += count
+        return count
+
+    def _wake(self):
+        if self._wake_writer is not None:
+            self._wake_writer.send_bytes(b"")
+
+    def _retire(self, worker, kill=False):
+        self._workers.remove(worker)
+        worker.stop(kill=kill)
+
+    def _finish(self, worker, error=None, result=None):
+        job, worker.job, worker.deadline = worker.job, None, None
+        if error is None:
+            self.stats["completed"] += 1
+            job.set_result(result)
+        else:
+            self.stats["failed"] += 1
+            instrumentation.count("scan.failures")
+            job.set_exception(error)
+
+    # --- Service thread ---
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                connections = {worker.conn: worker for worker in self._workers}
+            try:
+                ready = wait(list(connections) + [self._wake_reader], timeout=POLL_S)
+            except (OSError, ValueError):
+                ready = []  # a worker was retired while we waited
+            for conn in ready:
+                if conn is self._wake_reader:
+                    conn.recv_bytes()
+                    continue
+                worker = connections[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    message = None
+                with self._lock:
+                    self._handle(worker, message)
+            with self._lock:
+                self._check_deadlines()
+                self._dispatch()
+                to_start = self._reserve_workers()
+            self._start_workers(to_start)
+
+    def _start_workers(self, count):
+        """Starts reserved workers outside the lock (a process start takes a while), then registers them."""
+        for _ in range(count):
+            try:
+                worker = _Worker(self._context)
+            except OSError as e:
+                with self._lock:
+                    self._starting -= 1
+                    if not self._workers and not self._starting:
+                        # Nothing could run the waiting jobs; fail them rather than leave them waiting
+                        pending, self._pending = self._pending, []
+                        for _, _, job in pending:
+                            if job.set_running_or_notify_cancel():
+                                job.set_exception(ScanError(f"Could not start a scan worker: {e}"))
+                                self.stats["failed"] += 1
+                continue
+            with self._lock:
+                self._starting -= 1
+                closed = self._closed
+                if not closed:
+                    self._workers.append(worker)
+                    self._dispatch()
+            if closed:
+                worker.stop()
+
+    def _handle(self, worker, message):
+        if worker not in self._workers:
+            return
+        if message is None:
+            # The worker died (crash, or killed by the OS for memory): fail its job; the next dispatch replaces it
+            self._retire(worker, kill=True)
+            if worker.job is not None:
+                self._finish(worker, ScanError(f"The scan worker exited unexpectedly (exit code {worker.process.exitcode})."))
+            return
+        kind, job_id, payload = message
+        job = worker.job
+        if job is None or job.id != job_id:
+            return
+        if kind == "partial":
+            job.partials.put(payload)
+            if job.on_partial is not None:
+                try:
+                    job.on_partial(payload)
+                except Exception:
+                    pass
+        elif kind == "done":
+            self._finish(worker, result=payload)
+        elif kind == "limit":
+            self.stats["memory_exceeded"] += 1
+            self._finish(worker, ScanLimitError(f"The scan {payload}."))
+        else:
+            self._finish(worker, ScanError(payload))
+
+    def _check_deadlines(self):
+        now = time.monotonic()
+        for worker in list(self._workers):
+            if worker.deadline is not None and now > worker.deadline:
+                self._retire(worker, kill=True)
+                self.stats["timed_out"] += 1
+                self._finish(worker, ScanLimitError(f"The scan took longer than its time limit of {worker.job.time_limit:g} s."))
+
+    # --- Status and shutdown ---
+
+    def snapshot(self):
+        """Returns worker, queue and job counts for diagnostics."""
+        with self._lock:
+            return dict(self.stats, workers=len(self._workers), busy=sum(w.job is not None for w in self._workers),
+                        pending=len(self._pending))
+
+    def close(self):
+        """Cancels waiting jobs, fails running ones and stops the workers."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            pending, self._pending = self._pending, []
+            workers, self._workers = self._workers, []
+        for _, _, job in pending:
+            job.cancel()
+        for worker in workers:
+            if worker.job is not None and not worker.job.done():
+                worker.job.set_exception(ScanError("The scan service was closed."))
+            worker.stop(kill=worker.job is not None)
+        if self._thread is not None:
+            self._wake()
+            self._thread.join(STOP_TIMEOUT_S)
+            self._wake_reader.close()
+            self._wake_writer.close()
@@ -0,0 +1,166 @@
+"""
+Read-only snapshots of the producers database for read-mostly users on shared drives.
+
+A snapshot is a compacted copy written with VACUUM INTO, plus a .sha256 file next to it.
+Snapshots are opened with mode=ro&immutable=1, so SQLite takes no file locks and never
+checks for changes by other writers, and pages are read through a memory map.
+
+    python snapshot.py build global_energy_db.sqlite energy_snapshot.sqlite
+    python snapshot.py verify energy_snapshot.sqlite
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from urllib.request import pathname2url
+
+from instrumentation import timed
+
+DEFAULT_MMAP_SIZE = 1024 * 1024 * 1024  # 1 GiB of address space; only touched pages use memory
+DEFAULT_CACHE_KIB = 256 * 1024  # 256 MiB page cache per connection
+
+CHECKSUM_SUFFIX = ".sha256"
+
+
+def _uri(path, **params):
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    return f"file:{pathname2url(os.path.abspath(path))}?{query}"
+
+def connect_readonly(path, mmap_size=DEFAULT_MMAP_SIZE, cache_kib=DEFAULT_CACHE_KIB, check_same_thread=True):
+    """
+    Opens a database read-only and immutable, with memory-mapped I/O and a large page cache.
+    The file must not be modified while it is open this way; use it for snapshots only.
+    Connections in one process share a single page cache (cache=shared).
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Snapshot file not found: {path}")
+    conn = sqlite3.connect(_uri(path, mode="ro", immutable=1, cache="shared"), uri=True,
+                           check_same_thread=check_same_thread)
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    conn.execute(f"PRAGMA cache_size = -{int(cache_kib)}")
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@timed("snapshot.build")
+def build_snapshot(source_path, dest_path):
+    """
+    Writes a compacted copy of source_path to dest_path with VACUUM INTO, then records its
+    checksum in dest_path + '.sha256'. An existing dest_path is replaced.
+    Returns {'path', 'size', 'source_size', 'producers', 'seconds', 'sha256'}.
+    """
+    if os.path.abspath(source_path) == os.path.abspath(dest_path):
+        raise ValueError("The snapshot must be written to a different file than the database.")
+    start = time.perf_counter()
+    # VACUUM INTO refuses to overwrite; write next to the target and swap it in
+    temp_path = dest_path + ".tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(source_path)
+    try:
+        conn.execute("VACUUM INTO ?", (temp_path,))
+    finally:
+        conn.close()
+    os.replace(temp_path, dest_path)
+
+    checksum = file_sha256(dest_path)
+    with open(dest_path + CHECKSUM_SUFFIX, 'w', encoding='utf-8') as f:
+        f.write(f"{checksum}  {os.path.basename(dest_path)}\n")
+
+    snap = connect_readonly(dest_path)
+    try:
+        producers = snap.execute("SELECT COUNT(*) FROM producers").fetchone()[0]
+    finally:
+        snap.close()
+    return {
+        "path": dest_path,
+        "size": os.path.getsize(dest_path),
+        "source_size": os.path.getsize(source_path),
+        "producers": producers,
+        "seconds": time.perf_counter() - start,
+        "sha256": checksum,
+    }
+
+@timed("snapshot.verify")
+def verify_snapshot(path, source_path=None):
+    """
+    Checks a snapshot: its checksum file (if present), SQLite's integrity_check, and
+    optionally that it holds the same number of producers as source_path.
+    Returns (ok, [messages]).
+    """
+    messages = []
+    ok = True
+    checksum_path = path + CHECKSUM_SUFFIX
+    if os.path.exists(checksum_path):
+        with open(checksum_path, 'r', encoding='utf-8') as f:
+            parts = f.read().split()
+        expected = parts[0] if parts else ""
+        if file_sha256(path) == expected:
+            messages.append("Checksum matches.")
+        else:
+            ok = False
+            messages.append("Checksum mismatch: the file changed or was copied incompletely.")
+    else:
+        messages.append("No checksum file found; skipped checksum comparison.")
+
+    try:
+        conn = connect_readonly(path)
+    except (OSError, sqlite3.Error) as e:
+        return False, messages + [f"Cannot open snapshot: {e}"]
+    try:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        if problems == ["ok"]:
+            messages.append("Integrity check passed.")
+        else:
+            ok = False
+            messages.append("Integrity check failed: " + "; ".join(problems[:5]))
+        producers = conn.execute("SELECT COUNT(*) FROM producers").fetchone()[0]
+        messages.append(f"Snapshot holds {producers} producers.")
+    except sqlite3.Error as e:
+        conn.close()
+        return False, messages + [f"Snapshot is not a producers database: {e}"]
+    conn.close()
+
+    if source_path:
+        source = sqlite3.connect(_uri(source_path, mode="ro"), uri=True)
+        try:
+            source_producers = source.execute("SELECT COUNT(*) FROM producers").fetchone()[0]
+        finally:
+            source.close()
+        if source_producers != producers:
+            ok = False
+            messages.append(f"Source database holds {source_producers} producers; the snapshot is out of date.")
+    return ok, messages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or verify read-only GlobalEnergyDB snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="write a compacted snapshot with VACUUM INTO")
+    build.add_argument("source")
+    build.add_argument("dest")
+    verify = sub.add_parser("verify", help="check a snapshot's checksum and integrity")
+    verify.add_argument("path")
+    verify.add_argument("--source", help="also compare producer counts with this database")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        info = build_snapshot(args.source, args.dest)
+        print(f"Wrote {info['path']}: {info['producers']} producers, {info['size'] / 1048576:.1f} MiB "
+              f"(source {info['source_size'] / 1048576:.1f} MiB) in {info['seconds']:.2f} s")
+        return 0
+    ok, messages = verify_snapshot(args.path, args.source)
+    for message in messages:
+        print(message)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
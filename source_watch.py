@@ -0,0 +1,351 @@
+"""
+Watched import sources: files or folders that are re-imported automatically when they change.
+
+A source is a producer file, or a folder of them (any format import_pipeline reads). A sync
+applies only what changed since the last one:
+  - the manifest (watched_files) keeps each file's size and modification time, so an unchanged
+    file costs one stat call. A file whose stat changed but whose bytes hash the same is only
+    re-stamped,
+  - a changed file is parsed by the import pipeline and every row is hashed. watched_rows
+    remembers which file each producer (by name) came from and the hash of its row, so the
+    file's rows split into inserted, changed, unchanged and removed,
+  - the differences are written as one upsert diff in a single transaction: new and changed
+    rows with INSERT ... ON CONFLICT (name) DO UPDATE, removed rows deleted, and the manifest
+    and row hashes updated with them. Unchanged rows are not written at all.
+A producer belongs to the first watched file that lists it; the same name in another watched
+file counts as a duplicate. A producer edited in the app is overwritten only when its row in
+the file changes. Files removed from a watched folder take their producers with them, but a
+source that cannot be reached at all (e.g. an unmounted drive) is skipped, never emptied.
+
+    python source_watch.py global_energy_db.sqlite --add suppliers.csv
+    python source_watch.py global_energy_db.sqlite --watch 30
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+
+import import_pipeline
+import producers_repository as repo
+import scan_service
+from instrumentation import timed
+
+WATCH_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS watched_sources (
+        path TEXT PRIMARY KEY,
+        added_at TEXT
+    );
+    CREATE TABLE IF NOT EXISTS watched_files (
+        path TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        size INTEGER,
+        mtime_ns INTEGER,
+        file_hash TEXT,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        synced_at TEXT
+    );
+    CREATE TABLE IF NOT EXISTS watched_rows (
+        name TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        row_hash TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_watched_files_source ON watched_files(source);
+    CREATE INDEX IF NOT EXISTS idx_watched_rows_path ON watched_rows(path);
+"""
+
+SETTLE_SECONDS = 2.0  # a file modified more recently than this may still be being written; it waits for the next check
+HASH_CHUNK_BYTES = 1024 * 1024
+REJECT_FILE_PREFIX = "import_rejects_"  # reject files written next to imported files are not sources
+
+def install_watch_schema(conn):
+    conn.executescript(WATCH_SCHEMA_SQL)
+    conn.commit()
+
+
+# --- Sources ---
+
+def add_source(conn, path):
+    """Starts watching a file or folder; returns its absolute path. The first sync imports it. The caller commits."""
+    path = os.path.abspath(path)
+    if os.path.isfile(path):
+        import_pipeline.get_reader(path)  # raises ImportFormatError for unsupported types
+    elif not os.path.isdir(path):
+        raise FileNotFoundError(f"No such file or folder: {path}")
+    conn.execute("INSERT OR IGNORE INTO watched_sources (path, added_at) VALUES (?, ?)",
+                 (path, datetime.datetime.now().isoformat(timespec="seconds")))
+    return path
+
+def remove_source(conn, path):
+    """Stops watching a source. Its producers stay in the database but are no longer tracked. The caller commits."""
+    conn.execute("DELETE FROM watched_rows WHERE path IN (SELECT path FROM watched_files WHERE source = ?)", (path,))
+    conn.execute("DELETE FROM watched_files WHERE source = ?", (path,))
+    conn.execute("DELETE FROM watched_sources WHERE path = ?", (path,))
+
+def list_sources(conn):
+    """Returns (path, files, producers, last sync, files with errors) for every watched source."""
+    return conn.execute("""
+        SELECT s.path, COUNT(f.path), COALESCE(SUM(f.row_count), 0), MAX(f.synced_at), COUNT(f.error)
+        FROM watched_sources s LEFT JOIN watched_files f ON f.source = s.path
+        GROUP BY s.path ORDER BY s.path""").fetchall()
+
+def file_errors(conn, source):
+    """Returns (file name, error) for the files of a source that could not be imported."""
+    rows = conn.execute("SELECT path, error FROM watched_files WHERE source = ? AND error IS NOT NULL ORDER BY path", (source,))
+    return [(os.path.basename(path), error) for path, error in rows]
+
+def _source_files(source):
+    """Yields (path, stat) for the importable files of a source; one stat call per file."""
+    if not os.path.isdir(source):
+        yield source, os.stat(source)
+        return
+    for folder, dirs, files in os.walk(source):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.startswith((".", REJECT_FILE_PREFIX)) or not name.lower().endswith(import_pipeline.SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                yield path, os.stat(path)
+            except FileNotFoundError:
+                continue  # removed while the folder was being listed
+
+
+# --- Change detection ---
+
+@timed("watch.scan")
+def scan_sources(conn):
+    """
+    Compares every watched file's size and modification time with the manifest.
+    Returns {'checked': n, 'changed': [(source, path, size, mtime_ns)], 'missing': [path],
+    'unavailable': [source]}. Nothing is read from the files themselves.
+    """
+    known = {path: (source, size, mtime_ns) for path, source, size, mtime_ns
+             in conn.execute("SELECT path, source, size, mtime_ns FROM watched_files")}
+    scan = {"checked": 0, "changed": [], "missing": [], "unavailable": []}
+    seen = set()
+    now = time.time()
+    for (source,) in conn.execute("SELECT path FROM watched_sources ORDER BY path").fetchall():
+        try:
+            files = list(_source_files(source))
+        except OSError:
+            # The whole source is gone or unreachable: keep its producers until it is back
+            scan["unavailable"].append(source)
+            seen.update(path for path, entry in known.items() if entry[0] == source)
+            continue
+        for path, stat in files:
+            scan["checked"] += 1
+            seen.add(path)
+            old = known.get(path)
+            if old is not None and old[1:] == (stat.st_size, stat.st_mtime_ns):
+                continue
+            if now - stat.st_mtime < SETTLE_SECONDS:
+                continue
+            scan["changed"].append((source, path, stat.st_size, stat.st_mtime_ns))
+    scan["missing"] = sorted(path for path in known if path not in seen)
+    return scan
+
+def has_changes(conn):
+    """True if a sync would have anything to do (stat calls only)."""
+    scan = scan_sources(conn)
+    return bool(scan["changed"] or scan["missing"])
+
+def file_digest(path):
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def row_hash(record):
+    """Hash of a parsed (name, contact, address, products, category) row."""
+    return hashlib.blake2b("\x1f".join(record).encode("utf-8"), digest_size=16).hexdigest()
+
+
+# --- Sync ---
+
+def _chunks(items, size=import_pipeline.NAME_LOOKUP_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _owners(conn, names):
+    """Returns {name: watched file} for the names some watched file already provides."""
+    owners = {}
+    for chunk in _chunks(names):
+        owners.update(conn.execute(f"SELECT name, path FROM watched_rows WHERE name IN ({','.join('?' * len(chunk))})", chunk))
+    return owners
+
+def _forget_rows(conn, names):
+    conn.executemany("DELETE FROM watched_rows WHERE name = ?", [(name,) for name in names])
+
+def _claim_rows(conn, path, hashes):
+    conn.executemany("INSERT INTO watched_rows (name, path, row_hash) VALUES (?, ?, ?) "
+                     "ON CONFLICT (name) DO UPDATE SET path = excluded.path, row_hash = excluded.row_hash",
+                     [(name, path, digest) for name, digest in hashes.items()])
+
+def _stamp_file(conn, source, path, size, mtime_ns, digest, error=None):
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    conn.execute("INSERT INTO watched_files (path, source, size, mtime_ns, file_hash, error, synced_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                 "ON CONFLICT (path) DO UPDATE SET source = excluded.source, size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                 "file_hash = excluded.file_hash, error = excluded.error, synced_at = excluded.synced_at",
+                 (path, source, size, mtime_ns, digest, error, now))
+    conn.execute("UPDATE watched_files SET row_count = (SELECT COUNT(*) FROM watched_rows WHERE path = ?) WHERE path = ?", (path, path))
+
+def _diff_file(conn, result, summary):
+    """
+    Splits a parsed file against the row hashes stored for it.
+    Returns (rows by name for new and changed names, their hashes, names no longer in the file).
+    """
+    old = dict(conn.execute("SELECT name, row_hash FROM watched_rows WHERE path = ?", (result["path"],)))
+    summary["malformed"] += len(result["rejects"])
+    rows, hashes = {}, {}
+    for _, record in result["rows"]:
+        name = record[0]
+        if name in hashes:
+            summary["duplicates"] += 1
+            continue
+        digest = row_hash(record)
+        hashes[name] = digest
+        if old.get(name) == digest:
+            summary["unchanged"] += 1
+        else:
+            rows[name] = record
+    removed = [name for name in old if name not in hashes]
+    return rows, {name: hashes[name] for name in rows}, removed
+
+def _apply_rows(conn, path, rows, hashes, summary):
+    """Upserts a file's new and changed rows, skipping names another watched file provides."""
+    cursor = conn.cursor()
+    owners = _owners(conn, rows)
+    for name, owner in owners.items():
+        if owner != path:
+            summary["duplicates"] += 1
+            del rows[name], hashes[name]
+    # Producers the file newly claims may already exist (added in the app or by a one-off import)
+    existing = {}
+    for chunk in _chunks(name for name in rows if name not in owners):
+        existing.update(repo.fetch_producers_by_name(cursor, chunk))
+    to_write = []
+    for name, record in rows.items():
+        current = existing.get(name)
+        if current is not None and tuple(value or "" for value in current) == record:
+            summary["unchanged"] += 1
+            continue
+        summary["updated" if name in owners or current is not None else "inserted"] += 1
+        to_write.append(record)
+        summary["names"].append(name)
+    repo.upsert_producers(cursor, to_write)
+    _claim_rows(conn, path, hashes)
+
+def _remove_rows(conn, names, summary):
+    repo.delete_producers_by_name(conn.cursor(), names)
+    _forget_rows(conn, names)
+    summary["removed"] += len(names)
+    summary["names"].extend(names)
+
+@timed("watch.sync")
+def sync_sources(conn, profiles=None, max_workers=None, service=None):
+    """
+    Brings the database in line with every watched source, in one transaction. Changed files
+    are parsed in service's workers at background priority when a ScanService is given.
+    Returns a summary dict: files checked/changed/removed, producers inserted/updated/removed/
+    unchanged, duplicate and malformed rows, per-file errors, and the names of the producers
+    written or removed.
+    """
+    scan = scan_sources(conn)
+    summary = {"checked": scan["checked"], "changed_files": 0, "removed_files": len(scan["missing"]),
+               "inserted": 0, "updated": 0, "removed": 0, "unchanged": 0, "duplicates": 0, "malformed": 0,
+               "errors": [f"{source}: not found" for source in scan["unavailable"]], "names": []}
+    if not scan["changed"] and not scan["missing"]:
+        return summary
+    if profiles is None:
+        profiles = import_pipeline.load_profiles()
+
+    # A new stat with the same bytes (a touched or re-saved file) only needs a new stamp
+    stored = dict(conn.execute("SELECT path, file_hash FROM watched_files WHERE error IS NULL"))
+    restamp, to_parse = [], []
+    for source, path, size, mtime_ns in scan["changed"]:
+        try:
+            digest = file_digest(path)
+        except OSError as e:
+            summary["errors"].append(f"{os.path.basename(path)}: {e}")
+            continue
+        entry = (source, path, size, mtime_ns, digest)
+        (restamp if stored.get(path) == digest else to_parse).append(entry)
+    summary["changed_files"] = len(to_parse)
+    parsed = import_pipeline.parse_files([entry[1] for entry in to_parse], profiles=profiles, max_workers=max_workers,
+                                         service=service, priority=scan_service.PRIORITY_BACKGROUND) if to_parse else []
+
+    try:
+        for path in scan["missing"]:
+            names = [name for (name,) in conn.execute("SELECT name FROM watched_rows WHERE path = ?", (path,))]
+            _remove_rows(conn, names, summary)
+            conn.execute("DELETE FROM watched_files WHERE path = ?", (path,))
+        for entry in restamp:
+            _stamp_file(conn, *entry)
+
+        # Removals first, so a producer moving from one file to another is not taken for a duplicate
+        diffs = []
+        for entry, result in zip(to_parse, parsed):
+            if result.get("error"):
+                # Keep the file's producers; it is retried once it changes again
+                summary["errors"].append(result["error"])
+                _stamp_file(conn, *entry, error=result["error"])
+                continue
+            rows, hashes, removed = _diff_file(conn, result, summary)
+            _remove_rows(conn, removed, summary)
+            diffs.append((entry, rows, hashes))
+        for entry, rows, hashes in diffs:
+            _apply_rows(conn, entry[1], rows, hashes, summary)
+            _stamp_file(conn, *entry)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return summary
+
+def format_summary(summary):
+    text = (f"{summary['changed_files']} changed and {summary['removed_files']} removed file(s) of {summary['checked']}: "
+            f"{summary['inserted']} inserted, {summary['updated']} updated, {summary['removed']} removed, "
+            f"{summary['unchanged']} unchanged; {summary['duplicates']} duplicate and {summary['malformed']} malformed row(s) skipped.")
+    if summary["errors"]:
+        text += "\n" + "\n".join(summary["errors"])
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync GlobalEnergyDB with its watched producer files.")
+    parser.add_argument("database")
+    parser.add_argument("--add", nargs="+", default=[], metavar="PATH", help="start watching these files or folders")
+    parser.add_argument("--remove", nargs="+", default=[], metavar="PATH", help="stop watching these sources")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="keep checking at this interval instead of syncing once")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.database):
+        parser.error(f"database not found: {args.database}")
+    conn = sqlite3.connect(args.database)
+    try:
+        repo.create_producers_table(conn)
+        install_watch_schema(conn)
+        for path in args.add:
+            print(f"Watching {add_source(conn, path)}")
+        for path in args.remove:
+            remove_source(conn, os.path.abspath(path))
+        conn.commit()
+        while True:
+            summary = sync_sources(conn)
+            if summary["changed_files"] or summary["removed_files"] or args.watch is None:
+                print(format_summary(summary))
+            if args.watch is None:
+                return 1 if summary["errors"] else 0
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Seeded synthetic producer data for benchmarks.
+The same seed and size always produce the same rows, files and documents.
+"""
+import csv
+import random
+import sqlite3
+
+import producers_repository as repo
+
+CATEGORY_PRODUCTS = {
+    "Solar": ["Monocrystalline PV Module", "Polycrystalline PV Module", "String Inverter", "Microinverter", "Solar Tracker", "Mounting System", "Solar Thermal Collector"],
+    "Wind": ["Onshore Wind Turbine", "Offshore Wind Turbine", "Rotor Blade", "Nacelle", "Gearbox", "Tower Section", "Pitch Control System"],
+    "Hydro": ["Francis Turbine", "Kaplan Turbine", "Pelton Wheel", "Penstock", "Hydro Generator", "Run-of-River Unit"],
+    "Biofuel": ["Biodiesel", "Bioethanol", "Biogas Digester", "Wood Pellets", "Renewable Diesel", "Biomethane"],
+    "Geothermal": ["Binary Cycle Plant", "Flash Steam Plant", "Ground Source Heat Pump", "Drilling Rig", "Heat Exchanger"],
+    "Nuclear": ["Pressurized Water Reactor", "Small Modular Reactor", "Fuel Assembly", "Steam Generator", "Control Rod Drive"],
+    "Fossil Fuel": ["Crude Oil", "Natural Gas", "LNG", "Thermal Coal", "Gas Turbine", "Diesel Generator"],
+}
+CATEGORIES = list(CATEGORY_PRODUCTS)
+
+NAME_PREFIXES = ["Nordic", "Atlas", "Helios", "Boreal", "Pacific", "Andes", "Sahara", "Alpine", "Coastal", "Summit",
+                 "Evergreen", "Meridian", "Zenith", "Aurora", "Sierra", "Baltic", "Savanna", "Delta", "Orion", "Vertex",
+                 "Keystone", "Horizon", "Cascade", "Granite", "Solstice", "Equinox", "Polar", "Tropic", "Highland", "Riverside"]
+NAME_CORES = {
+    "Solar": ["Solar", "Sun", "Photon", "PV"], "Wind": ["Wind", "Breeze", "Gale", "Turbine"],
+    "Hydro": ["Hydro", "River", "Water", "Dam"], "Biofuel": ["Bio", "Green Fuel", "Agri Energy", "Biomass"],
+    "Geothermal": ["Geo", "Thermal", "Earth Heat", "Magma"], "Nuclear": ["Nuclear", "Atomic", "Isotope", "Fission"],
+    "Fossil Fuel": ["Petroleum", "Oil & Gas", "Gas", "Coal"],
+}
+NAME_SUFFIXES = ["Energy", "Power", "Renewables", "Systems", "Technologies", "Industries", "Resources", "Solutions"]
+LEGAL_FORMS = ["Ltd", "Inc", "GmbH", "S.A.", "AG", "LLC", "Pty Ltd", "AB", "B.V.", "Co."]
+
+STREETS = ["Main", "Harbour", "Industrial", "Station", "Mill", "Park", "Oak", "Energy", "Bridge", "Market", "King", "Lake"]
+STREET_TYPES = ["Street", "Road", "Avenue", "Way", "Boulevard", "Lane"]
+CITIES = [
+    ("Berlin", "Germany"), ("Hamburg", "Germany"), ("Munich", "Germany"), ("Copenhagen", "Denmark"), ("Aarhus", "Denmark"),
+    ("Madrid", "Spain"), ("Seville", "Spain"), ("Lyon", "France"), ("Paris", "France"), ("Oslo", "Norway"),
+    ("Stockholm", "Sweden"), ("Rotterdam", "Netherlands"), ("London", "United Kingdom"), ("Aberdeen", "United Kingdom"),
+    ("Houston", "United States"), ("Denver", "United States"), ("Austin", "United States"), ("Toronto", "Canada"),
+    ("Calgary", "Canada"), ("Sao Paulo", "Brazil"), ("Santiago", "Chile"), ("Lagos", "Nigeria"), ("Nairobi", "Kenya"),
+    ("Cairo", "Egypt"), ("Johannesburg", "South Africa"), ("Dubai", "United Arab Emirates"), ("Riyadh", "Saudi Arabia"),
+    ("Mumbai", "India"), ("Chennai", "India"), ("Shanghai", "China"), ("Shenzhen", "China"), ("Tokyo", "Japan"),
+    ("Seoul", "South Korea"), ("Jakarta", "Indonesia"), ("Sydney", "Australia"), ("Perth", "Australia"),
+    ("Reykjavik", "Iceland"), ("Mexico City", "Mexico"), ("Buenos Aires", "Argentina"), ("Auckland", "New Zealand"),
+]
+
+SPEC_SHEET_LINES = [
+    "Product: {product}, rated output {rating} kW",
+    "Model: {model} ({category} series)",
+    "Type: {product}",
+    "Supplied by {name} for the {category} sector.",
+    "Warranty and service terms apply to every {product} delivered.",
+    "Installation guidance for the {model} unit is available on request.",
+]
+
+
+def generate_producers(count, seed=42):
+    """Yields (name, contact, address, products, category) tuples with unique names."""
+    rng = random.Random(seed)
+    seen = set()
+    for i in range(count):
+        category = rng.choice(CATEGORIES)
+        base = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_CORES[category])} {rng.choice(NAME_SUFFIXES)} {rng.choice(LEGAL_FORMS)}"
+        name = base
+        n = 2
+        while name in seen:
+            name = f"{base} {n}"
+            n += 1
+        seen.add(name)
+
+        slug = "".join(ch for ch in base.split()[0].lower() if ch.isalnum())
+        contact = f"info@{slug}{i}.example.com, +{rng.randint(1, 99)} {rng.randint(100, 999)} {rng.randint(100000, 999999)}"
+        city, country = rng.choice(CITIES)
+        address = f"{rng.randint(1, 400)} {rng.choice(STREETS)} {rng.choice(STREET_TYPES)}, {city}, {country}"
+        products = ", ".join(rng.sample(CATEGORY_PRODUCTS[category], rng.randint(1, 3)))
+        yield (name, contact, address, products, category)
+
+def populate_database(db_path, count, seed=42):
+    """Creates (or extends) a producers database at db_path with synthetic rows."""
+    conn = sqlite3.connect(db_path)
+    try:
+        repo.create_producers_table(conn)
+        conn.executemany(repo.INSERT_PRODUCER_SQL, generate_producers(count, seed))
+        conn.commit()
+    finally:
+        conn.close()
+
+def write_import_csv(filepath, count, seed=42):
+    """Writes synthetic producers in the CSV layout accepted by the importer."""
+    with open(filepath, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Name", "Contact", "Address", "Products", "Category"])
+        writer.writerows(generate_producers(count, seed))
+
+def generate_spec_text(line_count, seed=42):
+    """Returns product spec-sheet style text, as found in supplier PDFs and TXT files."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(line_count):
+        category = rng.choice(CATEGORIES)
+        lines.append(rng.choice(SPEC_SHEET_LINES).format(
+            product=rng.choice(CATEGORY_PRODUCTS[category]),
+            model=f"{category[:3].upper()}-{rng.randint(100, 9999)}",
+            category=category,
+            rating=rng.randint(1, 5000),
+            name=f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)}",
+        ))
+    return "\n".join(lines)
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_text_pdf(filepath, page_count, lines_per_page=40, seed=42):
+    """
+    Writes a plain multi-page text PDF without needing ReportLab.
+    Uses uncompressed content streams and the built-in Helvetica font.
+    """
+    text_lines = generate_spec_text(page_count * lines_per_page, seed).split("\n")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for p in range(page_count):
+        page_lines = text_lines[p * lines_per_page:(p + 1) * lines_per_page]
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 760 Td"]
+        for line in page_lines:
+            ops.append(f"({_pdf_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % page_count
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_pos = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_pos)
+    with open(filepath, 'wb') as file:
+        file.write(out)
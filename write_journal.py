@@ -0,0 +1,255 @@
+"""
+Undo/redo journal for producer edits, with coalesced commits.
+
+Every add, update and delete made through a WriteJournal runs inside a savepoint of one
+long-lived transaction and records the rows before and after the change. Consequences:
+  - edits are not committed (and fsynced) one by one; the caller commits them together with
+    flush(), typically once the user has paused for COMMIT_DELAY_MS, or after
+    MAX_PENDING_WRITES rows. A failed edit rolls back to its savepoint only,
+  - every edit, however many rows it touches, is one undo step. undo() applies the recorded
+    before-images (re-inserting deleted producers with their original ids), redo() the
+    after-images; both go through the same journal and are coalesced the same way,
+  - before an undo or redo, the producers it touches are compared with the images it expects.
+    A producer changed outside the journal since (by a watched-source sync, say) makes the
+    step fail with JournalConflictError and drops it, instead of reverting the other change,
+  - bulk edits (delete, recategorize) stage their ids in a temporary table and change all
+    rows with one statement; their images are read with one query, and replayed with one
+    executemany per kind of change.
+Works on SQLite and PostgreSQL connections alike, through the repository functions.
+"""
+import itertools
+import sqlite3
+
+import producers_repository as repo
+
+COMMIT_DELAY_MS = 500  # commit after this long without further edits
+MAX_PENDING_WRITES = 500  # rows changed before a commit is forced regardless
+UNDO_LIMIT = 100  # edits kept for undo
+
+
+class JournalConflictError(Exception):
+    """An undo or redo found its producers changed outside the journal; the step was dropped."""
+
+
+class JournalEntry:
+    """One undoable edit: (before, after) producer rows; None stands for "no such row"."""
+    __slots__ = ("label", "changes")
+
+    def __init__(self, label, changes):
+        self.label = label
+        self.changes = changes  # list of (before row or None, after row or None)
+
+    def producer_ids(self):
+        return [(before or after)[0] for before, after in self.changes]
+
+
+class WriteJournal:
+    """Producer edits on one connection, with undo/redo. Not thread-safe; use it from the UI thread."""
+
+    def __init__(self, conn, undo_limit=UNDO_LIMIT, max_pending=MAX_PENDING_WRITES):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.undo_limit = undo_limit
+        self.max_pending = max_pending
+        self.undo_stack = []
+        self.redo_stack = []
+        self.pending = 0  # rows changed since the last flush
+        self._unflushed = []  # entries whose changes are not committed yet
+        self._savepoints = itertools.count(1)
+
+    # --- Transactions ---
+
+    def _run(self, apply):
+        """Runs apply() inside a savepoint; on error only its own changes are rolled back."""
+        if isinstance(self.conn, sqlite3.Connection) and not self.conn.in_transaction:
+            # Keep the outer transaction open across savepoints (RELEASE would otherwise commit)
+            self.conn.execute("BEGIN")
+        name = f"journal_{next(self._savepoints)}"
+        self.cursor.execute(f"SAVEPOINT {name}")
+        try:
+            result = apply()
+        except Exception:
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            self.cursor.execute(f"RELEASE SAVEPOINT {name}")
+            raise
+        self.cursor.execute(f"RELEASE SAVEPOINT {name}")
+        return result
+
+    def flush(self):
+        """Commits the pending edits. Returns the number of rows they changed."""
+        flushed = self.pending
+        self.conn.commit()
+        self.pending = 0
+        self._unflushed = []
+        return flushed
+
+    def needs_flush(self):
+        return self.pending >= self.max_pending
+
+    def discard_pending(self):
+        """
+        Forgets the uncommitted edits after the connection was rolled back by someone else,
+        so undo never replays changes that are no longer in the database.
+        """
+        for entry in self._unflushed:
+            if entry in self.undo_stack:
+                self.undo_stack.remove(entry)
+            if entry in self.redo_stack:
+                self.redo_stack.remove(entry)
+        self._unflushed = []
+        self.pending = 0
+
+    def forget_producers(self, names):
+        """Drops the undo and redo steps that touch any of the named producers (changed outside the journal)."""
+        names = set(names)
+
+        def touches(entry):
+            return any(row is not None and row[1] in names for change in entry.changes for row in change)
+        self.undo_stack = [entry for entry in self.undo_stack if not touches(entry)]
+        self.redo_stack = [entry for entry in self.redo_stack if not touches(entry)]
+
+    def _record(self, label, changes):
+        entry = JournalEntry(label, changes)
+        self.undo_stack.append(entry)
+        del self.undo_stack[:-self.undo_limit]
+        self.redo_stack.clear()
+        self._unflushed.append(entry)
+        self.pending += len(changes)
+        return entry
+
+    # --- Edits ---
+
+    def _apply(self, steps):
+        """
+        Moves producers from state `before` to state `after` for each (before, after) step
+        (either may be None). Consecutive steps of the same kind are applied together.
+        """
+        for kind, group in itertools.groupby(steps, key=_step_kind):
+            group = list(group)
+            if kind == "delete":
+                repo.stage_producer_ids(self.cursor, [before[0] for before, _ in group])
+                repo.delete_staged(self.cursor)
+            elif kind == "restore":
+                repo.restore_producers(self.cursor, [after for _, after in group])
+            elif all(before[:5] == after[:5] for before, after in group):
+                # Only categories change (a recategorize, or its undo): one statement per category
+                by_category = {}
+                for _, after in group:
+                    by_category.setdefault(after[5], []).append(after[0])
+                for category, ids in by_category.items():
+                    repo.stage_producer_ids(self.cursor, ids)
+                    repo.recategorize_staged(self.cursor, category)
+            else:
+                repo.update_producers(self.cursor, [after for _, after in group])
+
+    def insert(self, values, label=None):
+        """Adds a (name, contact, address, products, category) producer; returns its id."""
+        def apply():
+            new_id = repo.insert_producer(self.cursor, values)
+            return new_id, [(None, (new_id,) + tuple(values))]
+        new_id, changes = self._run(apply)
+        self._record(label or f"Add '{values[0]}'", changes)
+        return new_id
+
+    def update(self, updates, label=None):
+        """Applies {producer id: (name, contact, address, products, category)}; returns the ids changed."""
+        updates = {int(pid): values for pid, values in updates.items()}
+
+        def apply():
+            before = repo.fetch_producer_rows(self.cursor, list(updates))
+            changes = []
+            for row in before:
+                after = (row[0],) + tuple(updates[row[0]])
+                if after != tuple(row):
+                    repo.update_producer(self.cursor, row[0], after[1:])
+                    changes.append((tuple(row), after))
+            return changes
+        changes = self._run(apply)
+        if changes:
+            self._record(label or _describe("Update", changes), changes)
+        return [before[0] for before, _ in changes]
+
+    def delete(self, producer_ids, label=None):
+        """Deletes producers with one statement; returns the ids that existed."""
+        def apply():
+            repo.stage_producer_ids(self.cursor, producer_ids)
+            before = repo.fetch_staged_rows(self.cursor)
+            repo.delete_staged(self.cursor)
+            return [(tuple(row), None) for row in before]
+        changes = self._run(apply)
+        if changes:
+            self._record(label or _describe("Delete", changes), changes)
+        return [before[0] for before, _ in changes]
+
+    def recategorize(self, producer_ids, category, label=None):
+        """Sets the category of many producers with one statement; returns the ids changed."""
+        def apply():
+            repo.stage_producer_ids(self.cursor, producer_ids)
+            before = repo.fetch_staged_rows(self.cursor)
+            repo.recategorize_staged(self.cursor, category)
+            return [(tuple(row), tuple(row[:5]) + (category,)) for row in before if row[5] != category]
+        changes = self._run(apply)
+        if changes:
+            self._record(label or _describe("Recategorize", changes), changes)
+        return [before[0] for before, _ in changes]
+
+    # --- Undo / redo ---
+
+    def undo_label(self):
+        return self.undo_stack[-1].label if self.undo_stack else None
+
+    def redo_label(self):
+        return self.redo_stack[-1].label if self.redo_stack else None
+
+    def _replay(self, entry, undo):
+        if undo:
+            steps = [(after, before) for before, after in reversed(entry.changes)]
+        else:
+            steps = entry.changes
+
+        def apply():
+            repo.stage_producer_ids(self.cursor, entry.producer_ids())
+            current = {row[0]: tuple(row) for row in repo.fetch_staged_rows(self.cursor)}
+            if any(current.get((expected or target)[0]) != expected for expected, target in steps):
+                raise JournalConflictError(f"Cannot {'undo' if undo else 'redo'} {entry.label}: "
+                                           "its producers were changed elsewhere since.")
+            self._apply(steps)
+        self._run(apply)
+        self._unflushed.append(entry)
+        self.pending += len(entry.changes)
+
+    def undo(self):
+        """Reverts the most recent edit. Returns its JournalEntry, or None if there is nothing to undo."""
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack[-1]
+        try:
+            self._replay(entry, undo=True)
+        except JournalConflictError:
+            self.undo_stack.pop()
+            raise
+        self.redo_stack.append(self.undo_stack.pop())
+        return entry
+
+    def redo(self):
+        """Re-applies the most recently undone edit. Returns it, or None if there is none."""
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack[-1]
+        try:
+            self._replay(entry, undo=False)
+        except JournalConflictError:
+            self.redo_stack.pop()
+            raise
+        self.undo_stack.append(self.redo_stack.pop())
+        return entry
+
+
+def _step_kind(step):
+    before, after = step
+    return "delete" if after is None else "restore" if before is None else "update"
+
+def _describe(verb, changes):
+    if len(changes) == 1:
+        return f"{verb} '{(changes[0][0] or changes[0][1])[1]}'"
+    return f"{verb} {len(changes)} producers"